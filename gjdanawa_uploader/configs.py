@@ -1,14 +1,22 @@
 """Configuration file for the data pipeline."""
 
-import yaml
 from easydict import EasyDict
 from os.path import join, abspath, dirname
 
+from gjdanawa_uploader.core.config_schema import (
+    CrawlerConfig,
+    ESConfig,
+    LLMConfig,
+    MarketplaceMetadata,
+    load_config,
+    parse_yaml,
+)
+
 
 def load_yaml(path: str) -> EasyDict:
     """Load yaml file."""
     with open(path, "r", encoding="utf8") as f:
-        config = yaml.safe_load(f)
+        config = parse_yaml(f)
     return EasyDict(config)
 
 
@@ -18,13 +26,47 @@ def load_yaml(path: str) -> EasyDict:
 ROOT_PATH = dirname(dirname(abspath(__file__)))
 SRC_PATH = join(ROOT_PATH, "gjdanawa_uploader")
 CONFIG_PATH = join(ROOT_PATH, "configs")
+PROFILE_PATH = join(ROOT_PATH, "profiles")
+CHECKPOINT_PATH = join(ROOT_PATH, "checkpoints")
+CACHE_PATH = join(ROOT_PATH, "cache")
+EXPORT_PATH = join(ROOT_PATH, "exports")
+STORAGE_PATH = join(ROOT_PATH, "storage")
 
 
 ##################################################
 # Configs
+# - Overridden by environment variables, e.g. GJDANAWA_CRAWLER__marketplaces__danawa__n_listings=5
 ##################################################
-CFG_CRAWLER = load_yaml(join(CONFIG_PATH, "crawler.yml"))
+CONFIG_CACHE_PATH = join(CACHE_PATH, "configs")
+
+CFG_CRAWLER: CrawlerConfig = load_config(
+    join(CONFIG_PATH, "crawler.yml"), CrawlerConfig, CONFIG_CACHE_PATH
+)
+CFG_ES: ESConfig = load_config(join(CONFIG_PATH, "es.yml"), ESConfig, CONFIG_CACHE_PATH)
+CFG_LLM: LLMConfig = load_config(
+    join(CONFIG_PATH, "llm.yml"), LLMConfig, CONFIG_CACHE_PATH
+)
+METADATA: dict[str, MarketplaceMetadata] = load_config(
+    join(CONFIG_PATH, "metadata.yml"),
+    dict[str, MarketplaceMetadata],
+    CONFIG_CACHE_PATH,
+)
+FIELD_DESCRIPTIONS: dict = load_config(
+    join(CONFIG_PATH, "field_descriptions.yml"), dict, CONFIG_CACHE_PATH
+)
+
+# Described fields should be fields of the indices
+for _key, _descriptions in FIELD_DESCRIPTIONS.items():
+    if _unknown := sorted(set(_descriptions) - set(CFG_ES[_key].fields)):
+        raise ValueError(f"Unknown fields in field_descriptions.{_key}: {_unknown}")
 
 
 if __name__ == "__main__":
+    from time import perf_counter
+
+    start_time = perf_counter()
+    load_config(join(CONFIG_PATH, "crawler.yml"), CrawlerConfig, CONFIG_CACHE_PATH)
+    print(f"Cached crawler config loaded: {1000 * (perf_counter() - start_time):.2f}ms")
     print(CFG_CRAWLER)
+    print(CFG_ES.listings.fields)
+    print(METADATA["m11st"].selector_router.match("https://m.11st.co.kr/products/m/1"))
@@ -0,0 +1,434 @@
+"""Config schemas
+
+Typed configs (dataclasses) of the YAML files in `configs/`:
+- Values are validated (unknown keys, types) when the configs are loaded.
+- Environment variables override values, e.g.
+  `GJDANAWA_CRAWLER__marketplaces__danawa__n_listings=5` (values are parsed as YAML).
+- Derived values (compiled regexes, selector routers, ES field lists) are
+  computed once, and the parsed configs are cached on disk by file mtime.
+
+Configs also support the dict-style access of the YAML configs
+(`cfg["n_listings"]`, `cfg.get("prefetch", {})`), attribute access is preferred.
+"""
+
+import os
+import re
+import sys
+import pickle
+import tempfile
+import types
+import typing
+from dataclasses import dataclass, field, fields
+
+from easydict import EasyDict
+
+from gjdanawa_uploader.utils.selector_router import SelectorRouter
+
+
+ENV_PREFIX = "GJDANAWA_"
+# Modules of the types in the cached (pickled) configs
+PICKLED_MODULES = (__name__, SelectorRouter.__module__)
+
+
+class ConfigBase:
+    """Base of the config dataclasses"""
+
+    def __getitem__(self, key: str):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __contains__(self, key: str) -> bool:
+        return hasattr(self, key)
+
+    def get(self, key: str, default=None):
+        return getattr(self, key, default)
+
+    def to_dict(self) -> dict:
+        """Values of the config file (derived values are omitted)"""
+        return {f.name: _to_dict(getattr(self, f.name)) for f in fields(self) if f.init}
+
+    @classmethod
+    def from_dict(cls, data: dict, path: str = ""):
+        """Validate and convert the values of a config file"""
+        path = path or cls.__name__
+        if not isinstance(data, dict):
+            raise ValueError(f"Invalid config {path}: expected a mapping, got {data!r}")
+        hints = typing.get_type_hints(cls)
+        init_fields = {f.name for f in fields(cls) if f.init}
+        if unknown := sorted(set(data) - init_fields):
+            raise ValueError(f"Unknown keys in config {path}: {unknown}")
+        kwargs = {
+            key: _convert(value, hints[key], f"{path}.{key}")
+            for key, value in data.items()
+        }
+        try:
+            return cls(**kwargs)
+        except TypeError as e:
+            raise ValueError(f"Invalid config {path}: {e}") from None
+
+
+def _to_dict(value):
+    if isinstance(value, ConfigBase):
+        return value.to_dict()
+    if isinstance(value, dict):
+        return {k: _to_dict(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_to_dict(v) for v in value]
+    return value
+
+
+def _convert(value, type_, path: str):
+    """Convert a YAML value to the annotated type (raise ValueError if invalid)"""
+    origin, args = typing.get_origin(type_), typing.get_args(type_)
+
+    # 1. Optional values
+    if origin in (typing.Union, types.UnionType):
+        if value is None and type(None) in args:
+            return None
+        non_none = [arg for arg in args if arg is not type(None)]
+        for arg in non_none:
+            try:
+                return _convert(value, arg, path)
+            except ValueError:
+                if arg is non_none[-1]:
+                    raise
+
+    # 2. Nested configs
+    if isinstance(type_, type) and issubclass(type_, ConfigBase):
+        return type_.from_dict(value if value is not None else {}, path)
+    if origin is dict:
+        if not isinstance(value, dict):
+            raise ValueError(
+                f"Invalid type of {path}: expected a mapping, got {value!r}"
+            )
+        if args and isinstance(args[1], type) and issubclass(args[1], ConfigBase):
+            return {k: args[1].from_dict(v, f"{path}.{k}") for k, v in value.items()}
+        return EasyDict(value)
+    if type_ is dict:
+        return EasyDict(value or {})
+    if origin is list or type_ is list:
+        if not isinstance(value, list):
+            raise ValueError(f"Invalid type of {path}: expected a list, got {value!r}")
+        return [EasyDict(v) if isinstance(v, dict) else v for v in value]
+
+    # 3. Scalars (int is accepted as float)
+    if type_ is float and isinstance(value, int) and not isinstance(value, bool):
+        return float(value)
+    if type_ in (int, float, str, bool):
+        if not isinstance(value, type_) or (type_ is int and isinstance(value, bool)):
+            raise ValueError(
+                f"Invalid type of {path}: expected {type_.__name__}, got {value!r}"
+            )
+    return value
+
+
+####################################################################################################
+# Crawler (configs/crawler.yml)
+####################################################################################################
+@dataclass
+class MarketplaceConfig(ConfigBase):
+    """Crawler config of a marketplace (`marketplaces.<marketplace>`)"""
+
+    n_listings: int
+    n_reviews: int
+    max_workers: int = 1
+    chrome_option: str | None = None
+    extraction_mode: str = "dom"
+    backends: dict = field(default_factory=EasyDict)
+    page_param: str | None = None
+    n_pages_per_batch: int = 1
+    n_review_workers: int = 1
+    review_scheduler: str = "processes"
+    prefetch: dict = field(default_factory=EasyDict)
+    rate_limit: dict = field(default_factory=EasyDict)
+    network_capture: dict = field(default_factory=EasyDict)
+    relevance: dict = field(default_factory=EasyDict)
+    image_match: dict = field(default_factory=EasyDict)
+
+    def __post_init__(self):
+        if self.extraction_mode not in ("dom", "network"):
+            raise ValueError(f"Invalid extraction_mode: {self.extraction_mode}")
+        if invalid := set(self.network_capture) - {"listings", "reviews"}:
+            raise ValueError(f"Invalid network_capture: {sorted(invalid)}")
+        # Pages without a spec are extracted from the DOM, listings need a spec
+        if self.extraction_mode == "network" and not self.network_capture.get(
+            "listings"
+        ):
+            raise ValueError(
+                "Invalid extraction_mode: network requires network_capture.listings"
+            )
+        if invalid := set(self.backends.values()) - {"selenium", "http"}:
+            raise ValueError(f"Invalid backends: {sorted(invalid)}")
+        if self.review_scheduler not in ("processes", "threads"):
+            raise ValueError(f"Invalid review_scheduler: {self.review_scheduler}")
+
+
+@dataclass
+class OrchestratorConfig(ConfigBase):
+    n_workers: int = 4
+
+
+@dataclass
+class PageCacheConfig(ConfigBase):
+    enabled: bool = False
+    ttl: float = 3600
+
+
+@dataclass
+class ListingMatchConfig(ConfigBase):
+    threshold: float = 0.7
+    backend: str = "numpy"
+    k: int | None = None
+
+    def __post_init__(self):
+        if self.backend not in ("numpy", "hnsw"):
+            raise ValueError(f"Invalid listing_match.backend: {self.backend}")
+        if self.backend == "hnsw" and not self.k:
+            raise ValueError("listing_match.k is required with the hnsw backend")
+
+
+@dataclass
+class LLMExtractionConfig(ConfigBase):
+    enabled: bool = False
+    batch_size: int = 20
+    max_concurrency: int = 4
+    token_budget: int = 200_000
+    tasks: dict = field(default_factory=EasyDict)
+
+
+@dataclass
+class EmbeddingConfig(ConfigBase):
+    enabled: bool = False
+    fields: dict = field(default_factory=EasyDict)
+    batch_size: int = 2048
+    max_concurrency: int = 4
+
+
+@dataclass
+class WorkerConfig(ConfigBase):
+    broker_url: str | None = None
+    n_workers: int = 4
+    poll_interval: float = 1
+    stale_timeout: float = 600
+    max_attempts: int = 3
+
+
+@dataclass
+class StorageConfig(ConfigBase):
+    url: str | None = None
+
+
+@dataclass
+class ParquetExportConfig(ConfigBase):
+    enabled: bool = False
+    path: str | None = None
+    row_group_size: int = 10_000
+
+
+@dataclass
+class CrawlerConfig(ConfigBase):
+    """Crawler config (configs/crawler.yml)"""
+
+    marketplaces: dict[str, MarketplaceConfig]
+    free_words: list = field(default_factory=list)
+    null_values: list = field(default_factory=list)
+    rate_limit: dict = field(default_factory=EasyDict)
+    browser_profiles: dict = field(default_factory=EasyDict)
+    orchestrator: OrchestratorConfig = field(default_factory=OrchestratorConfig)
+    page_cache: PageCacheConfig = field(default_factory=PageCacheConfig)
+    canonical_urls: dict = field(default_factory=EasyDict)
+    listing_match: ListingMatchConfig = field(default_factory=ListingMatchConfig)
+    known_marketplaces: list = field(default_factory=list)
+    llm_extraction: LLMExtractionConfig = field(default_factory=LLMExtractionConfig)
+    embedding: EmbeddingConfig = field(default_factory=EmbeddingConfig)
+    worker: WorkerConfig = field(default_factory=WorkerConfig)
+    storage: StorageConfig = field(default_factory=StorageConfig)
+    parquet_export: ParquetExportConfig = field(default_factory=ParquetExportConfig)
+
+    # Derived values
+    blocked_pattern: re.Pattern = field(init=False)
+    known_marketplaces_pattern: re.Pattern = field(init=False)
+
+    def __post_init__(self):
+        # Captcha and HTTP 429/5xx page titles (case insensitive)
+        self.blocked_pattern = _compile_words(
+            self.rate_limit.get("blocked_patterns", []), re.IGNORECASE
+        )
+        # Sellers of other platforms (normalized names: spaces removed, lowercased)
+        self.known_marketplaces_pattern = _compile_words(
+            re.sub(r"\s+", "", name).lower() for name in self.known_marketplaces
+        )
+
+
+def _compile_words(words, flags: int = 0) -> re.Pattern:
+    """Pattern matching any of the words (matches nothing without words)"""
+    return re.compile("|".join(map(re.escape, words)) or r"(?!)", flags)
+
+
+####################################################################################################
+# Elasticsearch (configs/es.yml)
+####################################################################################################
+@dataclass
+class ESIndexConfig(ConfigBase):
+    index: str
+    id_fields: list = field(default_factory=list)  # fields of the document ids
+    mappings: dict = field(default_factory=EasyDict)
+    settings: dict = field(default_factory=EasyDict)
+
+    # Derived values
+    fields: tuple[str, ...] = field(init=False)
+
+    def __post_init__(self):
+        self.fields = tuple(self.mappings.get("properties", {}))
+
+
+@dataclass
+class ESConfig(ConfigBase):
+    """Elasticsearch indices (configs/es.yml)"""
+
+    listings: ESIndexConfig
+    reviews: ESIndexConfig
+    metadata: ESIndexConfig
+    field_descriptions: ESIndexConfig
+
+
+####################################################################################################
+# LLM (configs/llm.yml)
+####################################################################################################
+@dataclass
+class LLMModelConfig(ConfigBase):
+    model: str
+    temperature: float = 0.0
+
+
+@dataclass
+class LLMConfig(ConfigBase):
+    """LLM clients (configs/llm.yml)"""
+
+    chat_openai: LLMModelConfig
+    openai_embeddings: LLMModelConfig
+
+
+####################################################################################################
+# Marketplace metadata (configs/metadata.yml)
+####################################################################################################
+@dataclass
+class MarketplaceMetadata(ConfigBase):
+    """Metadata of a marketplace (inserted to the metadata index)"""
+
+    marketplace: str
+    search_url: str  # with the `query` parameter, e.g. "...?keyword={keyword}"
+    query: str
+    currency: str | None = None
+    max_listing_rating: float | None = None
+    max_review_rating: float | None = None
+    listings_selectors: dict = field(default_factory=EasyDict)
+    reviews_selectors_grocery: list = field(default_factory=list)
+
+    # Derived values
+    selector_router: SelectorRouter = field(init=False)
+
+    def __post_init__(self):
+        if f"{{{self.query}}}" not in self.search_url:
+            raise ValueError(
+                f"Invalid search_url of {self.marketplace}: no {{{self.query}}} in {self.search_url}"
+            )
+        page_button = self.listings_selectors.get("page_button")
+        if page_button and "{page}" not in page_button:
+            raise ValueError(f"Invalid page_button of {self.marketplace}: no {{page}}")
+        # Review selectors by listing URL (routes are compiled once)
+        self.selector_router = SelectorRouter(self.reviews_selectors_grocery)
+
+    def check_selectors(
+        self, selectors: dict, keys: tuple[str, ...], name: str
+    ) -> dict:
+        """Get the selectors, raising NotImplementedError if any key is not set"""
+        if missing := [key for key in keys if not selectors.get(key)]:
+            raise NotImplementedError(
+                f"{name} of {self.marketplace} are not set in configs/metadata.yml: {missing}"
+            )
+        return selectors
+
+
+####################################################################################################
+# Loading
+####################################################################################################
+def parse_yaml(stream):
+    """Parse YAML with the LibYAML parser (C) if available
+
+    yaml is imported here: cached configs are loaded without it.
+    """
+    import yaml
+
+    return yaml.load(stream, Loader=getattr(yaml, "CSafeLoader", yaml.SafeLoader))
+
+
+def get_env_overrides(name: str) -> dict[tuple[str, ...], object]:
+    """Overrides of the config in the environment (`GJDANAWA_<NAME>__<key>__<key>=<value>`)"""
+    prefix = f"{ENV_PREFIX}{name.upper()}__"
+    return {
+        tuple(key.removeprefix(prefix).split("__")): parse_yaml(value)
+        for key, value in sorted(os.environ.items())
+        if key.startswith(prefix)
+    }
+
+
+def apply_overrides(data: dict, overrides: dict[tuple[str, ...], object]) -> dict:
+    """Set overridden values (nested keys are created if missing)"""
+    for keys, value in overrides.items():
+        node = data
+        for key in keys[:-1]:
+            node = node.setdefault(key, {})
+            if not isinstance(node, dict):
+                raise ValueError(f"Invalid override: {'.'.join(keys)}")
+        node[keys[-1]] = value
+    return data
+
+
+def load_config(path: str, schema, cache_dir: str | None = None):
+    """Load a config file with the schema (a config class or `dict[str, <config class>]`)
+
+    The parsed config is cached in `cache_dir` and reused until the file, the
+    schemas or the environment overrides change.
+    """
+    name = os.path.splitext(os.path.basename(path))[0]
+    overrides = get_env_overrides(name)
+
+    # 1. Cached config
+    cache_path = key = None
+    if cache_dir:
+        stat = os.stat(path)
+        key = repr(
+            (
+                os.path.abspath(path),
+                stat.st_mtime_ns,
+                stat.st_size,
+                [os.stat(sys.modules[m].__file__).st_mtime_ns for m in PICKLED_MODULES],
+                sorted(overrides.items()),
+            )
+        )
+        cache_path = os.path.join(cache_dir, f"{name}.pickle")
+        try:
+            with open(cache_path, "rb") as f:
+                cached = pickle.load(f)
+            if cached["key"] == key:
+                return cached["config"]
+        except Exception:
+            pass
+
+    # 2. Parse, override and validate
+    with open(path, "r", encoding="utf8") as f:
+        data = parse_yaml(f) or {}
+    config = _convert(apply_overrides(data, overrides), schema, name)
+
+    if cache_path:
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            with tempfile.NamedTemporaryFile("wb", dir=cache_dir, delete=False) as f:
+                pickle.dump(dict(key=key, config=config), f)
+            os.replace(f.name, cache_path)
+        except OSError as e:
+            print(f"[Warning] Config cache is not saved: {e}")
+    return config
@@ -8,6 +8,7 @@ from collections import defaultdict
 from functools import wraps
 
 from gjdanawa_uploader.core.timer import Timer
+from gjdanawa_uploader.core.profiler import PROFILER, span_key
 
 
 class DepthManager(contextlib.ContextDecorator):
@@ -70,8 +71,9 @@ def D(fn):
         )
         _print_fn(name, args, fn)
 
+        key = span_key(args, kwargs) if PROFILER.active else None
         with DepthManager():
-            with Timer(name):
+            with Timer(name), PROFILER.span(fn.__name__, key=key):
                 rst = fn(*args, **kwargs)
 
         return rst
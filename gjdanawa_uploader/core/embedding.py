@@ -0,0 +1,317 @@
+"""Embedding module
+
+Embed texts (e.g. `listing_title` of listings, `content` of reviews) in batches,
+with identical texts embedded once and vectors cached on disk.
+"""
+
+import os
+import re
+import sqlite3
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+from typing import Callable
+
+import numpy as np
+
+from gjdanawa_uploader.configs import CACHE_PATH
+
+
+MAX_BATCH_SIZE = 2048  # inputs per request (OpenAI embeddings API)
+MAX_CONCURRENCY = 4  # requests in flight
+SQLITE_MAX_VARIABLES = 900
+
+
+class EmbeddingCache:
+    """Disk cache of embedding vectors of a model.
+
+    Vectors are rows of a float32 matrix file (memory-mapped for reading), and
+    the SQLite key index maps text hashes to rows. Appends are serialized by
+    SQLite transactions, so processes can share the cache.
+
+    Example:
+        >>> cache = EmbeddingCache("cache/embeddings", "text-embedding-3-small")
+        >>> cache.put(["hash1"], np.ones((1, 1536), dtype=np.float32))
+        >>> cache.get(["hash1", "hash2"])
+        {'hash1': array([1., 1., ..., 1.], dtype=float32)}
+    """
+
+    def __init__(self, path: str, model: str):
+        self.path = os.path.join(path, re.sub(r"[^\w.-]", "_", model))
+        os.makedirs(self.path, exist_ok=True)
+        self.vectors_path = os.path.join(self.path, "vectors.f32")
+        self._conn = sqlite3.connect(
+            os.path.join(self.path, "index.sqlite3"),
+            timeout=30,
+            isolation_level=None,
+            check_same_thread=False,
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS keys (key TEXT PRIMARY KEY, row INTEGER)"
+        )
+        self._lock = threading.Lock()
+        self._matrix: np.memmap | None = None
+
+    @property
+    def dim(self) -> int | None:
+        return self._get_meta("dim")
+
+    def __len__(self) -> int:
+        return self._get_meta("n_rows") or 0
+
+    def _get_meta(self, name: str) -> int | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM meta WHERE name = ?", (name,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def get(self, keys: list[str]) -> dict[str, np.ndarray]:
+        """Get cached vectors of the keys (missing keys are omitted)"""
+        rows = {}
+        with self._lock:
+            for start in range(0, len(keys), SQLITE_MAX_VARIABLES):
+                chunk = keys[start : start + SQLITE_MAX_VARIABLES]
+                query = f"SELECT key, row FROM keys WHERE key IN ({','.join('?' * len(chunk))})"
+                rows.update(self._conn.execute(query, chunk).fetchall())
+        if not rows:
+            return {}
+        matrix = self._get_matrix(max(rows.values()) + 1)
+        return {key: np.array(matrix[row]) for key, row in rows.items()}
+
+    def put(self, keys: list[str], vectors: np.ndarray):
+        """Append vectors of the keys (keys cached by another writer are skipped)"""
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        assert vectors.ndim == 2 and len(vectors) == len(keys), "Invalid vectors shape"
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                # 1. Check the dimension
+                row = self._conn.execute(
+                    "SELECT value FROM meta WHERE name = 'dim'"
+                ).fetchone()
+                if row is None:
+                    self._conn.execute(
+                        "INSERT INTO meta VALUES ('dim', ?)", (vectors.shape[1],)
+                    )
+                elif row[0] != vectors.shape[1]:
+                    raise ValueError(
+                        f"Invalid dimension: {vectors.shape[1]} (cache: {row[0]})"
+                    )
+
+                # 2. Append new vectors after the last row
+                row = self._conn.execute(
+                    "SELECT value FROM meta WHERE name = 'n_rows'"
+                ).fetchone()
+                n_rows = row[0] if row else 0
+                new_keys, new_vectors = [], []
+                for key, vector in zip(keys, vectors):
+                    exists = self._conn.execute(
+                        "SELECT 1 FROM keys WHERE key = ?", (key,)
+                    ).fetchone()
+                    if not exists and key not in new_keys:
+                        new_keys.append(key)
+                        new_vectors.append(vector)
+                if new_keys:
+                    with open(self.vectors_path, "ab") as f:
+                        # Drop rows of failed (rolled back) writes
+                        f.truncate(n_rows * vectors.shape[1] * 4)
+                        f.write(np.stack(new_vectors).tobytes())
+                    self._conn.executemany(
+                        "INSERT INTO keys VALUES (?, ?)",
+                        [(key, n_rows + i) for i, key in enumerate(new_keys)],
+                    )
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO meta VALUES ('n_rows', ?)",
+                        (n_rows + len(new_keys),),
+                    )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _get_matrix(self, n_rows: int) -> np.memmap:
+        """Memory-mapped matrix with at least `n_rows` rows (remapped when the file grows)"""
+        with self._lock:
+            if (self._matrix is None) or (len(self._matrix) < n_rows):
+                dim = self._conn.execute(
+                    "SELECT value FROM meta WHERE name = 'dim'"
+                ).fetchone()[0]
+                n_rows = os.path.getsize(self.vectors_path) // (dim * 4)
+                self._matrix = np.memmap(
+                    self.vectors_path, dtype=np.float32, mode="r", shape=(n_rows, dim)
+                )
+            return self._matrix
+
+    def close(self):
+        self._matrix = None
+        self._conn.close()
+
+
+class EmbeddingService:
+    """Batched and cached embedding of texts.
+
+    - Identical texts are embedded once.
+    - Cached texts (by model and text hash) are not embedded again.
+    - Missing texts are embedded in batches of `batch_size`, `max_concurrency` requests at a time.
+
+    Example:
+        >>> service = EmbeddingService(EMBEDDINGS.embed_documents, model="text-embedding-3-small")
+        >>> vectors = service.embed([info["listing_title"] for info in listing_infos])
+        >>> vectors.shape
+        (40, 1536)
+        >>> service.stats
+        {'n_texts': 40, 'n_unique': 37, 'n_cached': 0, 'n_embedded': 37, 'n_requests': 1}
+    """
+
+    def __init__(
+        self,
+        embed_fn: Callable[[list[str]], list[list[float]]],
+        model: str,
+        batch_size: int = MAX_BATCH_SIZE,
+        max_concurrency: int = MAX_CONCURRENCY,
+        cache: EmbeddingCache | None = None,
+        cache_path: str | None = os.path.join(CACHE_PATH, "embeddings"),
+    ):
+        self.embed_fn = embed_fn
+        self.model = model
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        if (cache is None) and cache_path:
+            cache = EmbeddingCache(cache_path, model)
+        self.cache = cache
+        self.stats = dict(n_texts=0, n_unique=0, n_cached=0, n_embedded=0, n_requests=0)
+        self._memory: dict[str, np.ndarray] = {}  # used without the disk cache
+
+    @staticmethod
+    def text_key(text: str) -> str:
+        return hashlib.sha1(text.encode()).hexdigest()
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        """Embed texts (float32 matrix, one row per text)"""
+        # 1. Deduplicate texts
+        keys = [self.text_key(text or "") for text in texts]
+        unique = dict(zip(keys, texts))
+        self.stats["n_texts"] += len(texts)
+        self.stats["n_unique"] += len(unique)
+
+        # 2. Read cached vectors
+        vectors = self._get_cached(list(unique))
+        self.stats["n_cached"] += len(vectors)
+
+        # 3. Embed missing texts
+        missing = [key for key in unique if key not in vectors]
+        if missing:
+            new_vectors = self._embed_batches([unique[key] or "" for key in missing])
+            self._put_cached(missing, new_vectors)
+            vectors.update(zip(missing, new_vectors))
+            self.stats["n_embedded"] += len(missing)
+
+        if not keys:
+            return np.zeros((0, 0), dtype=np.float32)
+        return np.stack([vectors[key] for key in keys])
+
+    def embed_infos(self, infos: list[dict], field: str) -> np.ndarray:
+        """Embed a field of documents (e.g. "listing_title" of listings, "content" of reviews)"""
+        return self.embed([info.get(field) or "" for info in infos])
+
+    def _embed_batches(self, texts: list[str]) -> np.ndarray:
+        batches = [
+            texts[start : start + self.batch_size]
+            for start in range(0, len(texts), self.batch_size)
+        ]
+        self.stats["n_requests"] += len(batches)
+        if len(batches) == 1:
+            results = [self.embed_fn(batches[0])]
+        else:
+            with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+                results = list(executor.map(self.embed_fn, batches))
+        return np.concatenate(
+            [np.asarray(result, dtype=np.float32) for result in results]
+        )
+
+    def _get_cached(self, keys: list[str]) -> dict[str, np.ndarray]:
+        if self.cache is None:
+            return {key: self._memory[key] for key in keys if key in self._memory}
+        return self.cache.get(keys)
+
+    def _put_cached(self, keys: list[str], vectors: np.ndarray):
+        if self.cache is None:
+            self._memory.update(zip(keys, vectors))
+        else:
+            self.cache.put(keys, vectors)
+
+
+def embed_documents(
+    service: EmbeddingService, infos: dict[str, list[dict]], fields: dict[str, str]
+):
+    """Save vectors of a text field in the `embedding` field of the documents
+
+    Args:
+        infos (dict): Documents per kind (e.g. "listings", "reviews")
+        fields (dict): Embedded field per kind (e.g. `{"reviews": "content"}`)
+    """
+    for kind, field in fields.items():
+        documents = [info for info in infos.get(kind, []) if info and info.get(field)]
+        if not documents:
+            continue
+        vectors = service.embed_infos(documents, field)
+        for info, vector in zip(documents, vectors):
+            info["embedding"] = vector.tolist()
+
+
+def fake_embed(texts: list[str], dim: int = 256, n: int = 3) -> list[list[float]]:
+    """Local embedding function for tests (normalized hashed character n-grams)
+
+    Similar texts have similar vectors, and the same text always has the same vector.
+    """
+    vectors = np.zeros((len(texts), dim), dtype=np.float32)
+    for i, text in enumerate(texts):
+        text = f" {text.lower()} "
+        for j in range(max(len(text) - n + 1, 1)):
+            digest = hashlib.md5(text[j : j + n].encode()).digest()
+            vectors[i, int.from_bytes(digest[:4], "little") % dim] += 1
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return (vectors / np.maximum(norms, 1e-12)).tolist()
+
+
+def get_embedding_service(
+    openai_api_key: str | None = "azure", **kwargs
+) -> EmbeddingService:
+    """Get the embedding service of the embeddings client (`core.llm.get_embeddings`)"""
+    from gjdanawa_uploader.core.llm import get_embeddings
+
+    embeddings = get_embeddings(openai_api_key)
+    return EmbeddingService(
+        embeddings.embed_documents, model=embeddings.model, **kwargs
+    )
+
+
+if __name__ == "__main__":
+    import tempfile
+
+    texts = [f"센카 퍼펙트휩 {i % 300}" for i in range(1_000)]
+    n_calls = 0
+
+    def counting_fake_embed(batch: list[str]) -> list[list[float]]:
+        global n_calls
+        n_calls += 1
+        return fake_embed(batch)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for run in ("cold", "warm"):
+            service = EmbeddingService(
+                counting_fake_embed, model="fake", batch_size=64, cache_path=tmp_dir
+            )
+            start_time = perf_counter()
+            vectors = service.embed(texts)
+            print(
+                f"[{run}] shape: {vectors.shape} / {service.stats} / elapsed: {perf_counter() - start_time:.3f}s"
+            )
+            service.cache.close()
+    print(f"# embed_fn calls: {n_calls}")
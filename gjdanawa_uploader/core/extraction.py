@@ -0,0 +1,419 @@
+"""LLM field extraction module
+
+Parse fields that are hard to parse with selectors (e.g. "100g당 1,290원") with
+the LLM. Many items are sent per prompt, prompts run concurrently under a token
+budget, and results are cached by (model, task version, input hash).
+"""
+
+import os
+import re
+import json
+import sqlite3
+import hashlib
+import threading
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter, time
+from typing import Callable
+
+from gjdanawa_uploader.configs import CACHE_PATH
+
+
+BATCH_SIZE = 20  # items per prompt
+MAX_CONCURRENCY = 4  # prompts in flight
+TOKEN_BUDGET = 200_000  # estimated tokens per run
+CHARS_PER_TOKEN = 2  # rough estimate for Korean text
+SQLITE_MAX_VARIABLES = 900
+
+# USD per 1M (input, output) tokens
+PRICES = {
+    "gpt-4o": (2.5, 10.0),
+    "gpt-4o-mini": (0.15, 0.6),
+    "fake": (0.0, 0.0),
+}
+
+
+@dataclass(frozen=True)
+class ExtractionTask:
+    """Field extraction task
+
+    Attributes:
+        name (str): Task name
+        version (str): Prompt template version (bump it when the template or fields change)
+        instructions (str): What to extract
+        fields (dict[str, str]): Output field -> description
+        source (str): Dotted path of the input text in a document (e.g. "optional.price_per_unit")
+        target (str): Dotted path of the output in a document
+    """
+
+    name: str
+    version: str
+    instructions: str
+    fields: dict
+    source: str
+    target: str
+
+    def render(self, items: list[tuple[int, str]]) -> str:
+        """Prompt of the items ((id, text) pairs)"""
+        fields = "\n".join(f"- {key}: {desc}" for key, desc in self.fields.items())
+        inputs = json.dumps(
+            [dict(id=id, text=text) for id, text in items], ensure_ascii=False
+        )
+        return (
+            f"{self.instructions}\n\n"
+            f"Return only a JSON list with one object per input, "
+            f'{{"id": <input id>, ...fields}}. Use null for unknown fields.\n'
+            f"Fields:\n{fields}\n\n"
+            f"Inputs:\n{inputs}"
+        )
+
+
+TASKS = {
+    task.name: task
+    for task in (
+        ExtractionTask(
+            name="price_per_unit",
+            version="1",
+            instructions="Parse unit prices of Korean marketplace listings (e.g. '100g당 1,290원').",
+            fields=dict(
+                quantity="Quantity of the unit (number, e.g. 100)",
+                unit="Unit (e.g. g, ml, 개, 매)",
+                price="Price of the unit in KRW (integer)",
+            ),
+            source="optional.price_per_unit",
+            target="optional.price_per_unit_parsed",
+        ),
+        ExtractionTask(
+            name="options",
+            version="1",
+            instructions="Parse purchased option strings of Korean product reviews (e.g. '색상: 블루 / 사이즈: 270').",
+            fields=dict(
+                options="Object of option name -> selected value",
+                quantity="Purchased quantity (integer)",
+            ),
+            source="optional.options",
+            target="optional.options_parsed",
+        ),
+        ExtractionTask(
+            name="promotion",
+            version="1",
+            instructions="Parse promotion strings of Korean marketplace listings (e.g. '카드 10% 할인', '1+1').",
+            fields=dict(
+                type="One of discount | coupon | bundle | free_shipping | gift | other",
+                discount_rate="Discount rate in percent (number)",
+                condition="Condition of the promotion (e.g. card, membership)",
+            ),
+            source="optional.promotion1",
+            target="optional.promotion_parsed",
+        ),
+    )
+}
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def get_path(document: dict, path: str):
+    """Get the value of the dotted path (None if missing)"""
+    value = document
+    for key in path.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    return value
+
+
+def get_text(document: dict, path: str) -> str | None:
+    """Input text of the dotted path (objects are serialized as "key: value / ...")"""
+    value = get_path(document, path)
+    if isinstance(value, dict):
+        value = " / ".join(f"{key}: {val}" for key, val in value.items() if val)
+    if isinstance(value, str) and value.strip():
+        return value
+    return None
+
+
+def set_path(document: dict, path: str, value):
+    """Set the value of the dotted path"""
+    *keys, last_key = path.split(".")
+    for key in keys:
+        document = document.setdefault(key, {})
+    document[last_key] = value
+
+
+class ExtractionCache:
+    """SQLite cache of extracted fields keyed by (model, task, version, input hash)"""
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS extractions (key TEXT PRIMARY KEY, value TEXT, created_at REAL)"
+        )
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(model: str, task: ExtractionTask, text: str) -> str:
+        text_hash = hashlib.sha1(text.encode()).hexdigest()
+        return f"{model}|{task.name}|{task.version}|{text_hash}"
+
+    def get(self, keys: list[str]) -> dict[str, dict]:
+        result = {}
+        with self._lock:
+            for start in range(0, len(keys), SQLITE_MAX_VARIABLES):
+                chunk = keys[start : start + SQLITE_MAX_VARIABLES]
+                rows = self._conn.execute(
+                    f"SELECT key, value FROM extractions WHERE key IN ({','.join('?' * len(chunk))})",
+                    chunk,
+                ).fetchall()
+                result.update((key, json.loads(value)) for key, value in rows)
+        return result
+
+    def put(self, items: dict[str, dict]):
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO extractions VALUES (?, ?, ?)",
+                [
+                    (key, json.dumps(value, ensure_ascii=False), time())
+                    for key, value in items.items()
+                ],
+            )
+
+    def close(self):
+        self._conn.close()
+
+
+class LLMExtractor:
+    """Extract fields of texts with the LLM in batches.
+
+    - Identical texts are sent once, and cached texts are never sent again.
+    - `batch_size` texts per prompt, `max_concurrency` prompts at a time.
+    - Prompts beyond the run's `token_budget` (estimated) are not sent.
+
+    Example:
+        >>> extractor = LLMExtractor(CHAT_LLM)
+        >>> extractor.extract_documents(listing_infos, TASKS["price_per_unit"])
+        >>> listing_infos[0]["optional"]["price_per_unit_parsed"]
+        {'quantity': 100, 'unit': 'g', 'price': 1290}
+        >>> extractor.report()
+        {'n_texts': 40, 'n_cached': 12, 'n_requests': 2, 'cost': 0.0004, ...}
+    """
+
+    def __init__(
+        self,
+        llm=None,
+        model: str | None = None,
+        batch_size: int = BATCH_SIZE,
+        max_concurrency: int = MAX_CONCURRENCY,
+        token_budget: int = TOKEN_BUDGET,
+        cache: ExtractionCache | None = None,
+        prices: dict[str, tuple[float, float]] | None = None,
+    ):
+        if llm is None:
+            from gjdanawa_uploader.core.llm import CHAT_LLM
+
+            llm = CHAT_LLM
+        self.llm = llm
+        self.model = model or getattr(llm, "model_name", None) or "unknown"
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self.token_budget = token_budget
+        self.cache = cache or ExtractionCache(
+            os.path.join(CACHE_PATH, "llm_extractions.sqlite3")
+        )
+        self.prices = prices or PRICES
+        self.stats = dict(
+            n_texts=0,
+            n_unique=0,
+            n_cached=0,
+            n_extracted=0,
+            n_failed=0,
+            n_over_budget=0,
+            n_requests=0,
+            input_tokens=0,
+            output_tokens=0,
+        )
+        self.latencies: list[float] = []
+        self._lock = threading.Lock()
+
+    def extract(self, task: ExtractionTask, texts: list[str]) -> list[dict | None]:
+        """Extracted fields of each text (None if not extracted)"""
+        # 1. Deduplicate texts and read the cache
+        keys = [self.cache.key(self.model, task, text) for text in texts]
+        unique = dict(zip(keys, texts))
+        results = self.cache.get(list(unique))
+        self._count(n_texts=len(texts), n_unique=len(unique), n_cached=len(results))
+
+        # 2. Batch missing texts within the token budget
+        missing = [key for key in unique if key not in results]
+        batches = []
+        n_planned_tokens = self.stats["input_tokens"] + self.stats["output_tokens"]
+        for start in range(0, len(missing), self.batch_size):
+            batch = missing[start : start + self.batch_size]
+            prompt = task.render(list(enumerate(unique[key] for key in batch)))
+            n_tokens = estimate_tokens(prompt) * 2  # prompt + completion
+            if n_planned_tokens + n_tokens > self.token_budget:
+                self._count(n_over_budget=len(missing) - start)
+                break
+            n_planned_tokens += n_tokens
+            batches.append((batch, prompt))
+
+        # 3. Send prompts concurrently
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            for batch, extracted in zip(batches, executor.map(self._request, batches)):
+                new_results = {
+                    key: extracted[i]
+                    for i, key in enumerate(batch[0])
+                    if i in extracted
+                }
+                self.cache.put(new_results)
+                results.update(new_results)
+                self._count(
+                    n_extracted=len(new_results),
+                    n_failed=len(batch[0]) - len(new_results),
+                )
+        return [results.get(key) for key in keys]
+
+    def extract_documents(self, documents: list[dict], task: ExtractionTask) -> int:
+        """Extract the task's fields of documents with a text (or object) at `task.source`
+
+        Returns:
+            int: Number of documents updated
+        """
+        targets = [
+            (document, get_text(document, task.source)) for document in documents
+        ]
+        targets = [(document, text) for document, text in targets if text is not None]
+        results = self.extract(task, [text for _, text in targets])
+        n_updated = 0
+        for (document, _), result in zip(targets, results):
+            if result is not None:
+                set_path(document, task.target, result)
+                n_updated += 1
+        return n_updated
+
+    def _request(self, batch: tuple[list[str], str]) -> dict[int, dict]:
+        """Send a prompt and parse the results (input id -> fields)"""
+        keys, prompt = batch
+        start_time = perf_counter()
+        try:
+            response = self.llm.invoke(prompt)
+        except Exception as e:
+            print(f"[Failure] LLM extraction ({len(keys)} items): {e!r}")
+            return {}
+        finally:
+            with self._lock:
+                self.latencies.append(perf_counter() - start_time)
+                self.stats["n_requests"] += 1
+
+        content = getattr(response, "content", response)
+        usage = getattr(response, "usage_metadata", None) or {}
+        self._count(
+            input_tokens=usage.get("input_tokens", estimate_tokens(prompt)),
+            output_tokens=usage.get("output_tokens", estimate_tokens(content)),
+        )
+        return parse_response(content, len(keys))
+
+    def _count(self, **counts):
+        with self._lock:
+            for name, count in counts.items():
+                self.stats[name] += count
+
+    def report(self) -> dict:
+        """Cost and latency of the run"""
+        input_price, output_price = self.prices.get(self.model, (0.0, 0.0))
+        latencies = sorted(self.latencies)
+        return dict(
+            self.stats,
+            model=self.model,
+            cost=(
+                self.stats["input_tokens"] * input_price
+                + self.stats["output_tokens"] * output_price
+            )
+            / 1e6,
+            latency_p50=latencies[len(latencies) // 2] if latencies else 0.0,
+            latency_max=latencies[-1] if latencies else 0.0,
+        )
+
+
+def parse_response(content: str, n_items: int) -> dict[int, dict]:
+    """Parse the JSON list of the response (input id -> fields)"""
+    matches = re.search(r"\[.*\]", content or "", re.DOTALL)
+    if not matches:
+        return {}
+    try:
+        items = json.loads(matches.group(0))
+    except ValueError:
+        return {}
+    result = {}
+    for item in items:
+        if isinstance(item, dict) and isinstance(item.get("id"), int):
+            id = item.pop("id")
+            if 0 <= id < n_items:
+                result[id] = item
+    return result
+
+
+@dataclass
+class FakeResponse:
+    content: str
+    usage_metadata: dict
+
+
+class FakeChatModel:
+    """Local chat model for tests
+
+    Answers extraction prompts with `respond(text) -> dict` for each input.
+    """
+
+    model_name = "fake"
+
+    def __init__(self, respond: Callable[[str], dict] | None = None):
+        self.respond = respond or (lambda text: {})
+        self.prompts: list[str] = []
+
+    def invoke(self, prompt: str) -> FakeResponse:
+        self.prompts.append(prompt)
+        inputs = json.loads(prompt.rsplit("Inputs:\n", 1)[1])
+        content = json.dumps(
+            [dict(id=item["id"], **self.respond(item["text"])) for item in inputs],
+            ensure_ascii=False,
+        )
+        return FakeResponse(
+            content,
+            dict(
+                input_tokens=estimate_tokens(prompt),
+                output_tokens=estimate_tokens(content),
+            ),
+        )
+
+
+if __name__ == "__main__":
+    import tempfile
+
+    def respond(text: str) -> dict:
+        matches = re.search(r"([\d.]+)\s*(\w+)당\s*([\d,]+)원", text)
+        if not matches:
+            return dict(quantity=None, unit=None, price=None)
+        quantity, unit, price = matches.groups()
+        return dict(
+            quantity=float(quantity), unit=unit, price=int(price.replace(",", ""))
+        )
+
+    listing_infos = [
+        dict(optional=dict(price_per_unit=f"{10 * (i % 30) + 10}g당 {i % 7},290원"))
+        for i in range(500)
+    ]
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache = ExtractionCache(os.path.join(tmp_dir, "extractions.sqlite3"))
+        for run in ("cold", "warm"):
+            extractor = LLMExtractor(FakeChatModel(respond), cache=cache)
+            start_time = perf_counter()
+            n_updated = extractor.extract_documents(
+                listing_infos, TASKS["price_per_unit"]
+            )
+            print(
+                f"[{run}] # updated: {n_updated} / {extractor.report()} / elapsed: {perf_counter() - start_time:.3f}s"
+            )
+        print(listing_infos[0]["optional"])
@@ -0,0 +1,160 @@
+"""Import time benchmark
+
+Measure cumulative import times of modules in fresh interpreters
+(`python -X importtime`) and check them against budgets. Heavy dependencies
+(`HEAVY_MODULES`, e.g. selenium waits, numpy, PIL, requests, langchain) should be
+imported where they are used, so importing a crawler stays cheap. Budgets depend
+on the machine, so tests check the heavy imports only.
+
+Usage:
+    python -m gjdanawa_uploader.core.import_time
+    python -m gjdanawa_uploader.core.import_time --modules gjdanawa_uploader.utils.crawling --budget 100
+"""
+
+import re
+import sys
+import argparse
+import subprocess
+
+from gjdanawa_uploader.core.utils import tprint
+
+
+# Module -> cumulative import time budget (ms)
+IMPORT_BUDGETS = {
+    "gjdanawa_uploader.configs": 50,
+    "gjdanawa_uploader.core.utils": 50,
+    "gjdanawa_uploader.utils.crawling": 100,
+    "gjdanawa_uploader.crawler.base_crawler": 250,
+    "gjdanawa_uploader.crawler.danawa.danawa_crawler": 300,
+    "gjdanawa_uploader.crawler.m11st.m11st_crawler": 300,
+    "gjdanawa_uploader.crawler.navershopping.navershopping_crawler": 300,
+    "gjdanawa_uploader.crawler.multi_marketplace": 300,
+}
+# Heavy dependencies (and their submodules) that importing a module should not import
+HEAVY_MODULES = (
+    "numpy",
+    "pandas",
+    "PIL",
+    "requests",
+    "pyarrow",
+    "openai",
+    "langchain",
+    "langchain_core",
+    "langchain_openai",
+    "elasticsearch",
+    "redis",
+    "undetected_chromedriver",
+    "selenium.webdriver.remote",
+    "selenium.webdriver.support",
+    "selenium.webdriver.chrome",
+)
+N_RUNS = 3  # the fastest run is used (the first run reads files from a cold disk cache)
+
+# Top-level names of modules that are not third-party dependencies
+THIRD_PARTY_EXCLUDED = sys.stdlib_module_names | {"gjdanawa_uploader"}
+
+# import time: {self (us)} | {cumulative (us)} | {indent}{module}
+IMPORT_TIME_LINE = re.compile(r"^import time:\s*(\d+) \|\s*(\d+) \|( *)(\S+)$", re.M)
+
+
+def import_module(module: str, *options: str) -> tuple[set[str], str]:
+    """Import the module in a fresh interpreter
+
+    Args:
+        options (str): Interpreter options (e.g. "-X", "importtime")
+
+    Returns:
+        tuple[set[str], str]: Imported modules and stderr of the interpreter
+    """
+    code = f"import sys, {module}; print(*sys.modules, sep='\\n')"
+    result = subprocess.run(
+        [sys.executable, *options, "-c", code], capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        error = result.stderr.strip().splitlines()[-1]
+        raise ImportError(f"Failed to import {module}: {error}")
+    return set(result.stdout.split()), result.stderr
+
+
+def find_heavy_imports(module: str) -> list[str]:
+    """Heavy modules (`HEAVY_MODULES`) imported by importing the module"""
+    imported, _ = import_module(module)
+    return sorted(
+        heavy
+        for heavy in HEAVY_MODULES
+        if heavy in imported or any(name.startswith(f"{heavy}.") for name in imported)
+    )
+
+
+def measure_import_time(module: str) -> dict:
+    """Import the module in a fresh interpreter
+
+    Returns:
+        dict: Cumulative import time of the module (ms) and its slowest dependency
+    """
+    # Imported modules are also printed: failed optional imports (e.g.
+    # `org.python.core` tried by `copy`) are timed, but they are not dependencies
+    imported, stderr = import_module(module, "-X", "importtime")
+    elapsed_time, dependencies = 0.0, {}
+    for _, cumulative, _, name in IMPORT_TIME_LINE.findall(stderr):
+        if name == "site":
+            # Imported at interpreter startup
+            dependencies.clear()
+        elif name == module:
+            elapsed_time = int(cumulative) / 1000
+        elif name in imported and name.split(".")[0] not in THIRD_PARTY_EXCLUDED:
+            # Third-party packages (the first import is the slowest)
+            dependencies.setdefault(name, int(cumulative) / 1000)
+    slowest = max(dependencies, key=dependencies.get, default=None)
+    return dict(
+        elapsed_time=elapsed_time,
+        slowest_dependency=slowest and f"{slowest} ({dependencies[slowest]:.1f}ms)",
+    )
+
+
+def check_import_times(budgets: dict[str, float], n_runs: int = N_RUNS) -> list[dict]:
+    """Measure import times of the modules and compare them with their budgets (ms)"""
+    results = []
+    for module, budget in budgets.items():
+        try:
+            runs = [measure_import_time(module) for _ in range(n_runs)]
+            result = min(runs, key=lambda run: run["elapsed_time"])
+            result["heavy_imports"] = find_heavy_imports(module)
+            if result["heavy_imports"]:
+                status = "heavy imports"
+            elif result["elapsed_time"] > budget:
+                status = "over budget"
+            else:
+                status = "ok"
+        except ImportError as e:
+            print(f"[Failure] {e}")
+            result = dict(
+                elapsed_time=None, slowest_dependency=None, heavy_imports=None
+            )
+            status = "failed"
+        results.append(dict(module=module, budget=budget, status=status, **result))
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import time benchmark")
+    parser.add_argument("--modules", nargs="+", default=list(IMPORT_BUDGETS))
+    parser.add_argument("--budget", type=float, help="Budget of all modules (ms)")
+    parser.add_argument("--n_runs", type=int, default=N_RUNS)
+    args = parser.parse_args()
+
+    budgets = {
+        module: args.budget or IMPORT_BUDGETS.get(module, max(IMPORT_BUDGETS.values()))
+        for module in args.modules
+    }
+    results = check_import_times(budgets, args.n_runs)
+    tprint(results)
+
+    # Non-zero exit status over budget (e.g. to fail CI)
+    n_failed = sum(result["status"] != "ok" for result in results)
+    if n_failed:
+        print(
+            f"[Failure] {n_failed}/{len(results)} modules are over budget, "
+            "import heavy modules or failed"
+        )
+        sys.exit(1)
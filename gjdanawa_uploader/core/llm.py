@@ -1,26 +1,130 @@
-"""LLM utility module"""
+"""LLM utility module
 
-from os import environ as env
-import base64
-from io import BytesIO
-
-import requests
-
-from langchain_openai import (
-    ChatOpenAI,
-    OpenAIEmbeddings,
-    AzureChatOpenAI,
-    AzureOpenAIEmbeddings,
-)
+Clients are created (and optionally validated) on first use, so importing this
+module does not import langchain or make network requests.
+"""
 
-# from langchain_huggingface import HuggingFaceEmbeddings
+import os
+import json
+import hashlib
+import threading
+from os import environ as env
+from time import time
+from typing import Callable
 
 from gjdanawa_uploader.core.utils import SINGLETON_MANAGER
-from gjdanawa_uploader.configs import CFG_LLM
+from gjdanawa_uploader.configs import CACHE_PATH, CFG_LLM
+from gjdanawa_uploader.core.config_schema import LLMModelConfig
 
 
 LLM_KEY = "llm"
 EMBEDDINGS_KEY = "embeddings"
+VALIDATION_CACHE_PATH = os.path.join(CACHE_PATH, "llm_validation.json")
+VALIDATION_TTL = 24 * 60 * 60  # seconds
+_LOCK = threading.RLock()
+
+
+############################################################
+# Lazy client
+############################################################
+class LazyClient:
+    """Thread-safe proxy creating the client on first use.
+
+    Attributes are read from the client, so the proxy is used like the client.
+    Pass `.get()` where the client itself is needed (e.g. `prompt | CHAT_LLM.get()`).
+
+    Example:
+        >>> CHAT_LLM = LazyClient(get_llm, "azure")
+        >>> CHAT_LLM.invoke("Hello")  # created here
+    """
+
+    def __init__(self, factory: Callable, *args, **kwargs):
+        self._factory = factory
+        self._args = args
+        self._kwargs = kwargs
+        self._client = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        """Get the client (created on first use)"""
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = self._factory(*self._args, **self._kwargs)
+        return self._client
+
+    @property
+    def initialized(self) -> bool:
+        return self._client is not None
+
+    def __getattr__(self, name: str):
+        if name.startswith("_"):
+            # Not initialized (e.g. while unpickling)
+            raise AttributeError(name)
+        return getattr(self.get(), name)
+
+    def __repr__(self) -> str:
+        state = "initialized" if self.initialized else "not initialized"
+        return f"{self.__class__.__name__}({self._factory.__name__}, {state})"
+
+
+############################################################
+# Validation
+############################################################
+def validate_client(
+    name: str, check: Callable[[], object], ttl: float = VALIDATION_TTL
+):
+    """Validate the client credentials once per TTL
+
+    Validations are cached in `VALIDATION_CACHE_PATH`, keyed by the client name
+    (model, deployment and a hash of the API key), so later runs do not repeat them.
+
+    Args:
+        name (str): Client name
+        check (Callable): Request that fails with invalid credentials
+        ttl (float, optional): Seconds a validation is valid
+    """
+    key = hashlib.sha1(name.encode()).hexdigest()
+    with _LOCK:
+        cache = _load_validation_cache()
+        if time() - cache.get(key, 0) < ttl:
+            return
+        check()
+        cache[key] = time()
+        _save_validation_cache(cache)
+
+
+def _load_validation_cache() -> dict:
+    try:
+        with open(VALIDATION_CACHE_PATH, "r", encoding="utf8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_validation_cache(cache: dict):
+    os.makedirs(os.path.dirname(VALIDATION_CACHE_PATH), exist_ok=True)
+    tmp_path = f"{VALIDATION_CACHE_PATH}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf8") as f:
+        json.dump(cache, f)
+    os.replace(tmp_path, VALIDATION_CACHE_PATH)
+
+
+def _client_name(*parts, openai_api_key: str | None = None) -> str:
+    """Client name with a hash of the API key used by the client
+
+    Args:
+        openai_api_key (str, optional): "azure" (key in the environment), OpenAI API key
+            or None (key in the environment)
+    """
+    if openai_api_key == "azure":
+        api_key = env.get("AZURE_OPENAI_API_KEY", "")
+    elif openai_api_key is None:
+        api_key = env.get("OPENAI_API_KEY", "")
+    else:
+        api_key = openai_api_key
+    api_key_hash = hashlib.sha1(api_key.encode()).hexdigest()[:8]
+    return "|".join(map(str, (*parts, api_key_hash)))
 
 
 ############################################################
@@ -28,28 +132,46 @@ EMBEDDINGS_KEY = "embeddings"
 ############################################################
 def get_llm(
     openai_api_key: str | None = None,
-    configs_chat_openai: dict = CFG_LLM.chat_openai,
+    configs_chat_openai: LLMModelConfig = CFG_LLM.chat_openai,
+    validate: bool = False,
 ):
-    """Get llm instance"""
-    key = (openai_api_key, LLM_KEY)
-    if not SINGLETON_MANAGER.has_instance(key):
-        if openai_api_key == "azure":
-            llm = get_azure_chat_openai(configs_chat_openai)
-        elif openai_api_key:
-            llm = get_chat_openai(openai_api_key, configs_chat_openai)
-        else:
-            raise ValueError(f"Invalid openai_api_key: {openai_api_key}")
+    """Get llm instance
 
+    Args:
+        openai_api_key (str, optional): "azure" or OpenAI API key
+        validate (bool, optional): Validate the API key with a request (cached)
+    """
+    key = (openai_api_key, LLM_KEY)
+    with _LOCK:
+        if not SINGLETON_MANAGER.has_instance(key):
+            if openai_api_key == "azure":
+                llm = get_azure_chat_openai(configs_chat_openai)
+            elif openai_api_key:
+                llm = get_chat_openai(openai_api_key, configs_chat_openai)
+            else:
+                raise ValueError(f"Invalid openai_api_key: {openai_api_key}")
+            SINGLETON_MANAGER.set_instance(key, llm)
+        llm = SINGLETON_MANAGER.get_instance(key)
+
+    if validate:
         # Validate openai_api_key
-        llm.invoke("")
-        SINGLETON_MANAGER.set_instance(key, llm)
-    return SINGLETON_MANAGER.get_instance(key)
+        name = _client_name(
+            LLM_KEY,
+            openai_api_key == "azure",
+            llm.model_name,
+            openai_api_key=openai_api_key,
+        )
+        validate_client(name, lambda: llm.invoke(""))
+    return llm
 
 
 def get_chat_openai(
-    openai_api_key: str | None = None, configs_chat_openai: dict = CFG_LLM.chat_openai
-) -> ChatOpenAI:
+    openai_api_key: str | None = None,
+    configs_chat_openai: LLMModelConfig = CFG_LLM.chat_openai,
+) -> "ChatOpenAI":
     """Get ChatOpenAI instance"""
+    from langchain_openai import ChatOpenAI
+
     if openai_api_key is None:
         openai_api_key = env["OPENAI_API_KEY"]
     return ChatOpenAI(
@@ -60,9 +182,11 @@ def get_chat_openai(
 
 
 def get_azure_chat_openai(
-    configs_chat_openai: dict = CFG_LLM.chat_openai,
-) -> AzureChatOpenAI:
+    configs_chat_openai: LLMModelConfig = CFG_LLM.chat_openai,
+) -> "AzureChatOpenAI":
     """Get AzureChatOpenAI instance"""
+    from langchain_openai import AzureChatOpenAI
+
     return AzureChatOpenAI(
         # azure_endpoint=env["AZURE_OPENAI_ENDPOINT"],
         deployment_name=env["AZURE_OPENAI_LLM_DEPLOYMENT_NAME"],
@@ -77,28 +201,46 @@ def get_azure_chat_openai(
 # Embeddings
 ############################################################
 def get_embeddings(
-    openai_api_key: str | None = None, configs_emb: dict = CFG_LLM.openai_embeddings
+    openai_api_key: str | None = None,
+    configs_emb: LLMModelConfig = CFG_LLM.openai_embeddings,
+    validate: bool = False,
 ):
-    """Get embeddings instance"""
-    key = (openai_api_key, EMBEDDINGS_KEY)
-    if not SINGLETON_MANAGER.has_instance(key):
-        if openai_api_key == "azure":
-            emb = get_azure_embeddings(configs_emb)
-        elif openai_api_key is None:
-            emb = get_openai_embeddings(configs_emb)
-        else:
-            raise ValueError(f"Invalid openai_api_key: {openai_api_key}")
+    """Get embeddings instance
 
+    Args:
+        openai_api_key (str, optional): "azure" or None (OpenAI API key in the environment)
+        validate (bool, optional): Validate the API key with a request (cached)
+    """
+    key = (openai_api_key, EMBEDDINGS_KEY)
+    with _LOCK:
+        if not SINGLETON_MANAGER.has_instance(key):
+            if openai_api_key == "azure":
+                emb = get_azure_embeddings(configs_emb)
+            elif openai_api_key is None:
+                emb = get_openai_embeddings(configs_emb)
+            else:
+                raise ValueError(f"Invalid openai_api_key: {openai_api_key}")
+            SINGLETON_MANAGER.set_instance(key, emb)
+        emb = SINGLETON_MANAGER.get_instance(key)
+
+    if validate:
         # Validate openai_api_key
-        emb.embed_query("")
-        SINGLETON_MANAGER.set_instance(key, emb)
-    return SINGLETON_MANAGER.get_instance(key)
+        name = _client_name(
+            EMBEDDINGS_KEY,
+            openai_api_key == "azure",
+            emb.model,
+            openai_api_key=openai_api_key,
+        )
+        validate_client(name, lambda: emb.embed_query(""))
+    return emb
 
 
 def get_openai_embeddings(
-    configs_emb: dict = CFG_LLM.openai_embeddings,
-) -> OpenAIEmbeddings:
+    configs_emb: LLMModelConfig = CFG_LLM.openai_embeddings,
+) -> "OpenAIEmbeddings":
     """Get OpenAIEmbeddings instance"""
+    from langchain_openai import OpenAIEmbeddings
+
     return OpenAIEmbeddings(
         # openai_api_key=openai_api_key,
         model=configs_emb.model,
@@ -106,9 +248,11 @@ def get_openai_embeddings(
 
 
 def get_azure_embeddings(
-    configs_emb: dict = CFG_LLM.openai_embeddings,
-) -> AzureOpenAIEmbeddings:
+    configs_emb: LLMModelConfig = CFG_LLM.openai_embeddings,
+) -> "AzureOpenAIEmbeddings":
     """Get AzureEmbeddings instance"""
+    from langchain_openai import AzureOpenAIEmbeddings
+
     return AzureOpenAIEmbeddings(
         # azure_endpoint=env["AZURE_OPENAI_ENDPOINT"],
         deployment=env["AZURE_OPENAI_EMBEDDINGS_DEPLOYMENT"],
@@ -196,5 +340,5 @@ def trace_chain():
 ############################################################
 # Constants
 ############################################################
-CHAT_LLM = get_llm("azure")
-EMBEDDINGS = get_embeddings("azure")
+CHAT_LLM = LazyClient(get_llm, "azure", validate=True)
+EMBEDDINGS = LazyClient(get_embeddings, "azure", validate=True)
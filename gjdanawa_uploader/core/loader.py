@@ -20,5 +20,5 @@ ls_file = lambda path: [path for path in glob(f"{path}/*") if isfile(path)]
 def load_yaml(path: str) -> dict:
     """Load yaml file."""
     with open(path, "r") as f:
-        config = yaml.safe_load(f)
+        config = yaml.load(f, Loader=getattr(yaml, "CSafeLoader", yaml.SafeLoader))
     return config
@@ -0,0 +1,303 @@
+"""Profiler class.
+
+Aggregate `@D` spans of a crawl into a run profile report (JSON/HTML).
+
+Each crawl has its own profiler, activated in the crawl's context (a context
+variable), so concurrent crawls (e.g. in orchestrator threads) do not mix
+their spans. `PROFILER` records to the profiler of the current context.
+"""
+
+import os
+import json
+import threading
+import contextlib
+from contextvars import ContextVar
+from html import escape
+from collections import defaultdict
+from datetime import datetime
+from time import perf_counter, thread_time
+
+
+# Function name -> crawl phase
+PHASES = {
+    "_load_search_page": "search_load",
+    "_get_listing_elements_in_page": "listing_scroll",
+    "_extract_listing": "listing_extract",
+    "_load_review_page": "review_page_load",
+    "_get_review_infos": "review_extract",
+    "_load": "es_load",
+}
+N_SLOWEST = 20
+
+
+def span_key(args: tuple, kwargs: dict) -> str | None:
+    """Get the listing URL or URL of a span from the function arguments"""
+    for arg in (*args, *kwargs.values()):
+        if isinstance(arg, dict) and arg.get("listing_url"):
+            return arg["listing_url"]
+        if isinstance(arg, str) and arg.startswith(("http://", "https://")):
+            return arg
+    return None
+
+
+class Profiler:
+    """Run profiler of a crawl.
+
+    Spans are recorded only while the profiler is active. The time breakdown is
+    measured on the thread running the crawl (sleep and CPU time of the thread),
+    sleeps of other threads (e.g. review workers) are reported separately.
+
+    Example:
+        >>> profiler = Profiler()
+        >>> with profiler.activate(marketplace="danawa"):
+        ...     with PROFILER.span("_load_search_page"):  # recorded to `profiler`
+        ...         load_url(driver, url)
+        >>> profiler.save("profiles", "danawa")
+    """
+
+    def __init__(self):
+        self.active = False
+        self.meta = {}
+        self.spans = []
+        self.sleep_time = 0.0
+        self.worker_sleep_time = 0.0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def start(self, **meta):
+        """Start recording spans (on the crawl thread)"""
+        self.active = True
+        self.meta = dict(meta, started_at=datetime.now().isoformat())
+        self.spans = []
+        self.sleep_time = 0.0
+        self.worker_sleep_time = 0.0
+        self._thread_id = threading.get_ident()
+        self._wall_start = perf_counter()
+        self._cpu_start = thread_time()
+
+    def stop(self):
+        """Stop recording spans (on the crawl thread)"""
+        self.active = False
+        self.wall_time = perf_counter() - self._wall_start
+        self.cpu_time = thread_time() - self._cpu_start
+
+    @contextlib.contextmanager
+    def activate(self, **meta):
+        """Record spans of the current context (`PROFILER`) until the block exits"""
+        token = _CURRENT_PROFILER.set(self)
+        self.start(**meta)
+        try:
+            yield self
+        finally:
+            self.stop()
+            _CURRENT_PROFILER.reset(token)
+
+    @property
+    def _stack(self) -> list:
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    @contextlib.contextmanager
+    def span(self, name: str, phase: str | None = None, key: str | None = None):
+        """Record the elapsed time of the code block"""
+        if not self.active:
+            yield
+            return
+
+        phase = phase or PHASES.get(name)
+        stack = self._stack
+        # Nested spans of the same phase are counted once
+        if phase in (frame[1] for frame in stack):
+            phase = None
+        stack.append((name, phase))
+        path = tuple(frame[0] for frame in stack)
+        start_time = perf_counter()
+        try:
+            yield
+        finally:
+            elapsed_time = perf_counter() - start_time
+            stack.pop()
+            with self._lock:
+                self.spans.append(
+                    dict(path=path, phase=phase, key=key, elapsed=elapsed_time)
+                )
+
+    def record_sleep(self, seconds: float):
+        """Record explicit sleep time (of the crawl thread or other threads)"""
+        if self.active:
+            with self._lock:
+                if threading.get_ident() == self._thread_id:
+                    self.sleep_time += seconds
+                else:
+                    self.worker_sleep_time += seconds
+
+    ############################################################
+    # Report
+    ############################################################
+    def report(self) -> dict:
+        """Aggregate recorded spans"""
+        # 1. Time per phase
+        phases = defaultdict(lambda: dict(total=0.0, count=0))
+        for span in self.spans:
+            if span["phase"]:
+                phases[span["phase"]]["total"] += span["elapsed"]
+                phases[span["phase"]]["count"] += 1
+
+        # 2. Sleep / browser / CPU time of the crawl thread
+        browser_time = max(self.wall_time - self.sleep_time - self.cpu_time, 0.0)
+        breakdown = dict(
+            wall=self.wall_time,
+            sleep=self.sleep_time,
+            browser=browser_time,
+            cpu=self.cpu_time,
+            worker_sleep=self.worker_sleep_time,
+        )
+
+        # 3. Slowest listings/URLs
+        keyed_spans = [span for span in self.spans if span["key"]]
+        keyed_spans.sort(key=lambda span: span["elapsed"], reverse=True)
+        slowest = [
+            dict(
+                key=span["key"],
+                name=span["path"][-1],
+                phase=span["phase"],
+                elapsed=span["elapsed"],
+            )
+            for span in keyed_spans[:N_SLOWEST]
+        ]
+
+        return dict(
+            meta=self.meta,
+            breakdown=breakdown,
+            phases=dict(phases),
+            flamegraph=self._build_flamegraph(),
+            slowest=slowest,
+        )
+
+    def _build_flamegraph(self) -> dict:
+        """Merge span paths into a call tree"""
+        root = dict(name="run", total=0.0, count=0, children={})
+        for span in self.spans:
+            node = root
+            for name in span["path"]:
+                node = node["children"].setdefault(
+                    name, dict(name=name, total=0.0, count=0, children={})
+                )
+            node["total"] += span["elapsed"]
+            node["count"] += 1
+        root["total"] = sum(child["total"] for child in root["children"].values())
+
+        def _to_list(node: dict) -> dict:
+            children = sorted(
+                node["children"].values(), key=lambda c: c["total"], reverse=True
+            )
+            return dict(node, children=[_to_list(child) for child in children])
+
+        return _to_list(root)
+
+    def save(self, dir_path: str, name: str) -> dict:
+        """Save the report as JSON and HTML artifacts"""
+        os.makedirs(dir_path, exist_ok=True)
+        report = self.report()
+        paths = dict(
+            json=os.path.join(dir_path, f"{name}.json"),
+            html=os.path.join(dir_path, f"{name}.html"),
+        )
+        with open(paths["json"], "w", encoding="utf8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        with open(paths["html"], "w", encoding="utf8") as f:
+            f.write(render_html(report))
+        return paths
+
+
+def render_html(report: dict) -> str:
+    """Render the report as a standalone HTML page"""
+    wall_time = report["breakdown"]["wall"] or 1e-9
+
+    def _bar(label: str, seconds: float, total: float = wall_time) -> str:
+        width = 100 * seconds / total if total else 0
+        return (
+            f"<tr><td>{escape(str(label))}</td><td>{seconds:.2f}s</td>"
+            f"<td><div class='bar' style='width:{width:.1f}%'></div></td></tr>"
+        )
+
+    def _flame(node: dict, total: float) -> str:
+        width = 100 * node["total"] / total if total else 0
+        children = "".join(_flame(child, node["total"]) for child in node["children"])
+        return (
+            f"<div class='frame' style='width:{width:.1f}%' "
+            f"title='{escape(node['name'])} | {node['total']:.2f}s x{node['count']}'>"
+            f"<span>{escape(node['name'])}</span>"
+            f"<div class='children'>{children}</div></div>"
+        )
+
+    breakdown = "".join(
+        _bar(key, val) for key, val in report["breakdown"].items() if key != "wall"
+    )
+    phases = "".join(
+        _bar(f"{phase} (x{val['count']})", val["total"])
+        for phase, val in report["phases"].items()
+    )
+    slowest = "".join(
+        f"<tr><td>{escape(span['key'])}</td><td>{escape(span['name'])}</td>"
+        f"<td>{span['elapsed']:.2f}s</td></tr>"
+        for span in report["slowest"]
+    )
+    meta = escape(json.dumps(report["meta"], ensure_ascii=False))
+    flamegraph = report["flamegraph"]
+    return f"""<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>Crawl profile</title>
+<style>
+  body {{ font-family: sans-serif; font-size: 13px; }}
+  table {{ border-collapse: collapse; width: 100%; }}
+  td {{ padding: 2px 6px; white-space: nowrap; }}
+  .bar {{ background: #e8743b; height: 12px; }}
+  .frame {{ display: inline-block; vertical-align: top; box-sizing: border-box; }}
+  .frame > span {{ display: block; overflow: hidden; background: #f5b041;
+                   border: 1px solid #fff; padding: 1px 3px; }}
+  .children {{ display: flex; }}
+</style>
+</head>
+<body>
+<h2>Crawl profile</h2>
+<p>{meta}</p>
+<p>Wall time: {wall_time:.2f}s</p>
+<h3>Time breakdown</h3>
+<table>{breakdown}</table>
+<h3>Phases</h3>
+<table>{phases}</table>
+<h3>Flame graph</h3>
+<div class="children">{_flame(flamegraph, flamegraph["total"])}</div>
+<h3>Slowest listings/URLs</h3>
+<table>{slowest}</table>
+</body>
+</html>
+"""
+
+
+class CurrentProfiler:
+    """Profiler of the current context (no-op outside of an active profiler)"""
+
+    @property
+    def active(self) -> bool:
+        profiler = _CURRENT_PROFILER.get()
+        return profiler is not None and profiler.active
+
+    def span(self, name: str, phase: str | None = None, key: str | None = None):
+        """Record the elapsed time of the code block to the current profiler"""
+        if profiler := _CURRENT_PROFILER.get():
+            return profiler.span(name, phase=phase, key=key)
+        return contextlib.nullcontext()
+
+    def record_sleep(self, seconds: float):
+        """Record explicit sleep time to the current profiler"""
+        if profiler := _CURRENT_PROFILER.get():
+            profiler.record_sleep(seconds)
+
+
+_CURRENT_PROFILER: ContextVar[Profiler | None] = ContextVar("profiler", default=None)
+PROFILER = CurrentProfiler()
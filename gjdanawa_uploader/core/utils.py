@@ -3,21 +3,21 @@
 Commonly used functions and classes are here.
 """
 
+import threading
+import traceback
+from dataclasses import dataclass
+from typing import Callable
 from itertools import starmap
 from datetime import datetime
 
-import yaml
-import numpy as np
-from tabulate import tabulate
 
-# import tabulate
-from easydict import EasyDict
-from dask import delayed, compute
+def tprint(dic):
+    """Print with fancy 'psql' format"""
+    from tabulate import tabulate
+
+    print(tabulate(dic, headers="keys", tablefmt="psql"))
 
 
-tprint = lambda dic: print(
-    tabulate(dic, headers="keys", tablefmt="psql")
-)  # print with fancy 'psql' format
 vars_ = lambda obj: {k: v for k, v in vars(obj).items() if not k.startswith("__")}
 str2dt = lambda s, format="%Y-%m-%d": datetime.datetime.strptime(s, format)
 dt2str = lambda dt, format="%Y-%m-%d": dt.strftime(format)
@@ -45,6 +45,8 @@ def lmap(fn: callable, arr: list, scheduler: str | None = None) -> list:
             "threads",
             "processes",
         ], f"Invalid scheduler: {scheduler}"
+        from dask import delayed, compute
+
         tasks = [delayed(fn)(e) for e in arr]
         return list(compute(*tasks, scheduler=scheduler))
 
@@ -63,16 +65,149 @@ def lstarmap(fn: callable, *arrs, scheduler: str | None = None) -> list:
     Returns:
         list: List of results
     """
-    assert (
-        len(np.unqiue(lmap(len, arrs))) == 1
-    ), "All parameters should have same length."
+    assert len(set(map(len, arrs))) == 1, "All parameters should have same length."
     if scheduler is None:
-        return list(starmap(fn, arrs))
+        return list(starmap(fn, zip(*arrs)))
     else:
+        from dask import delayed, compute
+
         tasks = [delayed(fn)(*es) for es in zip(*arrs)]
         return list(compute(*tasks, scheduler=scheduler))
 
 
+@dataclass
+class ItemError:
+    """Error of an item in `pmap` (returned in place of the result)"""
+
+    index: int
+    error: str
+    traceback: str
+
+    def __bool__(self) -> bool:
+        return False
+
+
+# Resource of the current pool worker (process or thread)
+_WORKER = threading.local()
+
+
+def _init_worker(initializer: callable, initargs: tuple, finalizer: Callable | None):
+    import multiprocessing as mp
+    from multiprocessing.util import Finalize
+
+    _WORKER.resource = initializer(*initargs)
+    if finalizer is not None and mp.parent_process() is not None:
+        # Pool worker process: finalize on exit
+        Finalize(_WORKER, finalizer, args=(_WORKER.resource,), exitpriority=10)
+
+
+def _run_chunk(fn: callable, chunk: list[tuple[int, object]]) -> list:
+    """Apply the function to the items of a chunk (errors are isolated per item)"""
+    resource = getattr(_WORKER, "resource", None)
+    results = []
+    for index, item in chunk:
+        try:
+            result = fn(item) if resource is None else fn(resource, item)
+        except Exception as e:
+            result = ItemError(index, repr(e), traceback.format_exc())
+        results.append(result)
+    return results
+
+
+def pmap(
+    fn: callable,
+    arr: list,
+    n_workers: int | None = None,
+    scheduler: str = "processes",
+    chunksize: int = 1,
+    initializer: Callable | None = None,
+    initargs: tuple = (),
+    finalizer: Callable | None = None,
+    on_progress: Callable | None = None,
+    raise_errors: bool = False,
+) -> list:
+    """Parallel map with a resource per worker.
+
+    Each worker (process or thread) calls `initializer(*initargs)` once and
+    the resource (e.g. a Chrome driver) is passed to `fn(resource, item)`.
+
+    Args:
+        fn (callable): Function to apply, `fn(item)` or `fn(resource, item)` with initializer
+        arr (list): List to apply function
+        n_workers (int, optional): Number of workers. Defaults to the number of CPUs.
+        scheduler (str, optional): "processes" | "threads". Defaults to "processes".
+        chunksize (int, optional): Number of items per task. Defaults to 1.
+        initializer (callable, optional): Create the resource of a worker
+        initargs (tuple, optional): Arguments of the initializer
+        finalizer (callable, optional): Release the resource, `finalizer(resource)`
+        on_progress (callable, optional): Called with `(n_done, n_total)` as chunks finish
+        raise_errors (bool, optional): Raise on the first failed item instead of returning `ItemError`
+
+    Returns:
+        list: Results in the input order (`ItemError` for failed items)
+
+    Example:
+        >>> pmap(extract, urls, n_workers=4, initializer=get_chrome_driver, finalizer=quit_driver)
+    """
+    import multiprocessing as mp
+    from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+    assert scheduler in ["processes", "threads"], f"Invalid scheduler: {scheduler}"
+    items = list(enumerate(arr))
+    chunks = [items[i : i + chunksize] for i in range(0, len(items), chunksize)]
+    n_workers = min(n_workers or mp.cpu_count(), max(len(chunks), 1))
+
+    # 1. Set worker initializer
+    pool_kwargs = {}
+    resources = []
+    if initializer is not None:
+        if scheduler == "threads":
+            # Threads are finalized after the pool is shut down
+            def _init_thread():
+                _init_worker(initializer, initargs, None)
+                resources.append(_WORKER.resource)
+
+            pool_kwargs = dict(initializer=_init_thread)
+        else:
+            pool_kwargs = dict(
+                initializer=_init_worker, initargs=(initializer, initargs, finalizer)
+            )
+
+    # 2. Run chunks
+    Executor = ProcessPoolExecutor if scheduler == "processes" else ThreadPoolExecutor
+    results = [None] * len(items)
+    n_done = 0
+    try:
+        with Executor(max_workers=n_workers, **pool_kwargs) as executor:
+            futures = {
+                executor.submit(_run_chunk, fn, chunk): chunk for chunk in chunks
+            }
+            for future in as_completed(futures):
+                chunk = futures[future]
+                try:
+                    chunk_results = future.result()
+                except Exception as e:
+                    # The chunk is not run (e.g. pickling error, crashed worker)
+                    chunk_results = [
+                        ItemError(index, repr(e), traceback.format_exc())
+                        for index, _ in chunk
+                    ]
+                for (index, _), result in zip(chunk, chunk_results):
+                    if raise_errors and isinstance(result, ItemError):
+                        # Pending chunks are cancelled (running chunks are waited for)
+                        executor.shutdown(wait=False, cancel_futures=True)
+                        raise RuntimeError(f"Item {index} failed\n{result.traceback}")
+                    results[index] = result
+                n_done += len(chunk)
+                if on_progress:
+                    on_progress(n_done, len(items))
+    finally:
+        if finalizer is not None:
+            for resource in resources:
+                finalizer(resource)
+    return results
+
+
 def str2bool(s: str | bool) -> bool:
     """String to boolean."""
     if isinstance(s, bool):
@@ -113,7 +248,7 @@ class SingletonManager:
     """
 
     def __new__(cls):
-        if not hasattr(cls, "instance"):
+        if not hasattr(cls, "instances"):
             cls.instances = {}
         return super().__new__(cls)
 
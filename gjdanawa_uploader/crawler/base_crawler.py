@@ -1,23 +1,86 @@
 """Base Crawler: superclass for all crawler classes"""
 
+from __future__ import annotations
+
+import inspect
+import importlib
+import contextlib
 import traceback
 from datetime import datetime
 from abc import ABCMeta, abstractmethod
 import uuid
+from os.path import join
+from typing import TYPE_CHECKING
 
 from selenium import webdriver
 
 from gjdanawa_uploader.core.depth_logging import D
+from gjdanawa_uploader.core.profiler import Profiler
+from gjdanawa_uploader.core.extraction import LLMExtractor, TASKS
 from gjdanawa_uploader.configs import (
+    PROFILE_PATH,
+    CHECKPOINT_PATH,
+    CACHE_PATH,
     CFG_CRAWLER,
     CFG_ES,
     METADATA,
     FIELD_DESCRIPTIONS,
 )
-from gjdanawa_uploader.utils.crawling import get_chrome_driver
-from gjdanawa_uploader.utils.elasticsearch.elasticsearch_manager import (
-    ElasticSearchManager,
+from gjdanawa_uploader.utils.crawling import (
+    INFINITY,
+    get_chrome_driver,
+    load_url,
+    bind_rate_limiter,
+)
+from gjdanawa_uploader.utils.rate_limiter import get_rate_limiter
+from gjdanawa_uploader.utils.page_cache import PageCache
+from gjdanawa_uploader.utils.listing_index import CANONICALIZER, ListingIndex
+from gjdanawa_uploader.utils.prefetch import TabPrefetcher
+from gjdanawa_uploader.utils.checkpoint import CrawlCheckpoint
+from gjdanawa_uploader.utils.broker import Job, JobResult
+from gjdanawa_uploader.utils.network_capture import NetworkCapture, extract_records
+from gjdanawa_uploader.utils.parquet_sink import ParquetSink, get_sink
+from gjdanawa_uploader.utils.storage import Storage, get_storage
+
+if TYPE_CHECKING:
+    from gjdanawa_uploader.utils.http import HttpClient
+    from gjdanawa_uploader.core.embedding import EmbeddingService
+    from gjdanawa_uploader.core.config_schema import MarketplaceMetadata
+
+
+# Marketplace -> crawler module (imported on demand)
+CRAWLER_MODULES = {
+    "danawa": "gjdanawa_uploader.crawler.danawa.danawa_crawler",
+    "m11st": "gjdanawa_uploader.crawler.m11st.m11st_crawler",
+    "navershopping": "gjdanawa_uploader.crawler.navershopping.navershopping_crawler",
+}
+CRAWLERS: dict[str, type["BaseCrawler"]] = {}
+
+# Listing fields copied to its reviews
+REVIEW_PREFIX_FIELDS = (
+    "session_id",
+    "marketplace",
+    "product_name",
+    "brand_name",
+    "query",
+    "listing_title",
+    "seller_name",
+    "listing_url",
+    "updated_at",
 )
+MAX_REVIEW_PREFIXES = 1024
+
+
+def get_crawler_class(marketplace: str) -> type["BaseCrawler"]:
+    """Get the registered crawler class of the marketplace"""
+    if marketplace not in CRAWLERS and marketplace in CRAWLER_MODULES:
+        importlib.import_module(CRAWLER_MODULES[marketplace])
+    if marketplace not in CRAWLERS:
+        raise ValueError(f"Invalid marketplace: {marketplace}")
+    cls = CRAWLERS[marketplace]
+    if inspect.isabstract(cls):
+        raise NotImplementedError(f"Crawler for {marketplace} is not implemented")
+    return cls
 
 
 class BaseCrawler(metaclass=ABCMeta):
@@ -28,28 +91,49 @@ class BaseCrawler(metaclass=ABCMeta):
     brand_name: str
     query: str
     session_id: str
+    reference_image_urls: list[str]
     current_time: datetime
     cfgs: dict
     chrome_option: str | None
+    extraction_mode: str
     driver: webdriver.Chrome
-    es_manager: ElasticSearchManager
-    metadata: dict
+    http_client: HttpClient
+    page_cache: PageCache | None
+    listing_index: ListingIndex
+    checkpoint: CrawlCheckpoint
+    prefetcher: TabPrefetcher | None
+    sink: ParquetSink | None
+    storage: Storage
+    metadata: MarketplaceMetadata
     search_url: str
     reviews_selectors: dict
     subinstance: object
 
+    def __init_subclass__(cls, **kwargs):
+        """Register crawlers defining their own marketplace"""
+        super().__init_subclass__(**kwargs)
+        if "marketplace" in cls.__dict__:
+            CRAWLERS[cls.marketplace] = cls
+
     def __init__(
         self,
         product_name: str,
         brand_name: str,
         session_id: str,
         chrome_option: str | None = None,
-        es_manager: ElasticSearchManager | None = None,
+        storage: Storage | None = None,
         reset_db: bool = False,
+        reference_image_urls: list[str] | None = None,
     ):
+        """
+        Args:
+            reference_image_urls (list[str], optional): Product images to filter listing
+                thumbnails with (marketplaces supporting it, e.g. navershopping)
+        """
         assert self.marketplace, "marketplace should be defined"
         self.product_name = product_name
         self.brand_name = brand_name
+        self.reference_image_urls = reference_image_urls or []
         self.query = self._get_search_query()
         self.session_id = session_id if session_id else str(uuid.uuid4())
         self.current_time = datetime.now().isoformat()
@@ -57,14 +141,36 @@ class BaseCrawler(metaclass=ABCMeta):
             "crawler": CFG_CRAWLER.marketplaces[self.marketplace],
             "es": CFG_ES,
         }
-        self.chrome_option = chrome_option
-        self.driver = get_chrome_driver(chrome_option)
-        if es_manager is None:
-            es_manager = ElasticSearchManager(reset=reset_db)
-        self.es_manager = es_manager
+        self.chrome_option = chrome_option or self.cfgs["crawler"].chrome_option
+        self.extraction_mode = self.cfgs["crawler"].extraction_mode
+        self._driver = None  # created on first use
+        self._owns_driver = False
+        self._http_client = None
+        self._page_cache = None
+        self._listing_index = None
+        self._llm_extractor = None
+        self._embedding_service = None
+        self.prefetcher = None
+        self.sink = None  # Parquet sink of a run (`parquet_export` config)
+        self._storage = storage  # created on first use
+        self._owns_storage = storage is None
+        self._reset_db = reset_db
         self.metadata = METADATA[self.marketplace]
-        kwargs = {self.metadata["query"]: self.query}
-        self.search_url = self.metadata["search_url"].format(**kwargs)
+        kwargs = {self.metadata.query: self.query}
+        self.search_url = self.metadata.search_url.format(**kwargs)
+
+        # Document templates (copied for each listing and review)
+        self._listing_template = dict.fromkeys(self.cfgs["es"].listings.fields)
+        self._listing_template.update(
+            session_id=self.session_id,
+            marketplace=self.marketplace,
+            product_name=self.product_name,
+            brand_name=self.brand_name,
+            query=self.query,
+            updated_at=self.current_time,
+        )
+        self._review_template = dict.fromkeys(self.cfgs["es"].reviews.fields)
+        self._review_prefixes: dict[int, tuple[dict, dict]] = {}
 
         # Update indices
         if reset_db:
@@ -72,22 +178,224 @@ class BaseCrawler(metaclass=ABCMeta):
 
     def __del__(self):
         """Destructor"""
-        self.driver.quit()
+        self._quit_driver()
+
+    @property
+    def driver(self) -> webdriver.Chrome:
+        """Chrome driver (created on first use)"""
+        if self._driver is None:
+            self._driver = get_chrome_driver(
+                self.chrome_option, capture_network=self.extraction_mode == "network"
+            )
+            bind_rate_limiter(self._driver, get_rate_limiter(self.marketplace))
+            self._owns_driver = True
+        return self._driver
+
+    @driver.setter
+    def driver(self, driver: webdriver.Chrome):
+        """Use an external driver (it is not quit by the crawler)"""
+        self._driver = driver
+        self._owns_driver = False
+
+    @property
+    def storage(self) -> Storage:
+        """Document storage of the `storage` config (created on first use)"""
+        if self._storage is None:
+            self._storage = get_storage(reset=self._reset_db)
+        return self._storage
+
+    @property
+    def http_client(self) -> HttpClient:
+        """HTTP client for pages that do not need a browser (created on first use)"""
+        if self._http_client is None:
+            from gjdanawa_uploader.utils.http import HttpClient
+
+            self._http_client = HttpClient(
+                limiter=get_rate_limiter(self.marketplace), cache=self.page_cache
+            )
+        return self._http_client
+
+    @property
+    def page_cache(self) -> PageCache | None:
+        """Page cache (None if disabled in `page_cache` config)"""
+        cfg = CFG_CRAWLER.get("page_cache", {})
+        if self._page_cache is None and cfg.get("enabled"):
+            self._page_cache = PageCache(join(CACHE_PATH, "pages"), ttl=cfg.ttl)
+        return self._page_cache
+
+    @property
+    def listing_index(self) -> ListingIndex:
+        """Index of products whose reviews are extracted in the session"""
+        if self._listing_index is None:
+            self._listing_index = ListingIndex(
+                join(CHECKPOINT_PATH, "listings.sqlite3"), self.session_id
+            )
+        return self._listing_index
+
+    @property
+    def llm_extractor(self) -> LLMExtractor | None:
+        """LLM field extractor (None if disabled in `llm_extraction` config)"""
+        cfg = CFG_CRAWLER.llm_extraction
+        if self._llm_extractor is None and cfg.enabled:
+            self._llm_extractor = LLMExtractor(
+                batch_size=cfg.batch_size,
+                max_concurrency=cfg.max_concurrency,
+                token_budget=cfg.token_budget,
+            )
+        return self._llm_extractor
+
+    @property
+    def embedding_service(self) -> EmbeddingService | None:
+        """Embedding service (None if disabled in `embedding` config)"""
+        cfg = CFG_CRAWLER.embedding
+        if self._embedding_service is None and cfg.enabled:
+            from gjdanawa_uploader.core.embedding import get_embedding_service
+
+            self._embedding_service = get_embedding_service(
+                batch_size=cfg.batch_size, max_concurrency=cfg.max_concurrency
+            )
+        return self._embedding_service
+
+    def _quit_driver(self):
+        """Quit the driver if it is created"""
+        if getattr(self, "_driver", None) is not None:
+            if self._owns_driver:
+                self._driver.quit()
+            self._driver = None
+
+    def close(self):
+        """Close the connections of the crawler (checkpoint, listing index, clients)
+
+        External drivers and storages are not closed.
+        """
+        if getattr(self, "checkpoint", None) is not None:
+            self.checkpoint.close()
+            self.checkpoint = None
+        for name in ("_listing_index", "_http_client"):
+            if getattr(self, name) is not None:
+                getattr(self, name).close()
+                setattr(self, name, None)
+        if self._owns_storage and self._storage is not None:
+            self._storage.close()
+            self._storage = None
+        self._quit_driver()
 
     @D
-    def run(self, n_listings: int | None = None, n_reviews: int | None = None):
-        """Run crawler"""
-        # Extract and load listings and reviews
-        infos = self._extract(n_listings, n_reviews)
-        self._load(infos)
-        self.driver.quit()
+    def run(
+        self,
+        n_listings: int | None = None,
+        n_reviews: int | None = None,
+        profile: bool = False,
+        resume: bool = False,
+    ):
+        """Run crawler
+
+        Args:
+            n_listings (int, optional): Number of listings to extract
+            n_reviews (int, optional): Number of reviews to extract per listing
+            profile (bool, optional): Save a run profile report (JSON/HTML) to `PROFILE_PATH`
+            resume (bool, optional): Continue from the checkpoint of the last failed run
+        """
+        self.checkpoint = CrawlCheckpoint(
+            join(CHECKPOINT_PATH, "crawls.sqlite3"), f"{self.marketplace}|{self.query}"
+        )
+        if not resume:
+            self.checkpoint.clear()
+
+        # Profiler of the crawl (spans of concurrent crawls are not mixed)
+        self.profiler = Profiler()
+        with contextlib.ExitStack() as stack:
+            if profile:
+                # Saved after the profiler is stopped (even if the crawl fails)
+                stack.callback(self._save_profile)
+                stack.enter_context(
+                    self.profiler.activate(
+                        marketplace=self.marketplace,
+                        query=self.query,
+                        session_id=self.session_id,
+                    )
+                )
+
+            # Reviews are streamed to Parquet files during the crawl
+            # (buffered rows are written even if the crawl fails)
+            self.sink = get_sink(self.session_id, transform=self._postprocess)
+            if self.sink is not None:
+                stack.callback(self._close_sink)
+
+            # Extract and load listings and reviews
+            infos = self._extract(n_listings, n_reviews)
+            self._extract_with_llm(infos)
+            self._embed(infos)
+            self._load(infos)
+
+        if self._page_cache is not None:
+            print(f"Page cache: {self._page_cache.report()}")
+
+        # Crawl is finished, the next run starts from the beginning
+        self.checkpoint.clear()
+        self._quit_driver()
         return infos
 
+    def _save_profile(self):
+        """Save the run profile report"""
+        name = f"{self.marketplace}_{self.session_id}_{datetime.now():%Y%m%d_%H%M%S}"
+        paths = self.profiler.save(PROFILE_PATH, name)
+        print(f"Profile saved: {paths['html']}")
+
+    @D
+    def _extract_with_llm(self, infos: dict, report: bool = True):
+        """Parse fields that selectors cannot parse with the LLM (`llm_extraction` config)"""
+        extractor = self.llm_extractor
+        if extractor is None:
+            return
+        for key, task_names in CFG_CRAWLER.llm_extraction.tasks.items():
+            for task_name in task_names:
+                extractor.extract_documents(infos.get(key, []), TASKS[task_name])
+        if report:
+            print(f"LLM extraction: {extractor.report()}")
+
+    @D
+    def _embed(self, infos: dict, report: bool = True):
+        """Embed text fields of the documents (`embedding` config)"""
+        service = self.embedding_service
+        if service is None:
+            return
+        from gjdanawa_uploader.core.embedding import embed_documents
+
+        embed_documents(service, infos, CFG_CRAWLER.embedding.fields)
+        if report:
+            print(f"Embedding: {service.stats}")
+
+    def _postprocess(self, kind: str, documents: list[dict]):
+        """Add LLM fields and embeddings to the documents (before they are exported)
+
+        Results are cached, so documents are not sent again after the crawl.
+        """
+        infos = {kind: documents}
+        self._extract_with_llm(infos, report=False)
+        self._embed(infos, report=False)
+
+    def _emit_reviews(self, review_infos: list[dict]):
+        """Stream extracted reviews of a listing to the Parquet sink of the run"""
+        if self.sink is not None:
+            self.sink.write("reviews", [info for info in review_infos if info])
+
+    def _close_sink(self):
+        """Write the buffered rows of the Parquet sink"""
+        self.sink.close()
+        print(f"Parquet export: {self.sink.stats} (path: {self.sink.path})")
+        self.sink = None
+
     @D
     def _load(self, infos: dict):
-        """Load listing and review information to Elasticsearch"""
+        """Load listing and review information to the storage (and listings to Parquet files)
+
+        Reviews are exported to Parquet files during the crawl (`_emit_reviews`).
+        """
         for key, data in infos.items():
-            self.es_manager.insert_documents(data, index=self.cfgs["es"][key]["index"])
+            self.storage.insert_documents(data, index=self.cfgs["es"][key].index)
+        if self.sink is not None:
+            self.sink.write("listings", infos.get("listings", []))
 
     ####################################################################################################
     # Abstract methods
@@ -99,6 +407,96 @@ class BaseCrawler(metaclass=ABCMeta):
         """Extract information from the crawler"""
         raise NotImplementedError
 
+    ####################################################################################################
+    # Job handlers (distributed workers)
+    ####################################################################################################
+    def handle_job(self, job: Job) -> JobResult:
+        """Handle a crawl job pulled from the broker
+
+        - search: queue the first listing page
+        - listing_page: save listings without reviews, queue review jobs and the next page
+        - reviews: save reviews and the listing (with distributions)
+
+        The result is committed with the job by `Broker.complete`.
+
+        Job payload: brand_name, product_name, session_id, n_listings, n_reviews,
+            reference_image_urls (+ page, listing_info)
+        """
+        if getattr(self, "checkpoint", None) is None:
+            # Review offsets are shared by workers retrying the same job
+            self.checkpoint = CrawlCheckpoint(
+                join(CHECKPOINT_PATH, "crawls.sqlite3"),
+                f"{self.marketplace}|{self.query}|{self.session_id}",
+            )
+
+        match job.kind:
+            case "search":
+                return self._handle_search(job)
+            case "listing_page":
+                return self._handle_listing_page(job)
+            case "reviews":
+                return self._handle_reviews(job)
+
+    def _handle_search(self, job: Job) -> JobResult:
+        """Queue the first listing page"""
+        n_listings = job.payload.get("n_listings") or self.cfgs["crawler"].n_listings
+        if n_listings == -1:
+            n_listings = INFINITY
+        payload = dict(job.payload, page=1, n_listings=n_listings)
+        return JobResult(jobs=[Job("listing_page", self.marketplace, payload)])
+
+    def _handle_listing_page(self, job: Job) -> JobResult:
+        """Extract listings of a page"""
+        page, n_listings = job.payload["page"], job.payload["n_listings"]
+
+        # 1. Extract listings of the page
+        listing_infos, has_next_page = self._extract_listing_page(page, n_listings)
+        listing_infos = listing_infos[:n_listings]
+
+        # 2. Queue reviews of listings, save the others (no reviews or duplicates)
+        result = JobResult(documents=dict(listings=[]))
+        for listing_info in listing_infos:
+            if listing_info["review_count"] and self._claim_listing(listing_info):
+                payload = dict(job.payload, listing_info=listing_info)
+                result.jobs.append(Job("reviews", self.marketplace, payload))
+            else:
+                result.documents["listings"].append(listing_info)
+
+        # 3. Queue the next page
+        n_remaining = n_listings - len(listing_infos)
+        if listing_infos and has_next_page and (n_remaining > 0):
+            payload = dict(job.payload, page=page + 1, n_listings=n_remaining)
+            result.jobs.append(Job("listing_page", self.marketplace, payload))
+        return result
+
+    def _handle_reviews(self, job: Job) -> JobResult:
+        """Extract reviews of a listing"""
+        listing_info = job.payload["listing_info"]
+        n_reviews = job.payload.get("n_reviews") or self.cfgs["crawler"].n_reviews
+        if n_reviews == -1:
+            n_reviews = INFINITY
+
+        review_infos = self._extract_review_page(listing_info, n_reviews)
+        if review_infos == [{}]:
+            # Extraction failed, the broker retries the job
+            raise RuntimeError(f"Extract reviews: {listing_info['listing_url']}")
+        return JobResult(documents=dict(reviews=review_infos, listings=[listing_info]))
+
+    def _extract_listing_page(
+        self, page: int, n_listings: int
+    ) -> tuple[list[dict], bool]:
+        """Extract listings of a search page (listings, whether there is a next page)
+
+        Args:
+            page (int): Page number (from 1)
+            n_listings (int): Number of remaining listings of the job
+        """
+        raise NotImplementedError(f"Listing page jobs of {self.marketplace}")
+
+    def _extract_review_page(self, listing_info: dict, n_reviews: int) -> list[dict]:
+        """Extract reviews of a listing (updates distributions of `listing_info`)"""
+        raise NotImplementedError(f"Review jobs of {self.marketplace}")
+
     ####################################################################################################
     # Utility methods
     ####################################################################################################
@@ -106,64 +504,122 @@ class BaseCrawler(metaclass=ABCMeta):
         """Update metadata, field descriptions indices"""
         # 1. Metadata
         index = CFG_ES.metadata.index
-        document = self.metadata
-        # query = {"query": {"term": {"marketplace.keyword": self.marketplace}}}
+        document = self.metadata.to_dict()
 
-        # Remove and insert new metadata
-        # self.es_manager.delete_documents(index, query)
-        self.es_manager.insert_document(document, index)
+        # Replace the metadata (upserted by the `id_fields` of the index)
+        self.storage.insert_document(document, index)
         print(f"Index updated: {index}")
 
         # 2. Field descriptions
         index = CFG_ES.field_descriptions.index
         document = FIELD_DESCRIPTIONS
 
-        # Remove and insert new metadata
-        # self.es_manager.delete_documents(index)
-        self.es_manager.insert_document(document, index)
+        self.storage.insert_document(document, index)
         print(f"Index updated: {index}")
 
+    @D
+    def _load_search_page(self, driver: webdriver.Chrome | None = None):
+        """Load search page"""
+        load_url(driver or self.driver, self.search_url)
+
     def _get_search_query(self) -> str:
         """Get search query"""
         return f"{self.brand_name} {self.product_name}"
 
     def _initialize_listing_info(self) -> dict:
-        """Initialize extracted listing information"""
-        # Load placeholder
-        keys = list(self.cfgs["es"]["listings"]["mappings"]["properties"])
-        extracted_info = {key: None for key in keys}
-
-        # Set common fields
-        extracted_info["session_id"] = self.session_id
-        extracted_info["marketplace"] = self.marketplace
-        extracted_info["product_name"] = self.product_name
-        extracted_info["brand_name"] = self.brand_name
-        extracted_info["query"] = self.query
-        extracted_info["updated_at"] = self.current_time
-        extracted_info["optional"] = {}
-        return extracted_info
+        """Initialize extracted listing information (copy of the listing template)"""
+        return {**self._listing_template, "optional": {}}
 
     def _initialize_review_info(self, listing_info: dict) -> dict:
-        """Initialize extracted review information"""
-        # Load placeholder
-        keys = list(self.cfgs["es"]["reviews"]["mappings"]["properties"])
-        extracted_info = {key: None for key in keys}
-
-        # Set common fields
-        for key in (
-            "session_id",
-            "marketplace",
-            "product_name",
-            "brand_name",
-            "query",
-            "listing_title",
-            "seller_name",
-            "listing_url",
-            "updated_at",
-        ):
-            extracted_info[key] = listing_info[key]
-        extracted_info["optional"] = {}
-        return extracted_info
+        """Initialize extracted review information
+
+        Reviews of a listing share its prefix (review template with the common
+        fields of the listing), built on the first review of the listing.
+        """
+        # NOTE: the listing is kept with its prefix, so its id is not reused
+        cached = self._review_prefixes.get(id(listing_info))
+        if cached is None or cached[0] is not listing_info:
+            if len(self._review_prefixes) >= MAX_REVIEW_PREFIXES:
+                self._review_prefixes.clear()
+            prefix = {**self._review_template}
+            prefix.update((key, listing_info[key]) for key in REVIEW_PREFIX_FIELDS)
+            cached = self._review_prefixes[id(listing_info)] = (listing_info, prefix)
+        return {**cached[1], "optional": {}}
+
+    def _claim_listing(self, listing_info: dict) -> bool:
+        """Claim the product of the listing for review extraction
+
+        Returns:
+            bool: False if reviews of the product are extracted from another listing
+        """
+        listing_url = listing_info["listing_url"]
+        if not listing_url:
+            return True
+        product_id = CANONICALIZER.product_id(listing_url)
+        listing_info["optional"]["product_id"] = product_id
+        if self.listing_index.claim(product_id, listing_url, self.marketplace):
+            return True
+        print(f"[Skip] Duplicate product: {product_id} (listing_url: {listing_url})")
+        return False
+
+    def _open_url(self, url: str):
+        """Load the URL (switching to its prefetched tab if available)"""
+        if self.prefetcher is not None:
+            self.prefetcher.open(url)
+        else:
+            load_url(self.driver, url)
+
+    @contextlib.contextmanager
+    def _prefetch(self, urls: list[str], page_type: str):
+        """Prefetch the URLs in background tabs while they are opened with `_open_url`
+
+        Args:
+            urls (list[str]): URLs in the order they are opened
+            page_type (str): "listing_pages" | "listings" (lookahead in `prefetch` config)
+        """
+        lookahead = self.cfgs["crawler"].prefetch.get(page_type, 0)
+        if (not lookahead) or (len(urls) < 2):
+            yield
+            return
+
+        phase = "search_load" if page_type == "listing_pages" else "review_page_load"
+        with TabPrefetcher(self.driver, urls, lookahead, phase=phase) as prefetcher:
+            self.prefetcher = prefetcher
+            try:
+                yield
+            finally:
+                self.prefetcher = None
+
+    def _get_backend(self, page_type: str) -> str:
+        """Get the backend of the page type ("selenium" | "http")"""
+        return self.cfgs["crawler"].backends.get(page_type, "selenium")
+
+    def _get_network_capture(self, kind: str) -> NetworkCapture | None:
+        """Get network capture of listings or reviews in network extraction mode"""
+        spec = self.cfgs["crawler"].network_capture.get(kind)
+        if (self.extraction_mode != "network") or (not spec):
+            return None
+        return NetworkCapture(self.driver, spec["url_patterns"])
+
+    def _parse_network_responses(
+        self,
+        kind: str,
+        responses: list[tuple[str, dict | list]],
+        listing_info: dict | None = None,
+    ) -> list[dict]:
+        """Parse listing or review information from captured JSON responses"""
+        spec = self.cfgs["crawler"].network_capture[kind]
+        infos = []
+        for _, payload in responses:
+            for record in extract_records(payload, spec["items_path"], spec["fields"]):
+                if kind == "listings":
+                    info = self._initialize_listing_info()
+                else:
+                    info = self._initialize_review_info(listing_info)
+                info["optional"].update(record.pop("optional"))
+                info.update(record)
+                infos.append(info)
+        return infos
 
     def _initialize_dist_info(self) -> dict:
         """Initialize distribution information"""
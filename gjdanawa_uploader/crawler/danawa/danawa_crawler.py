@@ -1,37 +1,53 @@
 """11st Crawler"""
 
+from __future__ import annotations
+
 import re
 import traceback
 from datetime import datetime
-
-from dask import delayed, compute
+from typing import TYPE_CHECKING
 
 from selenium import webdriver
-from selenium.webdriver.remote.webelement import WebElement
 from selenium.common.exceptions import (
     TimeoutException,
 )
 
 from gjdanawa_uploader.core.depth_logging import D
+from gjdanawa_uploader.core.profiler import PROFILER
+from gjdanawa_uploader.core.utils import pmap, ItemError
 from gjdanawa_uploader.utils.crawling import (
     INFINITY,
-    MINIMUM_SLEEP,
     ElementNotFoundException,
     find_element,
     find_elements,
     validate_listing_info,
     validate_review_info,
-    load_url,
     scroll,
     click,
     scroll_until,
     extract_price_per_unit,
     goto_next_page,
+    n_elements_changed,
 )
-from gjdanawa_uploader.crawler.base_crawler import BaseCrawler
-from gjdanawa_uploader.utils.elasticsearch.elasticsearch_manager import (
-    ElasticSearchManager,
+from gjdanawa_uploader.utils.html_element import HtmlElement
+from gjdanawa_uploader.utils.driver_scheduler import (
+    DriverScheduler,
+    map_elements,
+    snapshot_page,
 )
+from gjdanawa_uploader.utils.urls import set_query_params
+from gjdanawa_uploader.utils.rate_limiter import get_rate_limiter
+from gjdanawa_uploader.utils.checkpoint import CrawlCheckpoint
+from gjdanawa_uploader.crawler.base_crawler import BaseCrawler
+from gjdanawa_uploader.utils.storage import Storage
+
+if TYPE_CHECKING:
+    from selenium.webdriver.remote.webelement import WebElement
+
+    from gjdanawa_uploader.core.config_schema import MarketplaceMetadata
+
+
+MAX_PAGES = 100  # upper bound of search pages loaded by URL
 
 
 class DanawaCrawler(BaseCrawler):
@@ -51,8 +67,8 @@ class DanawaCrawler(BaseCrawler):
     cfgs: dict
     chrome_option: str | None
     driver: webdriver.Chrome
-    es_manager: ElasticSearchManager
-    metadata: dict
+    storage: Storage
+    metadata: MarketplaceMetadata
     search_url: str
     reviews_selectors: dict
     subinstance: object
@@ -64,22 +80,38 @@ class DanawaCrawler(BaseCrawler):
         """Extract information from the crawler"""
         # 1. Set n_listings, n_reviews
         if n_listings is None:
-            n_listings = self.cfgs["crawler"]["n_listings"]
+            n_listings = self.cfgs["crawler"].n_listings
         elif n_listings == -1:
             n_listings = INFINITY
 
         if n_reviews is None:
-            n_reviews = self.cfgs["crawler"]["n_reviews"]
+            n_reviews = self.cfgs["crawler"].n_reviews
         elif n_reviews == -1:
             n_reviews = INFINITY
 
-        # 2. Load search page
-        load_url(self.driver, self.search_url)
-
-        # 3. Extract listing information
-        listing_infos = self._extract_listings(n_listings)
+        # 2. Extract listing information
+        if self.checkpoint.get("listings_done"):
+            # 2.1 Listings are extracted in the last run
+            listing_infos, _ = self.checkpoint.load_listings()
+        else:
+            listing_infos = None
+            if self._get_backend("search") == "http":
+                # 2.2 Fetch server-rendered search pages without a browser
+                listing_infos = self._extract_listings_http(n_listings)
+            prefetch_cfg = self.cfgs["crawler"].prefetch
+            if (listing_infos is None) and prefetch_cfg.get("listing_pages"):
+                # 2.3 Load search pages by URL (next pages are prefetched)
+                listing_infos = self._extract_listings_by_url(n_listings)
+            elif listing_infos is None:
+                # 2.4 Load search page in the browser
+                self._load_search_page()
+                listing_infos = self._extract_listings(n_listings)
+            self.checkpoint.save_listings(
+                listing_infos, page=self.checkpoint.get("listings_page", 0)
+            )
+            self.checkpoint.set("listings_done", True)
 
-        # 4. Extract review information
+        # 3. Extract review information
         review_infos = self._extract_reviews(listing_infos, n_reviews)
 
         return dict(
@@ -91,26 +123,35 @@ class DanawaCrawler(BaseCrawler):
     def _extract_listings(self, n_listings: int) -> list[dict]:
         """Get listing information"""
         cur_page = 1
-        listing_infos_pages = []
+        listing_infos_pages, last_page = self.checkpoint.load_listings()
         while True:
-            # 1. Extract listing elements
-            listing_elems = self._get_listing_elements_in_page()
-
-            # 2. Extract information from element
-            tasks = [delayed(self._extract_listing)(elem) for elem in listing_elems]
-            listing_infos = list(compute(*tasks, scheduler="threads"))
-            listing_infos_pages.extend(listing_infos)
+            # NOTE: Pages extracted in the last run are skipped
+            if cur_page > last_page:
+                # 1. Extract listing elements
+                listing_elems = self._get_listing_elements_in_page()
+
+                # 2. Extract information from element
+                with PROFILER.span("_extract_listing"):
+                    listing_infos = map_elements(
+                        self.driver, self._extract_listing, listing_elems
+                    )
+                listing_infos_pages.extend(info for info in listing_infos if info)
+                self.checkpoint.save_listings(listing_infos_pages, page=cur_page)
 
             if len(listing_infos_pages) >= n_listings:
                 # 3.1 If the number of listings is satisfied, stop
                 break
             else:
                 # 3.2 If the number of listings is not satisfied, go to the next page
+                selectors = self._get_listings_selectors(
+                    "page_button", "view_more_page_button"
+                )
                 result = goto_next_page(
                     self.driver,
                     cur_page=cur_page,
-                    page_button_selector=self.metadata.listings_selectors.page_button,
-                    view_more_page_button_selector=self.metadata.listings_selectors.view_more_page_button,
+                    page_button_selector=selectors.page_button,
+                    view_more_page_button_selector=selectors.view_more_page_button,
+                    content_selector=selectors.listings,
                 )
                 if result:
                     # 4.1 If there is a next page, go to the next page
@@ -121,17 +162,151 @@ class DanawaCrawler(BaseCrawler):
 
         return listing_infos_pages[:n_listings]
 
+    @D
+    def _extract_listings_http(self, n_listings: int) -> list[dict] | None:
+        """Get listing information from search pages fetched over HTTP
+
+        Pages are fetched concurrently in batches of `n_pages_per_batch`.
+        A page whose listings need JS is extracted in the browser instead.
+
+        Returns:
+            list[dict] | None: None if the first search page is blocked or not
+                server-rendered ([] if it has no results)
+        """
+        page_param = self.cfgs["crawler"].page_param
+        n_pages_per_batch = self.cfgs["crawler"].n_pages_per_batch
+
+        listing_infos_pages, last_page = self.checkpoint.load_listings()
+        cur_page = last_page + 1
+        while len(listing_infos_pages) < n_listings:
+            # 1. Fetch pages
+            pages = range(cur_page, cur_page + n_pages_per_batch)
+            urls = [set_query_params(self.search_url, **{page_param: p}) for p in pages]
+            with PROFILER.span("_load_search_page"):
+                htmls = self.http_client.fetch_all(urls)
+
+            # 2. Extract information from pages
+            for page, url, html in zip(pages, urls, htmls):
+                listing_infos = self._extract_listings_in_html(url, html)
+                if (page == 1) and (listing_infos is None):
+                    # 2.1 Search page is blocked or not server-rendered
+                    print(f"[Warning] Fallback to selenium: {url}")
+                    return None
+                elif listing_infos is None:
+                    # 2.2 Listings need JS
+                    listing_infos = self._extract_listings_in_browser(url)
+
+                if not listing_infos:
+                    # 2.3 End of pages
+                    return listing_infos_pages[:n_listings]
+                listing_infos_pages.extend(listing_infos)
+                self.checkpoint.save_listings(listing_infos_pages, page=page)
+            cur_page += n_pages_per_batch
+
+        return listing_infos_pages[:n_listings]
+
+    @D
+    def _extract_listings_by_url(self, n_listings: int) -> list[dict]:
+        """Get listing information loading search pages by URL
+
+        Next pages are loaded in background tabs while the current page is extracted.
+        """
+        page_param = self.cfgs["crawler"].page_param
+        listing_infos_pages, last_page = self.checkpoint.load_listings()
+        pages = range(last_page + 1, last_page + 1 + MAX_PAGES)
+        urls = [set_query_params(self.search_url, **{page_param: p}) for p in pages]
+        with self._prefetch(urls, "listing_pages"):
+            for page, url in zip(pages, urls):
+                if len(listing_infos_pages) >= n_listings:
+                    break
+                listing_infos = self._extract_listings_in_browser(url)
+                if not listing_infos:
+                    # End of pages
+                    break
+                listing_infos_pages.extend(listing_infos)
+                self.checkpoint.save_listings(listing_infos_pages, page=page)
+
+        return listing_infos_pages[:n_listings]
+
+    def _extract_listings_in_html(
+        self, url: str, html: str | None
+    ) -> list[dict] | None:
+        """Extract listings from the HTML
+
+        Returns:
+            list[dict] | None: None if the page is blocked or unparseable (e.g. the
+                listings need JS), [] if the page has no results
+        """
+        if html is None:
+            return None
+
+        doc = HtmlElement.from_html(html, url=url)
+        selectors = self._get_listings_selectors()
+        listing_elems = [
+            elem for elem in find_elements(doc, selectors.listings) if elem.text
+        ]
+        if not listing_elems:
+            # A page without the "no results" marker (if any) is not a search page
+            no_results_selector = selectors.get("no_results")
+            if no_results_selector and not find_elements(doc, no_results_selector):
+                return None
+            return []
+
+        with PROFILER.span("_extract_listing"):
+            listing_infos = [self._extract_listing(elem) for elem in listing_elems]
+        if any(
+            not (info.get("listing_title") and info.get("listing_url"))
+            for info in listing_infos
+        ):
+            return None
+        return listing_infos
+
+    @D
+    def _extract_listings_in_browser(self, url: str) -> list[dict]:
+        """Extract listings of the page in the browser (or its cached page source)"""
+        # 1. Cached page source
+        if self.page_cache and (html := self.page_cache.get_fresh(url)):
+            listing_infos = self._extract_listings_in_html(url, html)
+            if listing_infos is not None:
+                return listing_infos
+
+        # 2. Load the page
+        self._open_url(url)
+        listing_elems = self._get_listing_elements_in_page()
+        if self.page_cache:
+            self.page_cache.put(url, self.driver.page_source, content_type="text/html")
+        with PROFILER.span("_extract_listing"):
+            listing_infos = map_elements(
+                self.driver, self._extract_listing, listing_elems
+            )
+        return [info for info in listing_infos if info]
+
+    @D
+    def _extract_listing_page(
+        self, page: int, n_listings: int
+    ) -> tuple[list[dict], bool]:
+        """Extract listings of a search page (listing page job, `n_listings` is cut by the job)"""
+        page_param = self.cfgs["crawler"].page_param
+        url = set_query_params(self.search_url, **{page_param: page})
+        listing_infos = None
+        if self._get_backend("search") == "http":
+            html = self.http_client.fetch(url)
+            listing_infos = self._extract_listings_in_html(url, html)
+        if listing_infos is None:
+            listing_infos = self._extract_listings_in_browser(url)
+        return listing_infos, bool(listing_infos)
+
     @D
     def _get_listing_elements_in_page(self) -> list[WebElement]:
         """Get listing elements"""
         # 1. Get elements
         listing_elems = scroll_until(
             self.driver,
-            target_selector=self.metadata.listings_selectors.listings,
+            target_selector=self._get_listings_selectors().listings,
             view_more_button_selector=self.metadata.listings_selectors.get(
                 "view_more_button"
             ),
-            n_elems=self.cfgs["crawler"]["n_listings"],
+            n_elems=self.cfgs["crawler"].n_listings,
         )
 
         # 2. Filtering (optional)
@@ -208,14 +383,130 @@ class DanawaCrawler(BaseCrawler):
         """Extract review information"""
         # 1. Extract review information
         review_infos = []
+        pending_listing_infos = []
         for listing_info in filter(lambda x: x["review_count"], listing_infos):
-            review_infos_in_listing = self._extract_reviews_of_listing(
-                listing_info, n_reviews
+            if self.checkpoint.is_listing_done(listing_info["listing_url"]):
+                # Reviews are extracted in the last run
+                review_infos.extend(
+                    self.checkpoint.load_reviews(listing_info["listing_url"])
+                )
+                continue
+            if not self._claim_listing(listing_info):
+                # Reviews of the product are extracted from another listing
+                continue
+            pending_listing_infos.append(listing_info)
+
+        n_workers = self.cfgs["crawler"].n_review_workers
+        if (n_workers > 1) and (len(pending_listing_infos) > 1):
+            # 2.1 Listings are distributed over workers with their own drivers
+            if self.cfgs["crawler"].review_scheduler == "threads":
+                extract_reviews = self._extract_reviews_in_threads
+            else:
+                extract_reviews = self._extract_reviews_in_processes
+            review_infos.extend(
+                extract_reviews(pending_listing_infos, n_reviews, n_workers)
             )
-            review_infos.extend(review_infos_in_listing)
+        else:
+            # 2.2 Listings are extracted sequentially with the driver
+            # (next listing pages are prefetched in background tabs)
+            listing_urls = [info["listing_url"] for info in pending_listing_infos]
+            with self._prefetch(listing_urls, "listings"):
+                for listing_info in pending_listing_infos:
+                    review_infos_in_listing = self._extract_reviews_of_listing(
+                        listing_info, n_reviews
+                    )
+                    review_infos.extend(review_infos_in_listing)
+                    self._emit_reviews(review_infos_in_listing)
 
         return review_infos
 
+    @D
+    def _extract_reviews_in_processes(
+        self, listing_infos: list[dict], n_reviews: int, n_workers: int
+    ) -> list[dict]:
+        """Extract reviews of listings in worker processes (a driver per process)"""
+        results = pmap(
+            _extract_reviews_in_worker,
+            [(listing_info, n_reviews) for listing_info in listing_infos],
+            n_workers=n_workers,
+            initializer=_init_review_worker,
+            initargs=(
+                self.product_name,
+                self.brand_name,
+                self.session_id,
+                self.chrome_option,
+                self.checkpoint.path,
+                self.checkpoint.crawl_key,
+            ),
+            finalizer=DanawaCrawler._quit_driver,
+            on_progress=_print_review_progress,
+        )
+        return self._collect_review_results(listing_infos, results)
+
+    @D
+    def _extract_reviews_in_threads(
+        self, listing_infos: list[dict], n_reviews: int, n_workers: int
+    ) -> list[dict]:
+        """Extract reviews of listings over drivers in threads (a crawler per driver)
+
+        Page loads of independent drivers run in parallel (commands of one driver
+        are serialized by chromedriver). Drivers start at the concurrency of the rate
+        limiter and are added up to `n_workers` while the site is healthy.
+        """
+        limiter = get_rate_limiter(self.marketplace)
+        crawler_by_driver = {}
+
+        def create_driver() -> webdriver.Chrome:
+            crawler = _init_review_worker(
+                self.product_name,
+                self.brand_name,
+                self.session_id,
+                self.chrome_option,
+                self.checkpoint.path,
+                self.checkpoint.crawl_key,
+            )
+            crawler_by_driver[crawler.driver] = crawler
+            return crawler.driver
+
+        n_drivers = min(limiter.concurrency, n_workers, len(listing_infos))
+        try:
+            scheduler = DriverScheduler(
+                [create_driver() for _ in range(n_drivers)],
+                create_driver=create_driver,
+                limiter=limiter,
+                max_drivers=min(n_workers, len(listing_infos)),
+            )
+            results = scheduler.map(
+                lambda driver, listing_info: _extract_reviews_in_worker(
+                    crawler_by_driver[driver], (listing_info, n_reviews)
+                ),
+                listing_infos,
+                on_progress=_print_review_progress,
+            )
+        finally:
+            for crawler in crawler_by_driver.values():
+                crawler._quit_driver()
+        return self._collect_review_results(listing_infos, results)
+
+    def _collect_review_results(
+        self, listing_infos: list[dict], results: list
+    ) -> list[dict]:
+        """Reviews of the listings extracted by workers (failed listings are skipped)"""
+        review_infos = []
+        for listing_info, result in zip(listing_infos, results):
+            if isinstance(result, ItemError):
+                print(
+                    f"[Failure] Extract reviews from listing_url: {listing_info['listing_url']}"
+                )
+                print(result.traceback)
+                continue
+            # Distributions are updated in the worker
+            updated_listing_info, review_infos_in_listing = result
+            listing_info.update(updated_listing_info)
+            review_infos.extend(review_infos_in_listing)
+            self._emit_reviews(review_infos_in_listing)
+        return review_infos
+
     @D
     def _extract_reviews_of_listing(
         self, listing_info: dict, n_reviews: int
@@ -235,6 +526,7 @@ class DanawaCrawler(BaseCrawler):
 
             # 3. Extract review infos
             review_infos = self._get_review_infos(listing_info, n_reviews)
+            self.checkpoint.mark_listing_done(listing_info)
 
             # 4. Check the number of reviews
             n_expected = min(listing_info["review_count"], n_reviews)
@@ -252,6 +544,10 @@ class DanawaCrawler(BaseCrawler):
             print(e)
             return [{}]
 
+    def _extract_review_page(self, listing_info: dict, n_reviews: int) -> list[dict]:
+        """Extract reviews of a listing (review job)"""
+        return self._extract_reviews_of_listing(listing_info, n_reviews)
+
     @D
     def _extract_ratings_dist(self) -> dict:
         """Extract ratings distribution"""
@@ -271,21 +567,29 @@ class DanawaCrawler(BaseCrawler):
         # button_element = find_element(driver, target_text="펼쳐보기")  # multiples candidates
         button_selector = self.reviews_selectors.view_more_button
 
-        cumulated_infos = []
+        # Review elements read in the last run are skipped
+        listing_url = listing_info["listing_url"]
+        cumulated_infos = self.checkpoint.load_reviews(listing_url)
+        offset = self.checkpoint.review_cursor(listing_url)
+
         last_n_visible_elems = 0
         while True:
             try:
-                visible_elems = find_elements(self.driver, target_selector)
-                unseen_elems = visible_elems[last_n_visible_elems:]
+                # Snapshot the page in one round trip and parse reviews in-process
+                doc = snapshot_page(self.driver)
+                visible_elems = find_elements(doc, target_selector)
+                unseen_elems = visible_elems[max(last_n_visible_elems, offset) :]
                 n_visible_elems = len(visible_elems)
                 print(f"# visible elems: {n_visible_elems}, # target: {n_reviews}")
 
-                tasks = [
-                    delayed(self._extract_review)(elem, listing_info)
+                infos = [
+                    info
                     for elem in unseen_elems
+                    if (info := self._extract_review(elem, listing_info, doc))
                 ]
-                infos = list(compute(*tasks, scheduler="threads"))
                 cumulated_infos.extend(infos)
+                offset = max(offset, n_visible_elems)
+                self.checkpoint.add_reviews(listing_url, infos, cursor=offset)
 
                 if n_visible_elems == 0:
                     # 1. If no element is found, stop
@@ -298,16 +602,19 @@ class DanawaCrawler(BaseCrawler):
                 elif n_visible_elems < n_reviews:
                     # 3. If the number of visible elements is less than n_elems, scroll down
                     last_n_visible_elems = n_visible_elems
+                    more_elems_loaded = n_elements_changed(
+                        target_selector, n_visible_elems
+                    )
                     if button_selector:
                         # 3.1 There is a button to load more elements
                         click(
                             self.driver,
                             selector=button_selector,
-                            sleep_after=0.2,
+                            wait_for=more_elems_loaded,
                         )
                     else:
                         # 3.2 There is not a button to load more elements
-                        scroll(self.driver, target_selector)
+                        scroll(self.driver, target_selector, wait_for=more_elems_loaded)
                 else:
                     # 4. If the number of visible elements is satisfied, return the elements
                     break
@@ -320,8 +627,13 @@ class DanawaCrawler(BaseCrawler):
         return cumulated_infos[:n_reviews]
 
     @validate_review_info
-    def _extract_review(self, review_elem: WebElement, listing_info: dict) -> dict:
-        """Extract review information from review element"""
+    def _extract_review(
+        self,
+        review_elem: WebElement,
+        listing_info: dict,
+        doc: HtmlElement | None = None,
+    ) -> dict:
+        """Extract review information from review element (and the page snapshot)"""
         id = self._extract_review_id(review_elem)
 
         rating = find_element(
@@ -341,7 +653,7 @@ class DanawaCrawler(BaseCrawler):
         content = find_element(review_elem, "p.txt_best_rvw", astype=str)
 
         selector = f"#productBlog-opinion-mall-list-image-item-1-{id}"
-        image_url = find_element(self.driver, selector, attribute="url")
+        image_url = find_element(doc or self.driver, selector, attribute="url")
 
         info = self._initialize_review_info(listing_info)
         info.update(
@@ -363,15 +675,23 @@ class DanawaCrawler(BaseCrawler):
     def _load_review_page(self, url: str):
         """Load review page"""
         # 1. Load item page
-        load_url(self.driver, url)
+        self._open_url(url)
         self._initialize_reviews_selectors(self.driver.current_url)
 
         # 2. Find review page redirection button and click
         button = find_element(self.driver, target_text="의견/리뷰", tag_name="a")
-        click(self.driver, element=button, sleep_after=MINIMUM_SLEEP)
+        click(self.driver, element=button)
 
+        # 3. Wait until reviews are loaded (no reviews: the timeout is ignored)
         button2 = find_element(self.driver, target_text="쇼핑몰 상품리뷰")
-        click(self.driver, element=button2, sleep_after=MINIMUM_SLEEP)
+        try:
+            click(
+                self.driver,
+                element=button2,
+                wait_for=n_elements_changed(self.reviews_selectors.reviews, 0),
+            )
+        except TimeoutException:
+            pass
 
     def _extract_review_id(self, element: WebElement) -> str:
         """Extract listing ID from item element"""
@@ -381,12 +701,51 @@ class DanawaCrawler(BaseCrawler):
 
     def _initialize_reviews_selectors(self, listing_url: str):
         """Get reviews selectors based on the listing URL"""
-        for selectors in self.metadata["reviews_selectors_grocery"]:
-            if re.match(selectors["listing_url"], listing_url):
-                self.reviews_selectors = selectors
-                self.subinstance = self
-                return
-        raise NotImplementedError(f"Selectors for {listing_url} is not implemented")
+        selectors = self.metadata.selector_router.match(listing_url)
+        if selectors is None:
+            raise NotImplementedError(f"Selectors for {listing_url} is not implemented")
+        self.reviews_selectors = self.metadata.check_selectors(
+            selectors, ("reviews", "view_more_button"), "reviews_selectors_grocery"
+        )
+        self.subinstance = self
+
+    def _get_listings_selectors(self, *keys: str) -> dict:
+        """Listing selectors of the metadata (`listings` and the keys are required)"""
+        return self.metadata.check_selectors(
+            self.metadata.listings_selectors, ("listings", *keys), "listings_selectors"
+        )
+
+
+####################################################################################################
+# Review worker processes
+####################################################################################################
+def _init_review_worker(
+    product_name: str,
+    brand_name: str,
+    session_id: str,
+    chrome_option: str | None,
+    checkpoint_path: str,
+    crawl_key: str,
+) -> DanawaCrawler:
+    """Create the crawler of a worker process (the driver is created on first use)"""
+    crawler = DanawaCrawler(
+        product_name, brand_name, session_id, chrome_option=chrome_option
+    )
+    crawler.checkpoint = CrawlCheckpoint(checkpoint_path, crawl_key)
+    return crawler
+
+
+def _print_review_progress(n_done: int, n_total: int):
+    print(f"# listings with reviews: {n_done}/{n_total}")
+
+
+def _extract_reviews_in_worker(
+    crawler: DanawaCrawler, args: tuple[dict, int]
+) -> tuple[dict, list[dict]]:
+    """Extract reviews of a listing in a worker (process or thread)"""
+    listing_info, n_reviews = args
+    review_infos = crawler._extract_reviews_of_listing(listing_info, n_reviews)
+    return listing_info, review_infos
 
 
 if __name__ == "__main__":
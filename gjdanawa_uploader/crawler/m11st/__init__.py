@@ -1,3 +1,4 @@
+from .m11st_page_version import M11stPageVersion
 from .m11st_crawler import M11stCrawler
 from .m11st_crawler_version1 import M11stCrawlerVersion1
 from .m11st_crawler_version2 import M11stCrawlerVersion2
@@ -1,26 +1,36 @@
 """11st Crawler"""
 
-import re
+from __future__ import annotations
+
 import traceback
+from typing import TYPE_CHECKING
 
 from selenium import webdriver
-from selenium.webdriver.remote.webelement import WebElement
-
-from dask import delayed, compute
-from dask.diagnostics import ProgressBar
 
 from gjdanawa_uploader.core.depth_logging import D
+from gjdanawa_uploader.core.profiler import PROFILER
 from gjdanawa_uploader.utils.crawling import (
+    INFINITY,
     find_element,
     scroll,
+    load_url,
     validate_listing_info,
     click_alert,
     scroll_until,
 )
-from gjdanawa_uploader.utils.elasticsearch.elasticsearch_manager import (
-    ElasticSearchManager,
-)
+from gjdanawa_uploader.utils.driver_scheduler import map_elements
+from gjdanawa_uploader.utils.selector_router import SelectorRouter
+from gjdanawa_uploader.utils.storage import Storage
 from gjdanawa_uploader.crawler.base_crawler import BaseCrawler
+from gjdanawa_uploader.crawler.m11st.m11st_page_version import (
+    M11ST_PAGE_VERSIONS,
+    M11stPageVersion,
+)
+
+if TYPE_CHECKING:
+    from selenium.webdriver.remote.webelement import WebElement
+
+    from gjdanawa_uploader.core.config_schema import MarketplaceMetadata
 
 
 class M11stCrawler(BaseCrawler):
@@ -36,58 +46,102 @@ class M11stCrawler(BaseCrawler):
     cfgs: dict
     chrome_option: str | None
     driver: webdriver.Chrome
-    es_manager: ElasticSearchManager
+    storage: Storage
     selectors: dict
-    subinstance: object
-    metadata: dict
+    selector_router: SelectorRouter
+    subinstance: M11stPageVersion
+    metadata: MarketplaceMetadata
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.selector_router = self.metadata.selector_router
+        self._page_versions: dict[int, M11stPageVersion] = {}
 
     def _initialize_selectors(self, listing_url: str):
         """Get selectors based on the listing URL"""
-        for selectors in self.metadata["reviews_selectors_grocery"]:
-            if re.match(selectors["listing_url"], listing_url):
-                # 1. Set selectors
-                self.selectors = selectors
-                match selectors["version"]:
-                    case 1:
-                        from gjdanawa_uploader.crawler.m11st import (
-                            M11stCrawlerVersion1 as Version1,
-                        )
-
-                        cls = Version1
-                    case 2:
-                        from gjdanawa_uploader.crawler.m11st import (
-                            M11stCrawlerVersion2 as Version2,
-                        )
-
-                        cls = Version2
-                    case _:
-                        raise ValueError(f"Invalid version: {selectors['version']}")
-
-                # 2. Set subinstance
-                self.subinstance = cls(**self.__dict__)
-                return
-        raise NotImplementedError(f"Selectors for {listing_url} is not implemented")
+        # 1. Set selectors
+        selectors = self.selector_router.match(listing_url)
+        if selectors is None:
+            raise NotImplementedError(f"Selectors for {listing_url} is not implemented")
+        self.selectors = self.metadata.check_selectors(
+            selectors,
+            ("version", "review_button", "review_elements"),
+            "reviews_selectors_grocery",
+        )
+
+        # 2. Set subinstance (page version handler)
+        self.subinstance = self._get_page_version(selectors["version"])
+
+    def _get_page_version(self, version: int) -> M11stPageVersion:
+        """Get the page version handler (created once per crawler)"""
+        if version not in self._page_versions:
+            if version not in M11ST_PAGE_VERSIONS:
+                raise ValueError(f"Invalid version: {version}")
+            self._page_versions[version] = M11ST_PAGE_VERSIONS[version](self)
+        return self._page_versions[version]
+
+    def _extract(
+        self, n_listings: int | None = None, n_reviews: int | None = None
+    ) -> dict:
+        """Extract information from the crawler"""
+        # 0. Set n_reviews
+        if n_reviews is None:
+            n_reviews = self.cfgs["crawler"].n_reviews
+        elif n_reviews == -1:
+            n_reviews = INFINITY
+
+        # 1. Extract listing information
+        if self.checkpoint.get("listings_done"):
+            # 1.1 Listings are extracted in the last run
+            listing_infos, _ = self.checkpoint.load_listings()
+        else:
+            # 1.2 Load search page in the browser
+            listing_infos = self._extract_listings(n_listings)
+            self.checkpoint.save_listings(listing_infos, page=1)
+            self.checkpoint.set("listings_done", True)
+
+        # 2. Extract review information
+        review_infos = self._extract_reviews(listing_infos, n_reviews)
+
+        return dict(
+            listings=listing_infos,
+            reviews=review_infos,
+        )
 
     @D
-    def _extract_listings(self) -> list[dict]:
-        """Extract listing information"""
+    def _extract_listings(self, n_listings: int | None = None) -> list[dict]:
+        """Extract listing information (`n_listings` of the config by default)"""
+        if n_listings is None:
+            n_listings = self.cfgs["crawler"].n_listings
+        if n_listings == -1:
+            n_listings = INFINITY
+
         # 1. Load search page
+        capture = self._get_network_capture("listings")
         self._load_search_page(driver=self.driver)
 
         # 2. Get necessary listing elements
-        listing_elems = scroll_until(
-            self.driver,
-            "div[class='l-grid l-grid--nobg'] > ul > li > div.c-card-item > a",
-            self.cfgs["crawler"].n_listings,
-        )
+        with PROFILER.span("scroll_until", phase="listing_scroll"):
+            listing_elems = scroll_until(
+                self.driver,
+                "div[class='l-grid l-grid--nobg'] > ul > li > div.c-card-item > a",
+                n_elems=n_listings,
+                on_scroll=capture.poll if capture else None,
+            )
 
         # 3. Extract listings
-        with ProgressBar():
-            tasks = [
-                delayed(self._extract_listing)(listing_elem)
-                for listing_elem in listing_elems
-            ]
-            listing_infos = compute(*tasks, scheduler="threads")
+        # 3.1 Parse captured JSON responses (network extraction mode)
+        if capture:
+            capture.poll()
+            listing_infos = self._parse_network_responses("listings", capture.responses)
+            if listing_infos:
+                return listing_infos[:n_listings]
+
+        # 3.2 Extract from elements
+        with PROFILER.span("_extract_listing"):
+            listing_infos = map_elements(
+                self.driver, self._extract_listing, listing_elems
+            )
             final_listing_infos = [info for info in listing_infos if info]
 
         # 4. Check the number of listings
@@ -101,6 +155,18 @@ class M11stCrawler(BaseCrawler):
 
         return final_listing_infos
 
+    def _extract_listing_page(
+        self, page: int, n_listings: int
+    ) -> tuple[list[dict], bool]:
+        """Extract listings of the search page (listing page job)
+
+        NOTE: listings are loaded by infinite scroll, so the first page job scrolls
+        until `n_listings` listings and there is no next page
+        """
+        if page > 1:
+            return [], False
+        return self._extract_listings(n_listings), False
+
     @validate_listing_info
     def _extract_listing(self, listing_elem: WebElement) -> dict:
         """Extract listing information from item element"""
@@ -157,7 +223,7 @@ class M11stCrawler(BaseCrawler):
             "dd.c-starrate__sati",
             astype=float,
             pattern=r"만족도 : (\d+)%",
-            scale_factor=self.metadata["max_listing_rating"],
+            scale_factor=self.metadata.max_listing_rating,
         )
 
         _delivery = find_element(_item_info, "div.c-card-item__delivery")
@@ -199,7 +265,7 @@ class M11stCrawler(BaseCrawler):
         return info
 
     @D
-    def _extract_reviews(self, listing_infos: list[dict]) -> list[dict]:
+    def _extract_reviews(self, listing_infos: list[dict], n_reviews: int) -> list[dict]:
         """Extract reviews information"""
         review_infos = []
         for listing_info in listing_infos:
@@ -209,22 +275,35 @@ class M11stCrawler(BaseCrawler):
                 listing_info["optional"].update(dist_info)
                 continue
 
+            if self.checkpoint.is_listing_done(listing_info["listing_url"]):
+                # Reviews are extracted in the last run
+                review_infos.extend(
+                    self.checkpoint.load_reviews(listing_info["listing_url"])
+                )
+                continue
+
+            if not self._claim_listing(listing_info):
+                # Reviews of the product are extracted from another listing
+                continue
+
             review_infos_in_listing = self._extract_reviews_of_listing(
-                listing_info, self.driver
+                listing_info, n_reviews, self.driver
             )
             review_infos.extend(review_infos_in_listing)
+            self._emit_reviews(review_infos_in_listing)
 
         return review_infos
 
     @D
     def _extract_reviews_of_listing(
-        self, listing_info: dict, driver: webdriver.Chrome
+        self, listing_info: dict, n_reviews: int, driver: webdriver.Chrome
     ) -> list[dict]:
         """Extract reviews information from listing information"""
         review_infos = []
         listing_url = listing_info["listing_url"]
 
         # 1. Load the review page
+        capture = self._get_network_capture("reviews")
         self._load_review_page(listing_url, driver)
 
         # 2. Rating information
@@ -235,23 +314,35 @@ class M11stCrawler(BaseCrawler):
         try:
             # 3.1 Get necessary review elements
             review_elems_selector = self.selectors["review_elements"]
-            review_elems = scroll_until(
-                driver, review_elems_selector, self.cfgs["crawler"].n_reviews
-            )
+            with PROFILER.span("scroll_until", phase="review_extract"):
+                review_elems = scroll_until(
+                    driver,
+                    review_elems_selector,
+                    n_elems=n_reviews,
+                    on_scroll=capture.poll if capture else None,
+                )
 
-            # 3.2 Extract review information
-            with ProgressBar():
-                tasks = [
-                    delayed(self.subinstance.extract_review)(review_elem, listing_info)
-                    for review_elem in review_elems
-                ]
-                review_infos = compute(*tasks, scheduler="threads")
-                final_review_infos = [info for info in review_infos if info]
-
-            # 3.3 Check the number of reviews
-            n_expected = min(
-                listing_info["review_count"], self.cfgs["crawler"].n_reviews
-            )
+            # 3.2 Parse captured JSON responses (network extraction mode)
+            if capture:
+                capture.poll()
+                review_infos = self._parse_network_responses(
+                    "reviews", capture.responses, listing_info
+                )
+            final_review_infos = review_infos[:n_reviews]
+
+            # 3.3 Extract from elements (if nothing is captured)
+            if not final_review_infos:
+                with PROFILER.span("extract_review", phase="review_extract"):
+                    review_infos = map_elements(
+                        driver,
+                        self.subinstance.extract_review,
+                        review_elems,
+                        listing_info,
+                    )
+                    final_review_infos = [info for info in review_infos if info]
+
+            # 3.4 Check the number of reviews
+            n_expected = min(listing_info["review_count"], n_reviews)
             n_extracted = len(final_review_infos)
             if n_extracted != n_expected:
                 print(
@@ -259,6 +350,8 @@ class M11stCrawler(BaseCrawler):
                 )
                 print(traceback.format_exc())
 
+            self.checkpoint.add_reviews(listing_url, final_review_infos)
+            self.checkpoint.mark_listing_done(listing_info)
             return final_review_infos
         except Exception as e:
             print(f"[Failure] Extract reviews from listing_url: {listing_url}")
@@ -266,13 +359,17 @@ class M11stCrawler(BaseCrawler):
             print(e)
             return [{}]
 
+    def _extract_review_page(self, listing_info: dict, n_reviews: int) -> list[dict]:
+        """Extract reviews of a listing (review job)"""
+        return self._extract_reviews_of_listing(listing_info, n_reviews, self.driver)
+
     @D
     def _load_review_page(self, url: str, driver: webdriver.Chrome):
         """Load review page"""
         # TODO: fix too long stuck
         try:
             # 1. Load item page
-            self._load_url(url, driver=driver)
+            load_url(driver, url)
             self._initialize_selectors(driver.current_url)
 
             # 2. Find review page redirection button and click
@@ -293,5 +390,7 @@ if __name__ == "__main__":
     product_name = "퍼펙트휩"
     brand_name = "센카"
 
-    crawler = M11stCrawler(product_name, brand_name, chrome_option="dev", reset_db=True)
+    crawler = M11stCrawler(
+        product_name, brand_name, session_id=None, chrome_option="dev", reset_db=True
+    )
     crawler.run()
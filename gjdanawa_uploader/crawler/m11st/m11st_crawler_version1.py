@@ -1,9 +1,10 @@
 """11st Crawler"""
 
+from __future__ import annotations
+
 import re
 import traceback
-
-from selenium.webdriver.remote.webelement import WebElement
+from typing import TYPE_CHECKING
 
 from gjdanawa_uploader.core.depth_logging import D
 from gjdanawa_uploader.utils.crawling import (
@@ -12,10 +13,13 @@ from gjdanawa_uploader.utils.crawling import (
     validate_review_info,
     click,
 )
-from gjdanawa_uploader.crawler.m11st import M11stCrawler
+from gjdanawa_uploader.crawler.m11st.m11st_page_version import M11stPageVersion
+
+if TYPE_CHECKING:
+    from selenium.webdriver.remote.webelement import WebElement
 
 
-class M11stCrawlerVersion1(M11stCrawler):
+class M11stCrawlerVersion1(M11stPageVersion):
     """11번가 Crawler
 
     Pages:
@@ -24,9 +28,7 @@ class M11stCrawlerVersion1(M11stCrawler):
 
     """
 
-    def __init__(self, *args, **kwargs):
-        for key, val in kwargs.items():
-            setattr(self, key, val)
+    version: int = 1
 
     @D
     def _extract_distribution(self, listing_info: dict) -> dict:
@@ -108,7 +110,7 @@ class M11stCrawlerVersion1(M11stCrawler):
             review_elem,
             "strong.c-starrate__review",
             astype=float,
-            scale_factor=self.metadata["max_review_rating"],
+            scale_factor=self.metadata.max_review_rating,
         )
 
         summary = {}
@@ -1,6 +1,9 @@
 """11st Crawler"""
 
-from selenium.webdriver.remote.webelement import WebElement
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
 from selenium.webdriver.common.by import By
 from selenium.common.exceptions import NoSuchElementException
 
@@ -10,10 +13,13 @@ from gjdanawa_uploader.utils.crawling import (
     click,
     validate_review_info,
 )
-from gjdanawa_uploader.crawler.m11st.m11st_crawler import M11stCrawler
+from gjdanawa_uploader.crawler.m11st.m11st_page_version import M11stPageVersion
+
+if TYPE_CHECKING:
+    from selenium.webdriver.remote.webelement import WebElement
 
 
-class M11stCrawlerVersion2(M11stCrawler):
+class M11stCrawlerVersion2(M11stPageVersion):
     """11번가 Crawler
 
     Pages:
@@ -22,9 +28,7 @@ class M11stCrawlerVersion2(M11stCrawler):
         https://m.11st.co.kr/products/m/1849811748?&trTypeCd=MAS77&trCtgrNo=950076&checkCtlgPrd=true
     """
 
-    def __init__(self, *args, **kwargs):
-        for key, val in kwargs.items():
-            setattr(self, key, val)
+    version: int = 2
 
     def _extract_distribution(self, listing_info: dict) -> dict:
         """Extract distribution information"""
@@ -93,7 +97,7 @@ class M11stCrawlerVersion2(M11stCrawler):
             ".reviewer_info_star .b_satisfy.per100",
             removeprefix="만족도",
             astype=float,
-            scale_factor=self.metadata["max_review_rating"],
+            scale_factor=self.metadata.max_review_rating,
         )
 
         # Summary
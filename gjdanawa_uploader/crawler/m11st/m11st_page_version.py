@@ -0,0 +1,44 @@
+"""11st product page version handlers"""
+
+M11ST_PAGE_VERSIONS: dict[int, type["M11stPageVersion"]] = {}
+
+
+class M11stPageVersion:
+    """Handler of a version of 11st product pages (plug-in)
+
+    Subclasses defining `version` are registered, and the version of
+    `reviews_selectors_grocery` in metadata selects the handler.
+    A handler is created once per crawler; attributes it does not define
+    (driver, metadata, helper methods, ...) are read from the crawler by reference.
+
+    Example:
+        >>> class M11stCrawlerVersion3(M11stPageVersion):
+        ...     version = 3
+        ...     def _extract_distribution(self, listing_info): ...
+        ...     def extract_review(self, review_elem, listing_info): ...
+    """
+
+    version: int
+
+    def __init_subclass__(cls, **kwargs):
+        """Register handlers defining their own version"""
+        super().__init_subclass__(**kwargs)
+        if "version" in cls.__dict__:
+            M11ST_PAGE_VERSIONS[cls.version] = cls
+
+    def __init__(self, crawler):
+        self.crawler = crawler
+
+    def __getattr__(self, name: str):
+        if name == "crawler":
+            # Not initialized (e.g. while unpickling)
+            raise AttributeError(name)
+        return getattr(self.crawler, name)
+
+    def _extract_distribution(self, listing_info: dict) -> dict:
+        """Extract distribution information"""
+        raise NotImplementedError
+
+    def extract_review(self, review_elem, listing_info: dict) -> dict:
+        """Extract review information from review element"""
+        raise NotImplementedError
@@ -0,0 +1,232 @@
+"""Multi-marketplace crawl: crawl a product in all marketplaces concurrently"""
+
+import argparse
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+
+from gjdanawa_uploader.configs import CFG_CRAWLER
+from gjdanawa_uploader.core.utils import tprint
+from gjdanawa_uploader.utils.driver_pool import DriverPool
+from gjdanawa_uploader.utils.storage import Storage, get_storage
+from gjdanawa_uploader.crawler.base_crawler import CRAWLER_MODULES, get_crawler_class
+
+
+def get_marketplaces() -> list[str]:
+    """Marketplaces of the registered (implemented) crawlers"""
+    marketplaces = []
+    for marketplace in CRAWLER_MODULES:
+        try:
+            get_crawler_class(marketplace)
+        except NotImplementedError:
+            continue
+        marketplaces.append(marketplace)
+    return marketplaces
+
+
+class MultiMarketplaceCrawl:
+    """Crawl a product in marketplaces concurrently.
+
+    Crawlers share the session_id, the storage and a pool of drivers,
+    so the latency of a product is the slowest marketplace instead of the sum.
+    The driver pool (and its browsers) is reused by the following products.
+
+    Example:
+        >>> with MultiMarketplaceCrawl(chrome_option="light") as crawl:
+        ...     result = crawl.run("센카", "퍼펙트휩")
+        >>> result["marketplaces"]["danawa"]["elapsed_time"]
+        12.3
+    """
+
+    def __init__(
+        self,
+        marketplaces: list[str] | None = None,
+        session_id: str | None = None,
+        chrome_option: str | None = None,
+        storage: Storage | None = None,
+        driver_pool: DriverPool | None = None,
+        reset_db: bool = False,
+    ):
+        self.marketplaces = marketplaces or get_marketplaces()
+        self.session_id = session_id or str(uuid.uuid4())
+        self.chrome_option = chrome_option
+        self.reset_db = reset_db
+        self._storage = storage  # created on first use
+        self.driver_pool = driver_pool or DriverPool()
+        self._owns_driver_pool = driver_pool is None
+
+    @property
+    def storage(self) -> Storage:
+        """Document storage shared by the crawlers (created on first use)"""
+        if self._storage is None:
+            self._storage = get_storage(reset=self.reset_db)
+        return self._storage
+
+    def run(
+        self,
+        brand_name: str,
+        product_name: str,
+        n_listings: int | None = None,
+        n_reviews: int | None = None,
+        reference_image_urls: list[str] | None = None,
+    ) -> dict:
+        """Crawl the product in all marketplaces
+
+        Args:
+            reference_image_urls (list[str], optional): Product images to filter listing thumbnails with
+
+        Returns:
+            dict: Merged listings and reviews, with the result of each marketplace
+                (status, # listings, # reviews, elapsed_time, error)
+        """
+        start_time = perf_counter()
+        self.storage  # created once, before the crawlers share it
+        with ThreadPoolExecutor(max_workers=len(self.marketplaces)) as executor:
+            futures = {
+                marketplace: executor.submit(
+                    self._run_marketplace,
+                    marketplace,
+                    brand_name,
+                    product_name,
+                    n_listings,
+                    n_reviews,
+                    reference_image_urls,
+                )
+                for marketplace in self.marketplaces
+            }
+            results = {
+                marketplace: future.result() for marketplace, future in futures.items()
+            }
+
+        # Merge results
+        merged = dict(
+            session_id=self.session_id,
+            brand_name=brand_name,
+            product_name=product_name,
+            listings=[],
+            reviews=[],
+            marketplaces={},
+        )
+        for marketplace, (infos, result) in results.items():
+            merged["listings"].extend(infos.get("listings", []))
+            merged["reviews"].extend(infos.get("reviews", []))
+            merged["marketplaces"][marketplace] = result
+        self._match_listings(merged["listings"])
+        merged["elapsed_time"] = perf_counter() - start_time
+        return merged
+
+    def _match_listings(self, listing_infos: list[dict]):
+        """Mark listings of the same product across marketplaces
+
+        `optional.match_group` is the listing_url of the first listing of the group
+        (near-duplicate titles, see `listing_match` config).
+        """
+        listing_infos = [info for info in listing_infos if info.get("listing_title")]
+        if not listing_infos:
+            return
+        from gjdanawa_uploader.utils.vector_index import VECTORIZER, group_similar
+
+        vectors = VECTORIZER.transform(
+            [info["listing_title"] for info in listing_infos]
+        )
+        cfg = CFG_CRAWLER.listing_match
+        groups = group_similar(vectors, cfg.threshold, k=cfg.k, backend=cfg.backend)
+        for info, group in zip(listing_infos, groups):
+            info["optional"]["match_group"] = listing_infos[group]["listing_url"]
+
+    def _run_marketplace(
+        self,
+        marketplace: str,
+        brand_name: str,
+        product_name: str,
+        n_listings: int | None,
+        n_reviews: int | None,
+        reference_image_urls: list[str] | None,
+    ) -> tuple[dict, dict]:
+        """Run the crawler of the marketplace (in a worker thread)"""
+        key = f"{marketplace}|{brand_name}|{product_name}"
+        print(f"[Start] {key}")
+        start_time = perf_counter()
+        infos = {}
+        result = dict(status="done", n_listings=0, n_reviews=0, error=None)
+        try:
+            crawler_cls = get_crawler_class(marketplace)
+            crawler = crawler_cls(
+                product_name,
+                brand_name,
+                session_id=self.session_id,
+                chrome_option=self.chrome_option,
+                storage=self.storage,
+                reset_db=self.reset_db,
+                reference_image_urls=reference_image_urls,
+            )
+            capture_network = crawler.extraction_mode == "network"
+            with self.driver_pool.driver(
+                marketplace, crawler.chrome_option, capture_network
+            ) as driver:
+                # Drivers of the pool are not quit by the crawler
+                crawler.driver = driver
+                infos = crawler.run(n_listings, n_reviews)
+            result.update(
+                n_listings=len(infos.get("listings", [])),
+                n_reviews=len(infos.get("reviews", [])),
+            )
+        except Exception as e:
+            print(f"[Failure] {key}")
+            print(traceback.format_exc())
+            result.update(status="failed", error=repr(e))
+        result["elapsed_time"] = perf_counter() - start_time
+        print(
+            f"[{result['status'].capitalize()}] {key} ({result['elapsed_time']:.2f}s)"
+        )
+        return infos, result
+
+    def close(self):
+        """Quit the drivers of the pool (if it is created by the crawl)"""
+        if self._owns_driver_pool:
+            self.driver_pool.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Crawl a product in all marketplaces")
+    parser.add_argument("brand_name")
+    parser.add_argument("product_name")
+    parser.add_argument("--marketplaces", nargs="+", default=None)
+    parser.add_argument("--n-listings", type=int, default=None)
+    parser.add_argument("--n-reviews", type=int, default=None)
+    parser.add_argument("--session-id", default=None)
+    parser.add_argument("--chrome-option", default=None)
+    parser.add_argument("--reset-db", action="store_true")
+    parser.add_argument("--reference-image-urls", nargs="+", default=None)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    with MultiMarketplaceCrawl(
+        args.marketplaces,
+        session_id=args.session_id,
+        chrome_option=args.chrome_option,
+        reset_db=args.reset_db,
+    ) as crawl:
+        result = crawl.run(
+            args.brand_name,
+            args.product_name,
+            args.n_listings,
+            args.n_reviews,
+            args.reference_image_urls,
+        )
+    tprint(
+        [dict(marketplace=key, **val) for key, val in result["marketplaces"].items()]
+    )
+    print(
+        f"# listings: {len(result['listings'])} / # reviews: {len(result['reviews'])} / elapsed: {result['elapsed_time']:.2f}s"
+    )
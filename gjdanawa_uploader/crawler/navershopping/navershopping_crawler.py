@@ -1,10 +1,11 @@
 """Navershoppint Crawler"""
 
-from time import sleep
+from __future__ import annotations
+
 from pprint import pprint
+from typing import TYPE_CHECKING
 
 from selenium import webdriver
-from selenium.webdriver.remote.webelement import WebElement
 from selenium.common.exceptions import TimeoutException
 
 from gjdanawa_uploader.configs import CFG_CRAWLER
@@ -15,12 +16,26 @@ from gjdanawa_uploader.utils.crawling import (
     find_element,
     find_element,
     scroll,
+    click,
+    element_replaced,
+    n_elements_changed,
+    INFINITY,
 )
-from gjdanawa_uploader.utils.elasticsearch.elasticsearch_manager import (
-    ElasticSearchManager,
-)
+from gjdanawa_uploader.utils.storage import Storage
+from gjdanawa_uploader.utils.network_capture import NetworkCapture
 from gjdanawa_uploader.crawler.base_crawler import BaseCrawler
 
+if TYPE_CHECKING:
+    from selenium.webdriver.remote.webelement import WebElement
+
+    from gjdanawa_uploader.utils.image_hash import ImageMatcher
+
+
+LISTING_SELECTOR = "div[class^='listContainer_list_inner'] > div"
+
+# Sellers redirecting to other known platforms (normalized names)
+KNOWN_MARKETPLACES = CFG_CRAWLER.known_marketplaces_pattern
+
 
 class NavershoppingCrawler(BaseCrawler):
     """Navershopping Crawler
@@ -29,100 +44,193 @@ class NavershoppingCrawler(BaseCrawler):
         https://msearch.shopping.naver.com/search/all?adQuery=%EB%82%98%EC%9D%B4%ED%82%A4%20%ED%8E%98%EA%B0%80%EC%88%98%EC%8A%A4%2041%20%EB%B8%94%EB%A3%A8%ED%94%84%EB%A6%B0%ED%8A%B8&origQuery=%EB%82%98%EC%9D%B4%ED%82%A4%20%ED%8E%98%EA%B0%80%EC%88%98%EC%8A%A4%2041%20%EB%B8%94%EB%A3%A8%ED%94%84%EB%A6%B0%ED%8A%B8&pagingIndex=1&pagingSize=40&productSet=total&query=%EB%82%98%EC%9D%B4%ED%82%A4%20%ED%8E%98%EA%B0%80%EC%88%98%EC%8A%A4%2041%20%EB%B8%94%EB%A3%A8%ED%94%84%EB%A6%B0%ED%8A%B8&sort=review_rel&viewType=image
     """
 
-    id: str = "navershopping"
+    marketplace: str = "navershopping"
     listing_title: str
     seller_name: str
     cfgs: dict
     driver: webdriver.Chrome
-    es_manager: ElasticSearchManager
+    storage: Storage
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._image_matcher = None
+
+    @property
+    def image_matcher(self) -> ImageMatcher | None:
+        """Thumbnail matcher (None without reference images)"""
+        if self._image_matcher is None and self.reference_image_urls:
+            # Imported on first use (PIL, HTTP client)
+            from gjdanawa_uploader.utils.image_hash import ImageMatcher, MAX_DISTANCE
+
+            cfg = self.cfgs["crawler"].image_match
+            self._image_matcher = ImageMatcher(
+                self.reference_image_urls,
+                max_distance=cfg.get("max_distance", MAX_DISTANCE),
+            )
+        return self._image_matcher
+
+    def _extract(
+        self, n_listings: int | None = None, n_reviews: int | None = None
+    ) -> dict:
+        """Extract information from the crawler
+
+        NOTE: reviews are not extracted yet, `n_reviews` limits the total review count of listings
+        """
+        # 1. Set n_listings, n_reviews
+        if n_listings is None:
+            n_listings = self.cfgs["crawler"].n_listings
+        elif n_listings == -1:
+            n_listings = INFINITY
+
+        if n_reviews is None:
+            n_reviews = self.cfgs["crawler"].n_reviews
+        elif n_reviews == -1:
+            n_reviews = INFINITY
+
+        # 2. Extract listing information
+        if self.checkpoint.get("listings_done"):
+            # 2.1 Listings are extracted in the last run
+            listing_infos, _ = self.checkpoint.load_listings()
+        else:
+            # 2.2 Load search page in the browser
+            listing_infos = self._extract_listings(n_listings, n_reviews)
+            self.checkpoint.save_listings(listing_infos, page=1)
+            self.checkpoint.set("listings_done", True)
+
+        return dict(
+            listings=listing_infos,
+            reviews=[],
+        )
 
     @D
     def search(self):
         """Search product on Navershopping"""
+        listing_infos = self._extract_listings(
+            self.cfgs["crawler"].n_listings, self.cfgs["crawler"].n_reviews
+        )
+        pprint(listing_infos)
+        self._load(dict(listings=listing_infos))
+
+    @D
+    def _extract_listings(self, n_listings: int, n_reviews: int) -> list[dict]:
+        """Extract listings of search pages (until `n_listings` or `n_reviews`)"""
         # Change the query
+        capture = self._get_network_capture("listings")
         self._load_search_page()
 
         # Container
         result = []
-        n_reviews = 0
+        total_n_reviews = 0
         n_pages = 0
+        last_n_listings = 0
         while True:
-            last_n_listings = 0
             try:
-                # 1. Scroll to the bottom of the page
-                scroll(self.driver)
+                # 1. Scroll to the bottom of the page (until more items are loaded)
+                try:
+                    scroll(
+                        self.driver,
+                        wait_for=n_elements_changed(LISTING_SELECTOR, last_n_listings),
+                    )
+                except TimeoutException:
+                    pass
 
                 # 2. Get visible items
-                listing_elems = find_elements(
-                    self.driver, "div[class^='listContainer_list_inner'] > div"
-                )
+                listing_elems = find_elements(self.driver, LISTING_SELECTOR)
                 cur_n_listings = len(listing_elems)
 
                 # 3. Check if there are more items
                 if cur_n_listings > last_n_listings:
                     # 3.1 If there are more items, continue scrolling
                     print(
-                        f"  Continue scroll / # extracted items: {len(result)} / # reviews: {n_reviews} / # pages: {n_pages}"
+                        f"  Continue scroll / # extracted items: {len(result)} / # reviews: {total_n_reviews} / # pages: {n_pages}"
                     )
-                    sleep(1)
                     last_n_listings = cur_n_listings
-                else:
-                    # 3.2 If there are no more items, go to next page or finish
-                    items_info = self._extract_items(listing_elems)
-                    result.extend(items_info)
-                    n_pages += 1
-
-                    # Terminal conditions
-                    next_button = self._get_next_button()
-                    cond_end = "paginator_disabled" in next_button.get_attribute(
-                        "class"
-                    )
-                    n_reviews += sum(
-                        int(item.get("review_count", 0)) for item in items_info
-                    )
-                    cond_max_reviews = n_reviews >= self.cfgs["crawler"].n_reviews
-                    cond_max_items = len(result) >= self.cfgs["crawler"].n_listings
+                    continue
 
-                    print(
-                        f"  # extracted items: {len(result)} / # reviews: {n_reviews} / # pages: {n_pages}"
-                    )
+                # 3.2 If there are no more items, go to next page or finish
+                items_info = self._extract_page_items(listing_elems, capture)
+                result.extend(items_info)
+                n_pages += 1
 
-                    if any((cond_end, cond_max_reviews, cond_max_items)):
-                        pprint(result)
-                        self.es_manager.insert_documents(
-                            result, index=self.cfgs["es"]["listings"]["index"]
-                        )
-                        return
-                    else:
-                        next_button.click()
-                        break
+                # Terminal conditions
+                next_button = self._get_next_button()
+                cond_end = (next_button is None) or (
+                    "paginator_disabled" in next_button.get_attribute("class")
+                )
+                total_n_reviews += sum(
+                    int(item.get("review_count") or 0) for item in items_info
+                )
+                cond_max_reviews = total_n_reviews >= n_reviews
+                cond_max_items = len(result) >= n_listings
+
+                print(
+                    f"  # extracted items: {len(result)} / # reviews: {total_n_reviews} / # pages: {n_pages}"
+                )
+
+                if any((cond_end, cond_max_reviews, cond_max_items)):
+                    break
+                click(
+                    self.driver,
+                    element=next_button,
+                    wait_for=element_replaced(listing_elems[0]),
+                )
+                last_n_listings = 0
             except TimeoutException as e:
                 print(e)
                 print(
-                    f"  # extracted items: {len(result)} / # reviews: {n_reviews} / # pages: {n_pages}"
+                    f"  # extracted items: {len(result)} / # reviews: {total_n_reviews} / # pages: {n_pages}"
                 )
-
-    def _filter(self, item_info: dict) -> bool:
-        """Filter items"""
-        normalize = lambda s: s.replace(" ", "").lower()
-
-        # Condition 1. listing_title should include all words in product_name (case insensitive, space removed)
-        normalized_product_name = item_info["product_name"].lower()
-        normalized_listing_title = normalize(item_info["listing_title"])
-        words_in_product_name = normalized_product_name.split(" ")
-        cond1 = all(word in normalized_listing_title for word in words_in_product_name)
-
-        # filter redirection to other known platforms
-        cond2 = all(
-            seller_name not in normalize(item_info["seller_name"])
-            for seller_name in map(normalize, CFG_CRAWLER.known_marketplaces)
-        )
-
-        # TODO: filter with image
-        cond3 = True
-
-        conds = [cond1, cond2, cond3]
-        return all(conds)
+                break
+        return result[:n_listings]
+
+    def _get_next_button(self) -> WebElement | None:
+        """Get the next page button of the paginator"""
+        return find_element(self.driver, "a[class^='paginator_btn_next']")
+
+    def _filter(self, items_info: list[dict]) -> list[dict]:
+        """Filter items of a page (each condition is computed for the whole page at once)"""
+        if not items_info:
+            return []
+        import numpy as np
+        from gjdanawa_uploader.utils.vector_index import VECTORIZER
+
+        cfg = self.cfgs["crawler"].relevance
+
+        # Condition 1. listing_title should include the product_name (case insensitive, space removed)
+        # NOTE: fraction of character n-grams of product_name in listing_title
+        titles = [info["listing_title"] or "" for info in items_info]
+        coverages = VECTORIZER.coverage(self.product_name, titles)
+        cond1 = coverages >= cfg.get("min_coverage", 1.0)
+
+        # Condition 2. filter redirection to other known platforms
+        sellers = [VECTORIZER.normalize(info["seller_name"]) for info in items_info]
+        cond2 = np.array([KNOWN_MARKETPLACES.search(s) is None for s in sellers])
+
+        # Condition 3. thumbnail should look like a reference image (perceptual hash)
+        if self.image_matcher is not None:
+            thumbnail_urls = [info["thumbnail_url"] for info in items_info]
+            cond3 = self.image_matcher.match(thumbnail_urls)
+        else:
+            cond3 = np.ones(len(items_info), dtype=bool)
+
+        conds = cond1 & cond2 & cond3
+        return [info for info, cond in zip(items_info, conds) if cond]
+
+    def _extract_page_items(
+        self, listing_elems: list[WebElement], capture: NetworkCapture | None = None
+    ) -> list[dict]:
+        """Extract items information of the current page
+
+        Items are parsed from the captured JSON responses in network extraction mode,
+        and from the elements otherwise (or if nothing is captured).
+        """
+        if capture:
+            capture.poll()
+            items_info = self._parse_network_responses("listings", capture.responses)
+            capture.responses = []
+            if items_info:
+                return self._filter(items_info)
+        return self._extract_items(listing_elems)
 
     def _extract_items(self, listing_elems: list[WebElement]) -> list[dict]:
         """Extract items information"""
@@ -137,7 +245,9 @@ class NavershoppingCrawler(BaseCrawler):
 
             # div.product_info_main > span.product_img_area > img
             thumbnail_url = find_element(
-                _product_info_main, "span[class^='product_img_area'] > img"
+                _product_info_main,
+                "span[class^='product_img_area'] > img",
+                attribute="url",
             )
             extracted_info["thumbnail_url"] = thumbnail_url
 
@@ -150,6 +260,7 @@ class NavershoppingCrawler(BaseCrawler):
             product_label = find_element(
                 _product_txt_area,
                 "span[class^='product_info_tit'] > span[class^='product_label']",
+                astype=str,
             )
             # TODO: change name
             etc["label"] = product_label
@@ -158,6 +269,7 @@ class NavershoppingCrawler(BaseCrawler):
             listing_title = find_element(
                 _product_txt_area,
                 "span[class^='product_info_tit']",
+                astype=str,
                 removeprefix=product_label,
             )
             extracted_info["listing_title"] = listing_title
@@ -170,15 +282,15 @@ class NavershoppingCrawler(BaseCrawler):
             for e in _product_info_count:
                 if e.get_attribute("class").startswith("product_grade"):
                     # Review grade
-                    label = find_element(e, "span.blind")
-                    count = find_element(e, "strong")
+                    label = find_element(e, "span.blind", astype=str)
+                    count = find_element(e, "strong", astype=float, pattern=r"([\d.]+)")
                     extracted_info["rating"] = count
 
                     # Review count
-                    count = find_element(e, "em")
+                    count = find_element(e, "em", astype=int, pattern=r"(\d+)")
                     extracted_info["review_count"] = count
                 else:
-                    count = find_element(e, "em")
+                    count = find_element(e, "em", astype=str, default="")
                     label = e.text.removesuffix(count)
                     etc[label] = count
 
@@ -186,6 +298,7 @@ class NavershoppingCrawler(BaseCrawler):
             product_num = find_element(
                 _product_txt_area,
                 "div[class^='product_price'] > span[class^='product_num']",
+                astype=int,
                 removesuffix=self.metadata.currency,
             )
             extracted_info["price"] = product_num
@@ -194,12 +307,14 @@ class NavershoppingCrawler(BaseCrawler):
             _delivery_fee_tag = find_element(
                 _product_txt_area,
                 "div[class^='product_price'] > span[class^='product_delivery'] > span[class^='blind']",
+                astype=str,
             )
 
             # div.product_info_main > div.product_txt_area > div.product_price > span.product_delivery
             delivery_fee = find_element(
                 _product_txt_area,
                 "div[class^='product_price'] > span[class^='product_delivery']",
+                astype=int,
                 removeprefix=_delivery_fee_tag,
                 removesuffix=self.metadata.currency,
             )
@@ -221,7 +336,7 @@ class NavershoppingCrawler(BaseCrawler):
             # )
 
             # div.product_info_main > a
-            product_url = find_element(_product_info_main, "a")
+            product_url = find_element(_product_info_main, "a", attribute="url")
             extracted_info["listing_url"] = product_url
 
             # div.productExpandSub_info_sub > div.expandList_info_sub_list
@@ -230,16 +345,16 @@ class NavershoppingCrawler(BaseCrawler):
                 "div[class^='productExpandSub_info_sub'] > div[class^='expandList_info_sub_list'] > dl",
             )
             for info in _info_sub:
-                key = find_element(info, "dt")
-                value = find_element(info, "dd")
+                key = find_element(info, "dt", astype=str)
+                value = find_element(info, "dd", astype=str)
                 etc[key] = value
             extracted_info["etc"] = etc
 
             # TODO: expand sub info
 
-            if self._filter(extracted_info):
-                items_info.append(extracted_info)
+            items_info.append(extracted_info)
 
+        items_info = self._filter(items_info)
         pprint(items_info)
         return items_info
 
@@ -247,6 +362,6 @@ class NavershoppingCrawler(BaseCrawler):
 if __name__ == "__main__":
     # https://www.nike.com/kr/t/%ED%8E%98%EA%B0%80%EC%88%98%EC%8A%A4-41-%EB%B8%94%EB%A3%A8%ED%94%84%EB%A6%B0%ED%8A%B8-%EB%82%A8%EC%84%B1-%EB%A1%9C%EB%93%9C-%EB%9F%AC%EB%8B%9D%ED%99%94-k2kls9T1/HF0013-900
     crawler = NavershoppingCrawler(
-        product_name="페가수스 41 블루프린트", brand_name="나이키"
+        product_name="페가수스 41 블루프린트", brand_name="나이키", session_id=None
     )
-    response = crawler.search()
+    crawler.run()
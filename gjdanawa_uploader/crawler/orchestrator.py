@@ -0,0 +1,291 @@
+"""Crawl Orchestrator: crawl many products x marketplaces concurrently"""
+
+import os
+import json
+import heapq
+import asyncio
+import hashlib
+import argparse
+import itertools
+import traceback
+import uuid
+from dataclasses import dataclass, field, asdict
+from time import perf_counter
+
+from gjdanawa_uploader.configs import CFG_CRAWLER, CHECKPOINT_PATH
+from gjdanawa_uploader.core.loader import load_yaml
+from gjdanawa_uploader.core.utils import tprint
+from gjdanawa_uploader.crawler.base_crawler import get_crawler_class
+
+
+@dataclass(order=True)
+class CrawlJob:
+    """Crawl job of a product in a marketplace (lower priority runs first)"""
+
+    priority: int
+    brand_name: str = field(compare=False)
+    product_name: str = field(compare=False)
+    marketplace: str = field(compare=False)
+    n_listings: int | None = field(default=None, compare=False)
+    n_reviews: int | None = field(default=None, compare=False)
+    reference_image_urls: list[str] | None = field(default=None, compare=False)
+
+    @property
+    def key(self) -> str:
+        return f"{self.marketplace}|{self.brand_name}|{self.product_name}"
+
+
+class CrawlOrchestrator:
+    """Schedule crawl jobs over a fixed budget of browser workers.
+
+    - Jobs run in priority order, with per-marketplace concurrency caps.
+    - Marketplaces with jobs of the same priority take turns (fair sharing).
+    - Finished jobs are checkpointed and skipped when the orchestrator is restarted.
+      The default checkpoint is named after the jobs (or the session id), and the
+      session id is kept in it, so a restart with the same jobs resumes the session.
+
+    Example:
+        >>> products = [dict(brand_name="센카", product_name="퍼펙트휩")]
+        >>> jobs = make_jobs(products, ["danawa", "m11st"])
+        >>> report = CrawlOrchestrator(jobs, n_workers=4).run()
+    """
+
+    def __init__(
+        self,
+        jobs: list[CrawlJob],
+        n_workers: int | None = None,
+        marketplace_caps: dict[str, int] | None = None,
+        checkpoint_path: str | None = None,
+        session_id: str | None = None,
+        crawler_kwargs: dict | None = None,
+    ):
+        self.jobs = jobs
+        self.n_workers = n_workers or CFG_CRAWLER.orchestrator.n_workers
+        self.marketplace_caps = {
+            marketplace: marketplace_cfg.get("max_workers", self.n_workers)
+            for marketplace, marketplace_cfg in CFG_CRAWLER.marketplaces.items()
+        }
+        self.marketplace_caps.update(marketplace_caps or {})
+        self.checkpoint_path = checkpoint_path or os.path.join(
+            CHECKPOINT_PATH, f"orchestrator_{session_id or self._jobs_digest()}.json"
+        )
+        self.crawler_kwargs = crawler_kwargs or {}
+        checkpoint = self._load_checkpoint()
+        self.session_id = (
+            session_id or checkpoint.get("session_id") or str(uuid.uuid4())
+        )
+        self.results: dict[str, dict] = checkpoint.get("results", {})
+
+    ############################################################
+    # Run
+    ############################################################
+    def run(self) -> dict:
+        """Run all jobs and return the aggregated report"""
+        return asyncio.run(self.arun())
+
+    async def arun(self) -> dict:
+        """Run all jobs asynchronously"""
+        print(f"Session: {self.session_id} (checkpoint: {self.checkpoint_path})")
+
+        # 1. Queue jobs except finished ones
+        # (priority, sequence, job): jobs of the same priority run in FIFO order
+        self._queues: dict[str, list[tuple[int, int, CrawlJob]]] = {}
+        self._running: dict[str, int] = {}
+        self._turns = itertools.count()
+        self._last_turn: dict[str, int] = {}
+        sequence = itertools.count()
+        for job in self.jobs:
+            if self.results.get(job.key, {}).get("status") == "done":
+                continue
+            heapq.heappush(
+                self._queues.setdefault(job.marketplace, []),
+                (job.priority, next(sequence), job),
+            )
+            self._running.setdefault(job.marketplace, 0)
+        self._cond = asyncio.Condition()
+
+        # 2. Run workers
+        start_time = perf_counter()
+        await asyncio.gather(*(self._worker() for _ in range(self.n_workers)))
+        return self.report(elapsed_time=perf_counter() - start_time)
+
+    async def _worker(self):
+        while job := await self._next_job():
+            result = await asyncio.to_thread(self._run_job, job)
+            async with self._cond:
+                self._running[job.marketplace] -= 1
+                self.results[job.key] = result
+                self._save_checkpoint()
+                self._cond.notify_all()
+
+    async def _next_job(self) -> CrawlJob | None:
+        """Pop the next job (None if there is no job left)"""
+        async with self._cond:
+            while True:
+                if not any(self._queues.values()):
+                    return None
+                candidates = [
+                    marketplace
+                    for marketplace, queue in self._queues.items()
+                    if queue
+                    and self._running[marketplace]
+                    < self.marketplace_caps.get(marketplace, self.n_workers)
+                ]
+                if candidates:
+                    # Highest priority first, least recently served marketplace on ties
+                    marketplace = min(
+                        candidates,
+                        key=lambda m: (
+                            self._queues[m][0][0],
+                            self._last_turn.get(m, -1),
+                        ),
+                    )
+                    self._last_turn[marketplace] = next(self._turns)
+                    self._running[marketplace] += 1
+                    return heapq.heappop(self._queues[marketplace])[-1]
+                await self._cond.wait()
+
+    def _run_job(self, job: CrawlJob) -> dict:
+        """Run a crawl job (in a worker thread)"""
+        print(f"[Start] {job.key}")
+        start_time = perf_counter()
+        result = dict(job=asdict(job), n_listings=0, n_reviews=0, error=None)
+        try:
+            crawler_cls = get_crawler_class(job.marketplace)
+            crawler = crawler_cls(
+                job.product_name,
+                job.brand_name,
+                session_id=self.session_id,
+                reference_image_urls=job.reference_image_urls,
+                **self.crawler_kwargs,
+            )
+            infos = crawler.run(job.n_listings, job.n_reviews)
+            result.update(
+                status="done",
+                n_listings=len(infos.get("listings", [])),
+                n_reviews=len(infos.get("reviews", [])),
+            )
+        except Exception as e:
+            print(f"[Failure] {job.key}")
+            print(traceback.format_exc())
+            result.update(status="failed", error=repr(e))
+        result["elapsed_time"] = perf_counter() - start_time
+        print(
+            f"[{result['status'].capitalize()}] {job.key} ({result['elapsed_time']:.2f}s)"
+        )
+        return result
+
+    ############################################################
+    # Checkpoint and report
+    ############################################################
+    def _jobs_digest(self) -> str:
+        """Digest of the job keys (the default checkpoint of the same jobs)"""
+        keys = "\n".join(sorted(job.key for job in self.jobs))
+        return hashlib.sha1(keys.encode()).hexdigest()[:12]
+
+    def _load_checkpoint(self) -> dict:
+        """Session id and results of the last run"""
+        if self.checkpoint_path and os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path, "r", encoding="utf8") as f:
+                return json.load(f)
+        return {}
+
+    def _save_checkpoint(self):
+        if not self.checkpoint_path:
+            return
+        dir_path = os.path.dirname(os.path.abspath(self.checkpoint_path))
+        os.makedirs(dir_path, exist_ok=True)
+        tmp_path = f"{self.checkpoint_path}.tmp"
+        with open(tmp_path, "w", encoding="utf8") as f:
+            json.dump(
+                dict(session_id=self.session_id, results=self.results),
+                f,
+                ensure_ascii=False,
+                indent=2,
+            )
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def report(self, elapsed_time: float | None = None) -> dict:
+        """Aggregate results of the jobs"""
+        results = [
+            self.results[job.key] for job in self.jobs if job.key in self.results
+        ]
+        per_marketplace = {}
+        for result in results:
+            marketplace = result["job"]["marketplace"]
+            row = per_marketplace.setdefault(
+                marketplace,
+                dict(done=0, failed=0, n_listings=0, n_reviews=0, elapsed_time=0.0),
+            )
+            row[result["status"]] += 1
+            row["n_listings"] += result["n_listings"]
+            row["n_reviews"] += result["n_reviews"]
+            row["elapsed_time"] += result["elapsed_time"]
+        return dict(
+            session_id=self.session_id,
+            n_jobs=len(self.jobs),
+            n_done=sum(result["status"] == "done" for result in results),
+            n_failed=sum(result["status"] == "failed" for result in results),
+            elapsed_time=elapsed_time,
+            marketplaces=per_marketplace,
+            jobs=results,
+        )
+
+
+def make_jobs(
+    products: list[dict],
+    marketplaces: list[str],
+    n_listings: int | None = None,
+    n_reviews: int | None = None,
+) -> list[CrawlJob]:
+    """Make jobs of products x marketplaces
+
+    Args:
+        products (list[dict]): Products with `brand_name`, `product_name` and optional
+            `priority`, `reference_image_urls`
+        marketplaces (list[str]): Marketplaces to crawl
+    """
+    return [
+        CrawlJob(
+            priority=product.get("priority", 0),
+            brand_name=product["brand_name"],
+            product_name=product["product_name"],
+            marketplace=marketplace,
+            n_listings=n_listings,
+            n_reviews=n_reviews,
+            reference_image_urls=product.get("reference_image_urls"),
+        )
+        for product in products
+        for marketplace in marketplaces
+    ]
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Crawl products x marketplaces")
+    parser.add_argument("products", help="YAML file with a list of products")
+    parser.add_argument("--marketplaces", nargs="+", default=["danawa", "m11st"])
+    parser.add_argument("--n-workers", type=int, default=None)
+    parser.add_argument("--n-listings", type=int, default=None)
+    parser.add_argument("--n-reviews", type=int, default=None)
+    parser.add_argument("--checkpoint", default=None)
+    parser.add_argument("--session-id", default=None)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    products = load_yaml(args.products)
+    jobs = make_jobs(products, args.marketplaces, args.n_listings, args.n_reviews)
+    orchestrator = CrawlOrchestrator(
+        jobs,
+        n_workers=args.n_workers,
+        checkpoint_path=args.checkpoint,
+        session_id=args.session_id,
+    )
+    report = orchestrator.run()
+    tprint(
+        [dict(marketplace=key, **val) for key, val in report["marketplaces"].items()]
+    )
+    print(
+        f"# jobs: {report['n_jobs']} / # done: {report['n_done']} / # failed: {report['n_failed']} / elapsed: {report['elapsed_time']:.2f}s"
+    )
@@ -0,0 +1,291 @@
+"""Crawl Worker: pull crawl jobs from a broker in worker processes
+
+Usage:
+    # 1. Queue search jobs of products x marketplaces
+    python -m gjdanawa_uploader.crawler.worker submit products.yml --marketplaces danawa m11st
+
+    # 2. Run worker processes (on one or more machines sharing the broker)
+    python -m gjdanawa_uploader.crawler.worker work --n-workers 4
+
+    # 3. Check progress and collect results
+    python -m gjdanawa_uploader.crawler.worker status
+    python -m gjdanawa_uploader.crawler.worker collect --session-id <session_id> --load  # --export: Parquet files
+"""
+
+import os
+import argparse
+import threading
+import traceback
+import multiprocessing as mp
+import uuid
+from time import sleep, perf_counter
+
+from gjdanawa_uploader.configs import CFG_CRAWLER, CFG_ES, CHECKPOINT_PATH, EXPORT_PATH
+from gjdanawa_uploader.core.loader import load_yaml
+from gjdanawa_uploader.core.utils import tprint
+from gjdanawa_uploader.utils.broker import Broker, Job, get_broker
+from gjdanawa_uploader.crawler.base_crawler import BaseCrawler, get_crawler_class
+
+
+DEFAULT_BROKER_URL = f"sqlite:///{os.path.join(CHECKPOINT_PATH, 'broker.sqlite3')}"
+
+
+def get_broker_url(broker_url: str | None = None) -> str:
+    """Broker URL from the argument, config or the local SQLite default"""
+    return broker_url or CFG_CRAWLER.worker.get("broker_url") or DEFAULT_BROKER_URL
+
+
+def submit(
+    broker: Broker,
+    products: list[dict],
+    marketplaces: list[str],
+    n_listings: int | None = None,
+    n_reviews: int | None = None,
+    session_id: str | None = None,
+) -> str:
+    """Queue search jobs of products x marketplaces and return the session id"""
+    session_id = session_id or str(uuid.uuid4())
+    for product in products:
+        for marketplace in marketplaces:
+            payload = dict(
+                brand_name=product["brand_name"],
+                product_name=product["product_name"],
+                session_id=session_id,
+                n_listings=n_listings,
+                n_reviews=n_reviews,
+                reference_image_urls=product.get("reference_image_urls"),
+            )
+            broker.push(Job("search", marketplace, payload))
+    return session_id
+
+
+class Worker:
+    """Crawl worker (one browser per marketplace, one crawler per product, reused across jobs)
+
+    Example:
+        >>> Worker("sqlite:///checkpoints/broker.sqlite3").run()
+    """
+
+    def __init__(
+        self,
+        broker_url: str,
+        chrome_option: str | None = None,
+        poll_interval: float | None = None,
+        stale_timeout: float | None = None,
+    ):
+        cfg = CFG_CRAWLER.worker
+        self.broker = get_broker(broker_url, max_attempts=cfg.max_attempts)
+        self.chrome_option = chrome_option
+        self.poll_interval = poll_interval or cfg.poll_interval
+        self.stale_timeout = stale_timeout or cfg.stale_timeout
+        self.drivers = {}
+        self.crawlers: dict[tuple, BaseCrawler] = {}
+        self.n_done = 0
+        self.n_failed = 0
+
+    def run(self):
+        """Handle jobs until there is no queued or running job"""
+        try:
+            while True:
+                job = self.broker.pop()
+                if job is None:
+                    if self.broker.is_idle():
+                        break
+                    # Jobs of crashed workers are requeued
+                    self.broker.requeue_stale(self.stale_timeout)
+                    sleep(self.poll_interval)
+                    continue
+                self._handle(job)
+        finally:
+            for crawler in self.crawlers.values():
+                crawler.close()
+            for driver in self.drivers.values():
+                driver.quit()
+        print(
+            f"[Worker {os.getpid()}] # done: {self.n_done} / # failed: {self.n_failed}"
+        )
+
+    def _handle(self, job: Job):
+        """Handle a job with the crawler of the job's product"""
+        key = f"{job.kind}#{job.id} {job.marketplace}|{job.payload['brand_name']} {job.payload['product_name']}"
+        start_time = perf_counter()
+        stop_heartbeat = threading.Event()
+        heartbeat = threading.Thread(
+            target=self._heartbeat, args=(job, stop_heartbeat), daemon=True
+        )
+        heartbeat.start()
+        try:
+            crawler = self._get_crawler(job)
+            result = crawler.handle_job(job)
+            if self.broker.complete(job, result):
+                self.n_done += 1
+                print(f"[Done] {key} ({perf_counter() - start_time:.2f}s)")
+            else:
+                print(f"[Skip] {key}: the job is requeued or done by another worker")
+        except Exception as e:
+            print(f"[Failure] {key}")
+            print(traceback.format_exc())
+            self.broker.fail(job, repr(e))
+            self.n_failed += 1
+        finally:
+            stop_heartbeat.set()
+            heartbeat.join()
+
+    def _heartbeat(self, job: Job, stop: threading.Event):
+        """Keep the running job from being requeued as stale (long review jobs)"""
+        interval = self.stale_timeout / 4
+        while not stop.wait(interval):
+            if not self.broker.heartbeat(job):
+                print(f"[Warning] Job #{job.id} is not owned by the worker anymore")
+                return
+
+    def _get_crawler(self, job: Job) -> BaseCrawler:
+        """Get the crawler of the job's product (sharing the worker's driver)
+
+        Crawlers are cached, so their checkpoint and listing index connections are
+        opened once per product and closed when the worker stops.
+        """
+        key = (
+            job.marketplace,
+            job.payload["session_id"],
+            job.payload["brand_name"],
+            job.payload["product_name"],
+        )
+        if key not in self.crawlers:
+            crawler_cls = get_crawler_class(job.marketplace)
+            self.crawlers[key] = crawler_cls(
+                job.payload["product_name"],
+                job.payload["brand_name"],
+                session_id=job.payload["session_id"],
+                chrome_option=self.chrome_option,
+                reference_image_urls=job.payload.get("reference_image_urls"),
+            )
+        crawler = self.crawlers[key]
+        if job.kind != "search" and crawler._driver is None:
+            # Search jobs only queue listing pages (no driver)
+            if job.marketplace not in self.drivers:
+                self.drivers[job.marketplace] = crawler.driver
+            crawler.driver = self.drivers[job.marketplace]
+        return crawler
+
+
+def _run_worker(broker_url: str, chrome_option: str | None):
+    Worker(broker_url, chrome_option=chrome_option).run()
+
+
+def work(broker_url: str, n_workers: int, chrome_option: str | None = None):
+    """Run worker processes and wait for them"""
+    processes = [
+        mp.Process(target=_run_worker, args=(broker_url, chrome_option))
+        for _ in range(n_workers)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+
+def collect(
+    broker: Broker,
+    session_id: str | None = None,
+    load: bool = False,
+    export: bool = False,
+) -> dict:
+    """Collect extracted documents of the session (and load them to the storage or Parquet files)
+
+    Documents are deduplicated by the id fields of their index (e.g. a listing
+    saved by its listing page and its reviews job).
+    """
+    infos = {
+        key: _dedupe(broker.results(key, session_id), CFG_ES[key].id_fields)
+        for key in ("listings", "reviews")
+    }
+    if export:
+        from gjdanawa_uploader.utils.parquet_sink import ParquetSink
+
+        cfg = CFG_CRAWLER.parquet_export
+        with ParquetSink(cfg.path or EXPORT_PATH, cfg.row_group_size) as sink:
+            for key, data in infos.items():
+                sink.write(key, data)
+        print(f"Parquet export: {sink.stats} (path: {sink.path})")
+    if load:
+        from gjdanawa_uploader.utils.storage import get_storage
+
+        with get_storage() as storage:
+            for key, data in infos.items():
+                storage.insert_documents(data, index=CFG_ES[key].index)
+    return infos
+
+
+def _dedupe(documents: list[dict], id_fields: list[str]) -> list[dict]:
+    """Keep the last document per id (documents without id fields are kept)"""
+    if not id_fields:
+        return documents
+    unique = {}
+    for i, document in enumerate(documents):
+        key = tuple(document.get(name) for name in id_fields)
+        unique[key if any(key) else i] = document
+    return list(unique.values())
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Distributed crawl workers")
+    parser.add_argument("--broker", default=None, help="sqlite:///path or redis://...")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    parser_submit = subparsers.add_parser("submit", help="Queue search jobs")
+    parser_submit.add_argument("products", help="YAML file with a list of products")
+    parser_submit.add_argument("--marketplaces", nargs="+", default=["danawa", "m11st"])
+    parser_submit.add_argument("--n-listings", type=int, default=None)
+    parser_submit.add_argument("--n-reviews", type=int, default=None)
+    parser_submit.add_argument("--session-id", default=None)
+
+    parser_work = subparsers.add_parser("work", help="Run worker processes")
+    parser_work.add_argument("--n-workers", type=int, default=None)
+    parser_work.add_argument("--chrome-option", default=None)
+
+    subparsers.add_parser("status", help="Show the number of jobs per status")
+
+    parser_collect = subparsers.add_parser("collect", help="Collect results")
+    parser_collect.add_argument(
+        "--session-id", default=None, help="Session of the submit (default: all)"
+    )
+    parser_collect.add_argument(
+        "--load", action="store_true", help="Load to the storage"
+    )
+    parser_collect.add_argument(
+        "--export", action="store_true", help="Export to Parquet files"
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    broker_url = get_broker_url(args.broker)
+    match args.command:
+        case "submit":
+            products = load_yaml(args.products)
+            session_id = submit(
+                get_broker(broker_url),
+                products,
+                args.marketplaces,
+                args.n_listings,
+                args.n_reviews,
+                args.session_id,
+            )
+            print(f"Jobs submitted: {broker_url} (session_id: {session_id})")
+        case "work":
+            n_workers = args.n_workers or CFG_CRAWLER.worker.n_workers
+            work(broker_url, n_workers, args.chrome_option)
+        case "status":
+            tprint([get_broker(broker_url).counts()])
+        case "collect":
+            infos = collect(
+                get_broker(broker_url),
+                session_id=args.session_id,
+                load=args.load,
+                export=args.export,
+            )
+            print(
+                f"# listings: {len(infos['listings'])} / # reviews: {len(infos['reviews'])}"
+            )
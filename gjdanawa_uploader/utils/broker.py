@@ -0,0 +1,402 @@
+"""Job broker utilities
+
+Job queue shared by crawl worker processes.
+- SQLite (`sqlite:///path/to/broker.sqlite3`): local, multi-process on one machine
+- Redis (`redis://host:port/db`): multiple machines (requires `redis` package)
+"""
+
+import os
+import json
+import sqlite3
+import threading
+from abc import ABCMeta, abstractmethod
+from contextlib import contextmanager
+from dataclasses import dataclass, field, asdict
+from time import time
+
+
+JOB_KINDS = ("search", "listing_page", "reviews")
+MAX_ATTEMPTS = 3
+
+
+@dataclass
+class Job:
+    """Crawl job
+
+    Attributes:
+        kind (str): "search" | "listing_page" | "reviews"
+        marketplace (str): Marketplace of the crawler
+        payload (dict): Arguments of the job handler
+        attempts (int): Number of claims (identifies the running attempt)
+    """
+
+    kind: str
+    marketplace: str
+    payload: dict = field(default_factory=dict)
+    id: int | None = None
+    attempts: int = 0
+
+    def __post_init__(self):
+        assert self.kind in JOB_KINDS, f"Invalid job kind: {self.kind}"
+
+
+@dataclass
+class JobResult:
+    """Output of a job, committed with the job by `Broker.complete`
+
+    Attributes:
+        documents (dict): Extracted documents per kind ("listings" | "reviews")
+        jobs (list[Job]): Jobs queued by the job (e.g. the next listing page)
+    """
+
+    documents: dict[str, list[dict]] = field(default_factory=dict)
+    jobs: list[Job] = field(default_factory=list)
+
+
+class Broker(metaclass=ABCMeta):
+    """Job broker interface
+
+    A claimed job is owned by its attempt: `heartbeat`, `complete` and `fail`
+    of an attempt whose job was requeued (stale) or finished are ignored, so a
+    job's documents and queued jobs are committed once.
+    """
+
+    def __init__(self, max_attempts: int = MAX_ATTEMPTS):
+        self.max_attempts = max_attempts
+
+    @abstractmethod
+    def push(self, job: Job) -> int:
+        """Queue a job and return its id"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def pop(self) -> Job | None:
+        """Claim a queued job (None if the queue is empty)"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def heartbeat(self, job: Job) -> bool:
+        """Keep the running job from being requeued (False if it is not owned anymore)"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def complete(self, job: Job, result: JobResult) -> bool:
+        """Save the documents, queue the jobs and mark the job as done in one transaction
+
+        Returns:
+            bool: False if the attempt does not own the job anymore (nothing is saved)
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def fail(self, job: Job, error: str):
+        """Requeue the job or mark it as failed after `max_attempts`"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def results(self, kind: str, session_id: str | None = None) -> list[dict]:
+        """Get documents of the kind saved by done jobs (of the session)"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def counts(self) -> dict[str, int]:
+        """Number of jobs per status"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def requeue_stale(self, timeout: float):
+        """Requeue running jobs without heartbeat within timeout (crashed worker)
+
+        Jobs claimed `max_attempts` times are marked as failed (e.g. a page crashing the browser).
+        """
+        raise NotImplementedError
+
+    def is_idle(self) -> bool:
+        """Check if there is no queued or running job"""
+        counts = self.counts()
+        return counts.get("queued", 0) == 0 and counts.get("running", 0) == 0
+
+
+class SQLiteBroker(Broker):
+    """SQLite broker (safe across processes on one machine)"""
+
+    def __init__(
+        self, path: str, timeout: float = 30, max_attempts: int = MAX_ATTEMPTS
+    ):
+        super().__init__(max_attempts)
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # Shared with the heartbeat thread of the worker
+        self._conn = sqlite3.connect(
+            path, timeout=timeout, isolation_level=None, check_same_thread=False
+        )
+        self._lock = threading.Lock()
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind TEXT, marketplace TEXT, payload TEXT,
+                status TEXT DEFAULT 'queued', attempts INTEGER DEFAULT 0,
+                error TEXT, updated_at REAL
+            );
+            CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status);
+            CREATE TABLE IF NOT EXISTS job_results (
+                job_id INTEGER, kind TEXT, session_id TEXT, data TEXT,
+                PRIMARY KEY (job_id, kind)
+            );
+            """
+        )
+
+    @contextmanager
+    def _transaction(self):
+        """Write transaction (claimed with a write lock)"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def push(self, job: Job) -> int:
+        with self._lock:
+            return self._insert(job)
+
+    def _insert(self, job: Job) -> int:
+        cursor = self._conn.execute(
+            "INSERT INTO jobs (kind, marketplace, payload, updated_at) VALUES (?, ?, ?, ?)",
+            (job.kind, job.marketplace, _dumps(job.payload), time()),
+        )
+        job.id = cursor.lastrowid
+        return job.id
+
+    def _update_owned(self, job: Job, status: str, error: str | None = None) -> bool:
+        """Update the job if the attempt is running (the attempt owns the job)"""
+        cursor = self._conn.execute(
+            "UPDATE jobs SET status = ?, error = COALESCE(?, error), updated_at = ? "
+            "WHERE id = ? AND status = 'running' AND attempts = ?",
+            (status, error, time(), job.id, job.attempts),
+        )
+        return cursor.rowcount == 1
+
+    def pop(self) -> Job | None:
+        with self._transaction():
+            row = self._conn.execute(
+                "SELECT id, kind, marketplace, payload, attempts FROM jobs "
+                "WHERE status = 'queued' ORDER BY id LIMIT 1"
+            ).fetchone()
+            if row:
+                self._conn.execute(
+                    "UPDATE jobs SET status = 'running', attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                    (time(), row[0]),
+                )
+        if row is None:
+            return None
+        id, kind, marketplace, payload, attempts = row
+        return Job(kind, marketplace, json.loads(payload), id=id, attempts=attempts + 1)
+
+    def heartbeat(self, job: Job) -> bool:
+        with self._lock:
+            return self._update_owned(job, "running")
+
+    def complete(self, job: Job, result: JobResult) -> bool:
+        with self._transaction():
+            if not self._update_owned(job, "done"):
+                return False
+            session_id = job.payload.get("session_id")
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO job_results (job_id, kind, session_id, data) VALUES (?, ?, ?, ?)",
+                [
+                    (job.id, kind, session_id, _dumps(documents))
+                    for kind, documents in result.documents.items()
+                    if documents
+                ],
+            )
+            for child in result.jobs:
+                self._insert(child)
+        return True
+
+    def fail(self, job: Job, error: str):
+        status = "queued" if job.attempts < self.max_attempts else "failed"
+        with self._lock:
+            self._update_owned(job, status, error)
+
+    def results(self, kind: str, session_id: str | None = None) -> list[dict]:
+        query = "SELECT data FROM job_results WHERE kind = ?"
+        params = [kind]
+        if session_id is not None:
+            query += " AND session_id = ?"
+            params.append(session_id)
+        with self._lock:
+            rows = self._conn.execute(f"{query} ORDER BY job_id", params).fetchall()
+        return [doc for row in rows for doc in json.loads(row[0])]
+
+    def counts(self) -> dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT status, COUNT(*) FROM jobs GROUP BY status"
+            ).fetchall()
+        return dict(rows)
+
+    def requeue_stale(self, timeout: float):
+        with self._transaction():
+            self._conn.execute(
+                "UPDATE jobs SET status = CASE WHEN attempts < ? THEN 'queued' ELSE 'failed' END, "
+                "error = 'stale: no heartbeat', updated_at = ? "
+                "WHERE status = 'running' AND updated_at < ?",
+                (self.max_attempts, time(), time() - timeout),
+            )
+
+
+class RedisBroker(Broker):
+    """Redis-compatible broker
+
+    Job records are updated in WATCH/MULTI transactions, so an attempt whose job
+    is requeued in the meantime does not commit its documents.
+    """
+
+    def __init__(
+        self, url: str, prefix: str = "gjdanawa", max_attempts: int = MAX_ATTEMPTS
+    ):
+        import redis
+
+        super().__init__(max_attempts)
+        self.redis = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def _key(self, name: str) -> str:
+        return f"{self.prefix}:{name}"
+
+    def _record(self, job: Job, status: str, error: str | None = None) -> str:
+        return _dumps(dict(asdict(job), status=status, error=error, updated_at=time()))
+
+    def _load(self, client, job_id) -> dict | None:
+        record = client.hget(self._key("jobs"), job_id)
+        return record and json.loads(record)
+
+    def _update_owned(
+        self, job: Job, status: str, error: str | None = None, on_update=None
+    ) -> bool:
+        """Update the job if the attempt is running (`on_update(pipe)` adds commands)"""
+
+        def _update(pipe) -> bool:
+            record = self._load(pipe, job.id)
+            if not (
+                record
+                and record["status"] == "running"
+                and record["attempts"] == job.attempts
+            ):
+                return False
+            pipe.multi()
+            pipe.hset(self._key("jobs"), job.id, self._record(job, status, error))
+            if status != "running":
+                pipe.lrem(self._key("running"), 1, job.id)
+            if on_update:
+                on_update(pipe)
+            return True
+
+        return self.redis.transaction(
+            _update, self._key("jobs"), value_from_callable=True
+        )
+
+    def push(self, job: Job) -> int:
+        job.id = int(self.redis.incr(self._key("job_id")))
+        pipe = self.redis.pipeline()
+        pipe.hset(self._key("jobs"), job.id, self._record(job, "queued"))
+        pipe.lpush(self._key("queue"), job.id)
+        pipe.execute()
+        return job.id
+
+    def pop(self) -> Job | None:
+        job_id = self.redis.rpoplpush(self._key("queue"), self._key("running"))
+        if job_id is None:
+            return None
+        record = self._load(self.redis, job_id)
+        job = Job(
+            record["kind"],
+            record["marketplace"],
+            record["payload"],
+            id=record["id"],
+            attempts=record["attempts"] + 1,
+        )
+        self.redis.hset(self._key("jobs"), job.id, self._record(job, "running"))
+        return job
+
+    def heartbeat(self, job: Job) -> bool:
+        return self._update_owned(job, "running")
+
+    def complete(self, job: Job, result: JobResult) -> bool:
+        # Ids of queued jobs are reserved before the transaction
+        for child in result.jobs:
+            child.id = int(self.redis.incr(self._key("job_id")))
+        session_id = job.payload.get("session_id")
+
+        def _save(pipe):
+            for kind, documents in result.documents.items():
+                if documents:
+                    pipe.hset(
+                        self._key(f"results:{kind}"),
+                        job.id,
+                        _dumps(dict(session_id=session_id, documents=documents)),
+                    )
+            for child in result.jobs:
+                pipe.hset(self._key("jobs"), child.id, self._record(child, "queued"))
+                pipe.lpush(self._key("queue"), child.id)
+
+        return self._update_owned(job, "done", on_update=_save)
+
+    def fail(self, job: Job, error: str):
+        if job.attempts < self.max_attempts:
+            self._update_owned(
+                job,
+                "queued",
+                error,
+                on_update=lambda pipe: pipe.lpush(self._key("queue"), job.id),
+            )
+        else:
+            self._update_owned(job, "failed", error)
+
+    def results(self, kind: str, session_id: str | None = None) -> list[dict]:
+        records = self.redis.hgetall(self._key(f"results:{kind}"))
+        documents = []
+        for job_id in sorted(records, key=int):
+            record = json.loads(records[job_id])
+            if session_id is None or record["session_id"] == session_id:
+                documents.extend(record["documents"])
+        return documents
+
+    def counts(self) -> dict[str, int]:
+        counts = {}
+        for record in self.redis.hvals(self._key("jobs")):
+            status = json.loads(record)["status"]
+            counts[status] = counts.get(status, 0) + 1
+        return counts
+
+    def requeue_stale(self, timeout: float):
+        for job_id in self.redis.lrange(self._key("running"), 0, -1):
+            record = self._load(self.redis, job_id)
+            if record and record["updated_at"] < time() - timeout:
+                job = Job(
+                    record["kind"],
+                    record["marketplace"],
+                    record["payload"],
+                    id=record["id"],
+                    attempts=record["attempts"],
+                )
+                # Stale jobs are failed through their last attempt
+                self.fail(job, "stale: no heartbeat")
+
+
+def get_broker(url: str, max_attempts: int = MAX_ATTEMPTS) -> Broker:
+    """Get broker from URL (`sqlite:///path` or `redis://...`)"""
+    if url.startswith("sqlite:///"):
+        return SQLiteBroker(url.removeprefix("sqlite:///"), max_attempts=max_attempts)
+    elif url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBroker(url, max_attempts=max_attempts)
+    raise ValueError(f"Invalid broker url: {url}")
+
+
+def _dumps(obj) -> str:
+    return json.dumps(obj, ensure_ascii=False, default=str)
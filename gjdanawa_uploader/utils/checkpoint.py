@@ -0,0 +1,173 @@
+"""Crawl checkpoint utilities
+
+Persist crawl progress (listing pages, finished listings, review offsets) in SQLite.
+"""
+
+import os
+import json
+import sqlite3
+import threading
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS state (
+    crawl_key TEXT, name TEXT, value TEXT,
+    PRIMARY KEY (crawl_key, name)
+);
+CREATE TABLE IF NOT EXISTS listings (
+    crawl_key TEXT, idx INTEGER, listing_url TEXT, info TEXT, done INTEGER DEFAULT 0,
+    PRIMARY KEY (crawl_key, idx)
+);
+CREATE TABLE IF NOT EXISTS reviews (
+    crawl_key TEXT, listing_url TEXT, idx INTEGER, info TEXT,
+    PRIMARY KEY (crawl_key, listing_url, idx)
+);
+"""
+
+
+class CrawlCheckpoint:
+    """Checkpoint of a crawl.
+
+    Example:
+        >>> checkpoint = CrawlCheckpoint("checkpoints/crawls.sqlite3", "danawa|센카 퍼펙트휩")
+        >>> checkpoint.save_listings(listing_infos, page=3)
+        >>> listing_infos, page = checkpoint.load_listings()
+    """
+
+    def __init__(self, path: str, crawl_key: str):
+        self.path = path
+        self.crawl_key = crawl_key
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    def _execute(self, query: str, params: tuple = ()) -> list[tuple]:
+        with self._lock, self._conn:
+            return self._conn.execute(query, params).fetchall()
+
+    ############################################################
+    # State
+    ############################################################
+    def get(self, name: str, default=None):
+        """Get a state value"""
+        rows = self._execute(
+            "SELECT value FROM state WHERE crawl_key = ? AND name = ?",
+            (self.crawl_key, name),
+        )
+        return json.loads(rows[0][0]) if rows else default
+
+    def set(self, name: str, value):
+        """Set a state value"""
+        self._execute(
+            "INSERT OR REPLACE INTO state VALUES (?, ?, ?)",
+            (self.crawl_key, name, json.dumps(value, ensure_ascii=False)),
+        )
+
+    def clear(self):
+        """Remove the checkpoint of the crawl"""
+        for table in ("state", "listings", "reviews"):
+            self._execute(f"DELETE FROM {table} WHERE crawl_key = ?", (self.crawl_key,))
+
+    ############################################################
+    # Listings
+    ############################################################
+    def save_listings(self, listing_infos: list[dict], page: int):
+        """Save listings extracted up to the page"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM listings WHERE crawl_key = ?", (self.crawl_key,)
+            )
+            self._conn.executemany(
+                "INSERT INTO listings (crawl_key, idx, listing_url, info) VALUES (?, ?, ?, ?)",
+                [
+                    (self.crawl_key, idx, info.get("listing_url"), _dumps(info))
+                    for idx, info in enumerate(listing_infos)
+                ],
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO state VALUES (?, 'listings_page', ?)",
+                (self.crawl_key, json.dumps(page)),
+            )
+
+    def load_listings(self) -> tuple[list[dict], int]:
+        """Load saved listings and the last extracted page (0 if nothing is saved)"""
+        rows = self._execute(
+            "SELECT info FROM listings WHERE crawl_key = ? ORDER BY idx",
+            (self.crawl_key,),
+        )
+        return [json.loads(row[0]) for row in rows], self.get("listings_page", 0)
+
+    ############################################################
+    # Reviews
+    ############################################################
+    def add_reviews(
+        self, listing_url: str, review_infos: list[dict], cursor: int | None = None
+    ):
+        """Append reviews of the listing
+
+        Args:
+            cursor (int, optional): Number of review elements read so far (elements
+                without valid reviews included), where the next run resumes
+        """
+        offset = self.review_offset(listing_url)
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO reviews VALUES (?, ?, ?, ?)",
+                [
+                    (self.crawl_key, listing_url, offset + idx, _dumps(info))
+                    for idx, info in enumerate(review_infos)
+                ],
+            )
+            if cursor is not None:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO state VALUES (?, ?, ?)",
+                    (
+                        self.crawl_key,
+                        f"review_cursor|{listing_url}",
+                        json.dumps(cursor),
+                    ),
+                )
+
+    def load_reviews(self, listing_url: str) -> list[dict]:
+        """Load saved reviews of the listing"""
+        rows = self._execute(
+            "SELECT info FROM reviews WHERE crawl_key = ? AND listing_url = ? ORDER BY idx",
+            (self.crawl_key, listing_url),
+        )
+        return [json.loads(row[0]) for row in rows]
+
+    def review_offset(self, listing_url: str) -> int:
+        """Number of saved reviews of the listing"""
+        rows = self._execute(
+            "SELECT COUNT(*) FROM reviews WHERE crawl_key = ? AND listing_url = ?",
+            (self.crawl_key, listing_url),
+        )
+        return rows[0][0]
+
+    def review_cursor(self, listing_url: str) -> int:
+        """Number of review elements read (the number of saved reviews if it is not saved)"""
+        cursor = self.get(f"review_cursor|{listing_url}")
+        return self.review_offset(listing_url) if cursor is None else cursor
+
+    def mark_listing_done(self, listing_info: dict):
+        """Mark reviews of the listing as extracted (and save the updated listing)"""
+        self._execute(
+            "UPDATE listings SET done = 1, info = ? WHERE crawl_key = ? AND listing_url = ?",
+            (_dumps(listing_info), self.crawl_key, listing_info["listing_url"]),
+        )
+
+    def is_listing_done(self, listing_url: str) -> bool:
+        """Check if reviews of the listing are extracted"""
+        rows = self._execute(
+            "SELECT done FROM listings WHERE crawl_key = ? AND listing_url = ?",
+            (self.crawl_key, listing_url),
+        )
+        return bool(rows and rows[0][0])
+
+    def close(self):
+        self._conn.close()
+
+
+def _dumps(info: dict) -> str:
+    return json.dumps(info, ensure_ascii=False, default=str)
@@ -1,28 +1,33 @@
 """Crawling utilities"""
 
+from __future__ import annotations
+
 import re
 import random
-from time import sleep, perf_counter
+import contextlib
+from weakref import WeakKeyDictionary
+from time import perf_counter
 from functools import wraps
 from datetime import datetime
-from typing import Literal
+from typing import Callable, Literal, TYPE_CHECKING
 
 from selenium import webdriver
 from selenium.webdriver.common.by import By
-from selenium.webdriver.remote.webelement import WebElement
 from selenium.common.exceptions import (
     InvalidSelectorException,
     NoSuchElementException,
     TimeoutException,
     ElementClickInterceptedException,
 )
-
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.common.keys import Keys
 
 from gjdanawa_uploader.core.depth_logging import D
+from gjdanawa_uploader.core.profiler import PROFILER
 from gjdanawa_uploader.configs import CFG_CRAWLER
+from gjdanawa_uploader.utils.rate_limiter import RateLimiter, is_blocked_page
+
+if TYPE_CHECKING:
+    from selenium.webdriver.remote.webelement import WebElement
 
 
 ##################################################
@@ -49,8 +54,7 @@ BY_CSS_SELECTOR = By.CSS_SELECTOR
 FREE_WORDS = CFG_CRAWLER.free_words
 INFINITY = 1_000_000_000
 TIMEOUT = 2
-MINIMUM_SLEEP = 0.5
-SLEEP = 1
+DRIVER_RATE_LIMITERS: WeakKeyDictionary = WeakKeyDictionary()
 
 
 class DriverContextManager:
@@ -124,44 +128,137 @@ def get_dev_chrome_options() -> webdriver.ChromeOptions:
     return options
 
 
-def get_chrome_driver(option: str | None = None) -> webdriver.Chrome:
-    """Get singleton anonymous chrome driver"""
+def get_light_chrome_options() -> webdriver.ChromeOptions:
+    """Get anonymous chrome options for crawling text (no images, extensions, background networking)"""
+    options = get_chrome_options()
+    options.add_argument("--disable-extensions")
+    options.add_argument("--disable-background-networking")
+    options.add_argument("--blink-settings=imagesEnabled=false")
+    options.add_argument("--mute-audio")
+    options.add_experimental_option(
+        "prefs", {"profile.managed_default_content_settings.images": 2}
+    )
+    options.page_load_strategy = "eager"
+    return options
+
+
+def block_resources(driver: webdriver.Chrome, url_patterns: list[str]):
+    """Block requests matching the URL patterns via CDP"""
+    driver.execute_cdp_cmd("Network.enable", {})
+    driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": url_patterns})
+
+
+def get_chrome_driver(
+    option: str | None = None, capture_network: bool = False
+) -> webdriver.Chrome:
+    """Get singleton anonymous chrome driver
+
+    Args:
+        option (str, optional): Browser profile
+            - None: Headless
+            - "dev": Headful for debugging
+            - "light": Headless, blocks images, media, fonts and ad/analytics domains
+        capture_network (bool, optional): Enable CDP performance logs for `NetworkCapture`
+    """
     if option is None:
         chrome_options = get_chrome_options()
     elif option == "dev":
         chrome_options = get_dev_chrome_options()
+    elif option == "light":
+        chrome_options = get_light_chrome_options()
     else:
         raise ValueError(f"Invalid option: {option}")
-    return webdriver.Chrome(options=chrome_options)
+    if capture_network:
+        chrome_options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+    driver = webdriver.Chrome(options=chrome_options)
+
+    if option == "light":
+        cfg = CFG_CRAWLER.browser_profiles.light
+        block_resources(driver, cfg.blocked_url_patterns + cfg.blocked_domains)
+    return driver
+
 
+def bind_rate_limiter(driver: webdriver.Chrome, limiter: RateLimiter):
+    """Route navigations of the driver through the rate limiter"""
+    DRIVER_RATE_LIMITERS[driver] = limiter
 
-def wait_until_ready(sleep_after: float = SLEEP):
-    """Wait until the page is loaded"""
-    # TODO: unexpected alert open
-    # WebDriverWait(driver, 2).until(
-    #     lambda d: d.execute_script("return document.readyState") == "complete"
-    # )
-    sleep(sleep_after)
+
+def throttle(driver: webdriver.Chrome):
+    """Rate limit context of the driver (no-op if no rate limiter is bound)"""
+    if limiter := DRIVER_RATE_LIMITERS.get(driver):
+        return limiter.throttle()
+    return contextlib.nullcontext()
+
+
+def wait_until_ready(
+    driver: webdriver.Chrome,
+    condition: Callable | None = None,
+    timeout: float = TIMEOUT,
+):
+    """Wait until the page is loaded and the condition is met (no fixed sleep)
+
+    The pace of requests is controlled by the rate limiter of the driver.
+
+    Args:
+        condition (callable, optional): Called with the driver, e.g. `n_elements_changed(...)`
+        timeout (float, optional): Raise `TimeoutException` after the timeout
+    """
+    WebDriverWait, EC = _get_wait()
+
+    def is_ready(driver: webdriver.Chrome) -> bool:
+        if EC.alert_is_present()(driver):
+            # The alert is handled by the caller (e.g. `click_alert`)
+            return True
+        if driver.execute_script("return document.readyState") != "complete":
+            return False
+        return condition is None or bool(condition(driver))
+
+    with PROFILER.span("wait_until_ready"):
+        WebDriverWait(driver, timeout).until(is_ready)
+
+
+def n_elements_changed(selector: str, n_elems: int) -> Callable:
+    """Condition: the number of elements is changed (e.g. more elements are loaded)"""
+    return lambda driver: len(find_elements(driver, selector)) != n_elems
+
+
+def element_replaced(elem: WebElement) -> Callable:
+    """Condition: the element is removed from the page (e.g. the content is replaced)"""
+    _, EC = _get_wait()
+    return EC.staleness_of(elem)
 
 
 def load_url(driver: webdriver.Chrome, url: str):
-    """Wait for the page to be loaded"""
-    driver.get(url)
-    wait_until_ready()
+    """Wait for the page to be loaded
+
+    The wait is throttled with the navigation, so slow or timed out loads are
+    feedback of the rate limiter.
+    """
+    with throttle(driver):
+        driver.get(url)
+        wait_until_ready(driver)
+    check_blocked_page(driver, url)
+
+
+def check_blocked_page(driver: webdriver.Chrome, url: str):
+    """Back off if the page is a captcha or an error page"""
+    if (limiter := DRIVER_RATE_LIMITERS.get(driver)) and is_blocked_page(driver.title):
+        print(f"[Warning] Blocked page: {url} (title: {driver.title})")
+        limiter.penalize()
 
 
 def click_alert(driver: webdriver.Chrome, action: str):
     """Click the alert window"""
     # 1. Handle the alert window
-    # WebDriverWait(driver, 2).until(EC.alert_is_present())
-    wait_until_ready()
+    WebDriverWait, EC = _get_wait()
+    WebDriverWait(driver, TIMEOUT).until(EC.alert_is_present())
     if action == "accept":
         driver.switch_to.alert.accept()
     elif action == "dismiss":
         driver.switch_to.alert.dismiss()
     else:
         raise ValueError(f"Invalid action: {action}")
-    wait_until_ready()
+    wait_until_ready(driver)
 
 
 def send_keys(driver: webdriver.Chrome, selector: str, value: str, enter: bool = False):
@@ -170,47 +267,67 @@ def send_keys(driver: webdriver.Chrome, selector: str, value: str, enter: bool =
     element.send_keys(value)
     if enter:
         element.send_keys(Keys.RETURN)
-    wait_until_ready()
+    wait_until_ready(driver)
+
+
+def _get_wait():
+    """`WebDriverWait` and `expected_conditions` (imported on first use, slow to import)"""
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
+
+    return WebDriverWait, EC
 
 
 def click(
     driver: webdriver.Chrome,
     selector: str = "",
     element: WebElement | None = None,
-    sleep_after: float = SLEEP,
     timeout: float = TIMEOUT,
+    wait_for: Callable | None = None,
 ):
-    """Click the element by CSS selector"""
+    """Click the element by CSS selector
+
+    Args:
+        wait_for (callable, optional): Condition of `wait_until_ready` after the click
+            (e.g. `element_replaced(elem)` when the content is replaced)
+    """
     if element:
-        try:
-            element.click()
-        except ElementClickInterceptedException:
-            # Element is not visible
-            driver.execute_script("arguments[0].click();", element)
+        with throttle(driver):
+            try:
+                element.click()
+            except ElementClickInterceptedException:
+                # Element is not visible
+                driver.execute_script("arguments[0].click();", element)
+            wait_until_ready(driver, wait_for, timeout)
     else:
-        driver.execute_script(
-            "arguments[0].click();",
-            WebDriverWait(driver, timeout).until(
-                EC.element_to_be_clickable((By.CSS_SELECTOR, selector))
-            ),
+        # NOTE: Missing elements (e.g. the last page) are not treated as congestion
+        WebDriverWait, EC = _get_wait()
+        element = WebDriverWait(driver, timeout).until(
+            EC.element_to_be_clickable((By.CSS_SELECTOR, selector))
         )
-    wait_until_ready(sleep_after)
+        with throttle(driver):
+            driver.execute_script("arguments[0].click();", element)
+            wait_until_ready(driver, wait_for, timeout)
 
 
 def scroll(
     driver: webdriver.Chrome,
-    selector: str,
+    selector: str = "",
     timeout: float = TIMEOUT,
-    sleep_after: float = MINIMUM_SLEEP,
+    wait_for: Callable | None = None,
 ):
-    """Scroll down to the bottom of the page"""
-    driver.execute_script(
-        "arguments[0].scrollIntoView(true);",
-        WebDriverWait(driver, timeout).until(
-            EC.visibility_of_element_located((By.CSS_SELECTOR, selector))
-        ),
-    )
-    wait_until_ready(sleep_after)
+    """Scroll down to the element by CSS selector (the bottom of the page if no selector)"""
+    if selector:
+        WebDriverWait, EC = _get_wait()
+        driver.execute_script(
+            "arguments[0].scrollIntoView(true);",
+            WebDriverWait(driver, timeout).until(
+                EC.visibility_of_element_located((By.CSS_SELECTOR, selector))
+            ),
+        )
+    else:
+        driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+    wait_until_ready(driver, wait_for, timeout)
 
 
 def goto_next_page(
@@ -218,15 +335,23 @@ def goto_next_page(
     cur_page: int,
     page_button_selector: str,
     view_more_page_button_selector: str = "",
-    sleep_after: float = SLEEP,
+    content_selector: str = "",
 ) -> dict:
-    """Go to the next page"""
+    """Go to the next page
+
+    Args:
+        content_selector (str, optional): Elements of the page content, the click
+            waits until they are replaced by the next page
+    """
     next_page = cur_page + 1
+    wait_for = None
+    if content_selector and (elems := find_elements(driver, content_selector)):
+        wait_for = element_replaced(elems[0])
     try:
         click(
             driver,
             selector=page_button_selector.format(page=next_page),
-            sleep_after=sleep_after,
+            wait_for=wait_for,
         )
     except TimeoutException:
         if view_more_page_button_selector:
@@ -234,7 +359,7 @@ def goto_next_page(
                 click(
                     driver,
                     selector=view_more_page_button_selector,
-                    sleep_after=sleep_after,
+                    wait_for=wait_for,
                 )
             except TimeoutException:
                 print(f"End of pages: {cur_page} with url: {driver.current_url}")
@@ -249,15 +374,21 @@ def scroll_until(
     view_more_button_selector: str = "",
     view_more_button_element: WebElement | None = None,
     n_elems: int = INFINITY,
-    sleep_after: float = MINIMUM_SLEEP,
+    on_scroll: callable = None,
 ) -> list[WebElement]:
-    """Scroll until the number of elements is satisfied"""
+    """Scroll until the number of elements is satisfied
+
+    Args:
+        on_scroll (callable, optional): Called after each scroll (e.g. `NetworkCapture.poll`)
+    """
     if n_elems == -1:
         n_elems = INFINITY
 
     last_n_visible_elems = 0
     while True:
         try:
+            if on_scroll:
+                on_scroll()
             visible_elems = find_elements(driver, target_selector)
             n_visible_elems = len(visible_elems)
             elems = visible_elems[:n_elems]
@@ -272,17 +403,18 @@ def scroll_until(
             elif n_visible_elems < n_elems:
                 # 3. If the number of visible elements is less than n_elems, scroll down
                 last_n_visible_elems = n_visible_elems
+                more_elems_loaded = n_elements_changed(target_selector, n_visible_elems)
                 if view_more_button_selector or view_more_button_element:
                     # 3.1 There is a button to load more elements
                     click(
                         driver,
                         selector=view_more_button_selector,
                         element=view_more_button_element,
-                        sleep_after=sleep_after,
+                        wait_for=more_elems_loaded,
                     )
                 else:
                     # 3.2 There is not a button to load more elements
-                    scroll(driver, target_selector)
+                    scroll(driver, target_selector, wait_for=more_elems_loaded)
             else:
                 # 4. If the number of visible elements is satisfied, return the elements
                 return elems
@@ -512,6 +644,49 @@ def get_option_values(
     return values
 
 
+##################################################
+# Extracted information
+##################################################
+REQUIRED_LISTING_FIELDS = ("listing_title", "listing_url")
+REQUIRED_REVIEW_FIELDS = ("content",)
+PRICE_PER_UNIT_PATTERN = re.compile(r"[\d.,]+\s*\S*?당\s*[\d,]+\s*원")
+
+
+def _validate_info(kind: str, required_fields: tuple[str, ...]) -> callable:
+    def decorator(fn: callable) -> callable:
+        @wraps(fn)
+        def _fn(*args, **kwargs) -> dict:
+            try:
+                info = fn(*args, **kwargs)
+            except Exception as e:
+                print(f"[Failure] {kind} extraction: {e!r}")
+                return {}
+            if not info:
+                return {}
+            if missing := [name for name in required_fields if info.get(name) is None]:
+                print(f"[Warning] Invalid {kind} information: no {missing}")
+                return {}
+            return info
+
+        return _fn
+
+    return decorator
+
+
+# Return an empty dict (filtered by the crawlers) for failed or incomplete items
+validate_listing_info = _validate_info("Listing", REQUIRED_LISTING_FIELDS)
+validate_review_info = _validate_info("Review", REQUIRED_REVIEW_FIELDS)
+
+
+def extract_price_per_unit(text: str | None) -> str | None:
+    """Price per unit in the text (e.g. "(10g당 1,290원)" -> "10g당 1,290원")"""
+    if not text:
+        return None
+    if match := PRICE_PER_UNIT_PATTERN.search(text):
+        return match.group()
+    return text.strip(" ()") or None
+
+
 if __name__ == "__main__":
     DRIVER = get_chrome_driver()
     DRIVER.get("https://www.google.com")
@@ -0,0 +1,125 @@
+"""Driver pool utilities
+
+Reuse Chrome drivers across crawlers (e.g. marketplaces crawled concurrently, or
+consecutive products) instead of starting a browser per crawler.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import threading
+
+from selenium import webdriver
+
+from gjdanawa_uploader.utils.crawling import get_chrome_driver, bind_rate_limiter
+from gjdanawa_uploader.utils.rate_limiter import get_rate_limiter
+
+
+class DriverPool:
+    """Pool of Chrome drivers keyed by browser options.
+
+    A driver is used by one crawler at a time. Released drivers are reused by the
+    next crawler with the same options, and bound to the rate limiter of its marketplace.
+
+    Example:
+        >>> pool = DriverPool()
+        >>> with pool.driver("danawa") as driver:
+        ...     crawler.driver = driver  # not quit by the crawler
+        ...     crawler.run()
+        >>> pool.close()
+    """
+
+    def __init__(self, max_size: int | None = None):
+        self.max_size = max_size
+        self._idle: dict[tuple, list[webdriver.Chrome]] = {}
+        self._n_drivers = 0
+        self._cond = threading.Condition()
+
+    def acquire(
+        self,
+        marketplace: str,
+        chrome_option: str | None = None,
+        capture_network: bool = False,
+    ) -> webdriver.Chrome:
+        """Get an idle driver with the options (created if there is none)"""
+        key = (chrome_option, capture_network)
+        with self._cond:
+            while True:
+                if self._idle.get(key):
+                    driver = self._idle[key].pop()
+                    break
+                if (self.max_size is None) or (self._n_drivers < self.max_size):
+                    self._n_drivers += 1
+                    driver = None
+                    break
+                if self._quit_idle_driver():
+                    # Make room for a driver with other options
+                    continue
+                self._cond.wait()
+
+        if driver is None:
+            try:
+                driver = get_chrome_driver(
+                    chrome_option, capture_network=capture_network
+                )
+            except Exception:
+                with self._cond:
+                    self._n_drivers -= 1
+                    self._cond.notify()
+                raise
+            driver._pool_key = key
+        bind_rate_limiter(driver, get_rate_limiter(marketplace))
+        return driver
+
+    def release(self, driver: webdriver.Chrome):
+        """Return the driver to the pool"""
+        with self._cond:
+            self._idle.setdefault(driver._pool_key, []).append(driver)
+            self._cond.notify()
+
+    def discard(self, driver: webdriver.Chrome):
+        """Quit the driver instead of returning it (e.g. crashed browser)"""
+        with contextlib.suppress(Exception):
+            driver.quit()
+        with self._cond:
+            self._n_drivers -= 1
+            self._cond.notify()
+
+    @contextlib.contextmanager
+    def driver(
+        self,
+        marketplace: str,
+        chrome_option: str | None = None,
+        capture_network: bool = False,
+    ):
+        """Use a driver of the pool in the context"""
+        driver = self.acquire(marketplace, chrome_option, capture_network)
+        try:
+            yield driver
+        except BaseException:
+            self.discard(driver)
+            raise
+        else:
+            self.release(driver)
+
+    def _quit_idle_driver(self) -> bool:
+        for drivers in self._idle.values():
+            if drivers:
+                with contextlib.suppress(Exception):
+                    drivers.pop().quit()
+                self._n_drivers -= 1
+                return True
+        return False
+
+    def close(self):
+        """Quit idle drivers"""
+        with self._cond:
+            while self._quit_idle_driver():
+                pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
@@ -0,0 +1,256 @@
+"""Driver scheduler utilities
+
+Commands of a WebDriver are serialized by chromedriver, so threads sharing one
+driver only contend for its connection. Work is scheduled per driver instead:
+- Element work: snapshot all elements of a driver in one round trip and parse in-process
+- Page work: run independent drivers in parallel (one thread per driver)
+"""
+
+from __future__ import annotations
+
+import queue
+import threading
+import contextvars
+import traceback
+from time import perf_counter, sleep
+from typing import Callable, TYPE_CHECKING
+
+from selenium import webdriver
+
+from gjdanawa_uploader.core.profiler import PROFILER
+from gjdanawa_uploader.core.utils import ItemError
+from gjdanawa_uploader.utils.html_element import HtmlElement
+
+if TYPE_CHECKING:
+    from selenium.webdriver.remote.webelement import WebElement
+    from gjdanawa_uploader.utils.rate_limiter import RateLimiter
+
+
+SNAPSHOT_SCRIPT = "return arguments[0].map(elem => elem.outerHTML);"
+
+
+def snapshot_elements(
+    driver: webdriver.Chrome, elems: list[WebElement]
+) -> list[HtmlElement]:
+    """Snapshot elements in one round trip (parsed in-process)"""
+    if not elems:
+        return []
+    with PROFILER.span("snapshot_elements"):
+        htmls = driver.execute_script(SNAPSHOT_SCRIPT, elems)
+        url = driver.current_url
+    return [HtmlElement.from_outer_html(html, url=url) for html in htmls]
+
+
+def snapshot_page(driver: webdriver.Chrome) -> HtmlElement:
+    """Snapshot the current page (parsed in-process)"""
+    with PROFILER.span("snapshot_page"):
+        html = driver.page_source
+        url = driver.current_url
+    return HtmlElement.from_html(html, url=url)
+
+
+def map_elements(
+    driver: webdriver.Chrome, fn: Callable, elems: list[WebElement], *args
+) -> list:
+    """Apply `fn(elem, *args)` to snapshots of the driver's elements"""
+    return [fn(elem, *args) for elem in snapshot_elements(driver, elems)]
+
+
+class DriverScheduler:
+    """Run driver-bound tasks over independent drivers in parallel.
+
+    Each driver runs its tasks sequentially in its own thread and pulls the
+    next item when it is free, so slow pages do not block the other drivers.
+
+    With `create_driver` and a rate limiter, drivers are added (up to `max_drivers`)
+    while the concurrency window of the limiter grows, i.e. while pages load fast
+    and error-free.
+
+    Example:
+        >>> scheduler = DriverScheduler([get_chrome_driver() for _ in range(4)])
+        >>> results = scheduler.map(extract_reviews, listing_infos)  # fn(driver, item)
+    """
+
+    def __init__(
+        self,
+        drivers: list[webdriver.Chrome],
+        create_driver: Callable[[], webdriver.Chrome] | None = None,
+        limiter: RateLimiter | None = None,
+        max_drivers: int | None = None,
+    ):
+        """
+        Args:
+            create_driver (callable, optional): Create a driver to add (added to `drivers`)
+            limiter (RateLimiter, optional): Rate limiter of the drivers' marketplace
+            max_drivers (int, optional): Maximum number of drivers (default: `len(drivers)`)
+        """
+        assert drivers, "At least one driver is required"
+        self.drivers = drivers
+        self.create_driver = create_driver
+        self.limiter = limiter
+        self.max_drivers = max(max_drivers or len(drivers), len(drivers))
+
+    def map(
+        self,
+        fn: Callable,
+        items: list,
+        on_progress: Callable | None = None,
+    ) -> list:
+        """Apply `fn(driver, item)` to the items
+
+        Returns:
+            list: Results in the input order (`ItemError` for failed items)
+        """
+        tasks = queue.Queue()
+        for index, item in enumerate(items):
+            tasks.put((index, item))
+        results = [None] * len(items)
+        lock = threading.Lock()
+        threads = []
+        n_done = 0
+
+        def _run(driver: webdriver.Chrome | None):
+            nonlocal n_done
+            if driver is None:
+                try:
+                    driver = self.create_driver()
+                except Exception:
+                    print("[Warning] Failed to add a driver")
+                    print(traceback.format_exc())
+                    return
+                with lock:
+                    self.drivers.append(driver)
+            while True:
+                try:
+                    index, item = tasks.get_nowait()
+                except queue.Empty:
+                    return
+                try:
+                    result = fn(driver, item)
+                except Exception as e:
+                    result = ItemError(index, repr(e), traceback.format_exc())
+                with lock:
+                    results[index] = result
+                    n_done += 1
+                    if on_progress:
+                        on_progress(n_done, len(items))
+                    if self._can_grow(len(threads), tasks):
+                        # Healthy site: another driver takes the remaining items
+                        _start(None)
+
+        def _start(driver: webdriver.Chrome | None):
+            # Threads run in copies of the caller's context (e.g. the crawl's profiler)
+            thread = threading.Thread(
+                target=contextvars.copy_context().run, args=(_run, driver), daemon=True
+            )
+            threads.append(thread)
+            thread.start()
+
+        with lock:
+            for driver in self.drivers[: max(len(items), 1)]:
+                _start(driver)
+
+        # Threads are only added by running threads, so the list is complete at the end
+        i = 0
+        while i < len(threads):
+            threads[i].join()
+            i += 1
+        return results
+
+    def _can_grow(self, n_threads: int, tasks: queue.Queue) -> bool:
+        """Whether a driver can be added (the limiter allows more concurrency)"""
+        return (
+            self.create_driver is not None
+            and self.limiter is not None
+            and n_threads < min(self.max_drivers, self.limiter.concurrency)
+            and tasks.qsize() > 0
+        )
+
+
+if __name__ == "__main__":
+    # Benchmark with headless Chrome drivers and a local server (latency per page)
+    from concurrent.futures import ThreadPoolExecutor
+    from functools import partial
+    from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+    from gjdanawa_uploader.utils.crawling import get_chrome_driver
+
+    LATENCY = 0.3  # seconds per page
+    N_ELEMS = 50
+    N_PAGES = 8
+    N_DRIVERS = 4
+
+    class Handler(SimpleHTTPRequestHandler):
+        def do_GET(self):
+            sleep(LATENCY)
+            items = "".join(
+                f"<li><a href='/{i}'>item {i}</a><span>{i * 100}원</span></li>"
+                for i in range(N_ELEMS)
+            )
+            body = f"<html><body><ul>{items}</ul></body></html>".encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+
+    def extract(elem):
+        link = elem.find_element("css selector", "a")
+        return link.text, link.get_attribute("href"), elem.text
+
+    def load(driver, page):
+        driver.get(f"{base_url}/page/{page}")
+        return driver.title
+
+    drivers = [get_chrome_driver() for _ in range(N_DRIVERS)]
+    rows = []
+    try:
+        # 1. Element work: threads over one driver vs snapshots
+        driver = drivers[0]
+        driver.get(base_url)
+        elems = driver.find_elements("css selector", "li")
+
+        start_time = perf_counter()
+        with ThreadPoolExecutor(8) as executor:
+            list(executor.map(extract, elems))
+        rows.append(
+            ("elements: 8 threads over one driver", perf_counter() - start_time)
+        )
+
+        start_time = perf_counter()
+        map_elements(driver, extract, elems)
+        rows.append(
+            ("elements: snapshot + in-process parse", perf_counter() - start_time)
+        )
+
+        # 2. Page work: threads over one driver vs the scheduler over drivers
+        pages = list(range(N_PAGES))
+        start_time = perf_counter()
+        with ThreadPoolExecutor(N_DRIVERS) as executor:
+            list(executor.map(partial(load, driver), pages))
+        rows.append(("pages: 4 threads over one driver", perf_counter() - start_time))
+
+        for n_drivers in (1, N_DRIVERS):
+            scheduler = DriverScheduler(drivers[:n_drivers])
+            start_time = perf_counter()
+            results = scheduler.map(load, pages)
+            assert not any(isinstance(result, ItemError) for result in results)
+            rows.append(
+                (
+                    f"pages: scheduler, {n_drivers} driver(s)",
+                    perf_counter() - start_time,
+                )
+            )
+    finally:
+        for driver in drivers:
+            driver.quit()
+        server.shutdown()
+
+    for name, elapsed_time in rows:
+        print(f"{name:<40} {elapsed_time:.3f}s")
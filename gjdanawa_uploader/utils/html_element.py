@@ -0,0 +1,141 @@
+"""HTML element utilities
+
+Parse HTML in-process with an interface compatible with Selenium `WebElement`,
+so that `find_element()`/`find_elements()` and the crawlers' extraction methods
+work on fetched pages without a browser.
+"""
+
+import re
+from urllib.parse import urljoin
+
+from bs4 import BeautifulSoup, NavigableString, Tag
+from bs4.element import PreformattedString
+from selenium.webdriver.common.by import By
+from selenium.common.exceptions import (
+    InvalidSelectorException,
+    NoSuchElementException,
+)
+
+
+BLOCK_TAGS = {
+    "address", "article", "aside", "blockquote", "br", "dd", "div", "dl", "dt",
+    "fieldset", "figcaption", "figure", "footer", "form", "h1", "h2", "h3", "h4",
+    "h5", "h6", "header", "hr", "li", "main", "nav", "ol", "p", "pre", "section",
+    "table", "tr", "ul",
+}  # fmt: skip
+HIDDEN_TAGS = {"script", "style", "noscript", "template"}
+URL_ATTRIBUTES = {"href", "src"}
+TEXT_XPATH_PATTERN = re.compile(r"^//\*\[contains\(text\(\), '(.*)'\)\]$")
+
+
+def render_text(tag: Tag) -> str:
+    """Approximate `innerText`: block elements are separated by newlines"""
+    chunks = []
+
+    def _walk(node):
+        for child in node.children:
+            if isinstance(child, PreformattedString):
+                # Comment, CDATA, doctype, ...
+                continue
+            elif isinstance(child, NavigableString):
+                chunks.append(re.sub(r"\s+", " ", str(child)))
+            elif isinstance(child, Tag) and child.name not in HIDDEN_TAGS:
+                is_block = child.name in BLOCK_TAGS
+                if is_block:
+                    chunks.append("\n")
+                _walk(child)
+                if is_block:
+                    chunks.append("\n")
+
+    _walk(tag)
+    lines = (line.strip() for line in "".join(chunks).split("\n"))
+    return "\n".join(line for line in lines if line)
+
+
+class HtmlElement:
+    """`WebElement`-like wrapper of a parsed HTML element.
+
+    Example:
+        >>> doc = HtmlElement.from_html(html, url="https://search.danawa.com/...")
+        >>> find_element(doc, "span.goods-list__title", astype=str)
+    """
+
+    def __init__(self, tag: Tag, current_url: str = ""):
+        self._tag = tag
+        self.current_url = current_url
+
+    @classmethod
+    def from_html(cls, html: str, url: str = "") -> "HtmlElement":
+        """Parse the HTML document"""
+        return cls(BeautifulSoup(html, "html.parser"), current_url=url)
+
+    @classmethod
+    def from_outer_html(cls, html: str, url: str = "") -> "HtmlElement":
+        """Parse the `outerHTML` of an element"""
+        soup = BeautifulSoup(html, "html.parser")
+        return cls(soup.find() or soup, current_url=url)
+
+    @property
+    def tag_name(self) -> str:
+        return self._tag.name
+
+    @property
+    def text(self) -> str:
+        return render_text(self._tag)
+
+    @property
+    def page_source(self) -> str:
+        return str(self._tag)
+
+    def get_attribute(self, name: str) -> str | None:
+        """Get attribute (URLs are resolved like Selenium properties)"""
+        if name in ("outerHTML", "innerHTML"):
+            if name == "outerHTML":
+                return str(self._tag)
+            return self._tag.decode_contents()
+        if name in ("textContent", "innerText"):
+            return self.text
+        value = self._tag.get(name)
+        if isinstance(value, list):
+            value = " ".join(value)
+        if value and name in URL_ATTRIBUTES:
+            value = urljoin(self.current_url, value)
+        return value
+
+    def _wrap(self, tag: Tag) -> "HtmlElement":
+        return HtmlElement(tag, current_url=self.current_url)
+
+    def find_elements(self, by: str = By.CSS_SELECTOR, value: str = "") -> list:
+        """Find elements by CSS selector (or the XPath subset used by the crawlers)"""
+        if by == By.CSS_SELECTOR:
+            return [self._wrap(tag) for tag in self._tag.select(value)]
+        if by == By.TAG_NAME:
+            return [self._wrap(tag) for tag in self._tag.find_all(value)]
+        if by == By.XPATH:
+            if value == "..":
+                parent = self._tag.parent
+                return [self._wrap(parent)] if parent is not None else []
+            if matches := TEXT_XPATH_PATTERN.match(value):
+                target_text = matches.group(1)
+                root = self._tag
+                while root.parent is not None:
+                    root = root.parent
+                return [
+                    self._wrap(tag)
+                    for tag in root.find_all(True)
+                    if any(
+                        target_text in str(child)
+                        for child in tag.children
+                        if isinstance(child, NavigableString)
+                    )
+                ]
+        raise InvalidSelectorException(f"Unsupported selector: ({by}, {value})")
+
+    def find_element(self, by: str = By.CSS_SELECTOR, value: str = "") -> "HtmlElement":
+        """Find the first element"""
+        if elems := self.find_elements(by, value):
+            return elems[0]
+        raise NoSuchElementException(f"Element not found: ({by}, {value})")
+
+    def __repr__(self) -> str:
+        return f"HtmlElement(<{self.tag_name}>)"
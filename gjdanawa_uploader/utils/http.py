@@ -0,0 +1,148 @@
+"""HTTP utilities
+
+Pooled HTTP client for pages that do not need a browser.
+"""
+
+import asyncio
+from typing import Callable
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from gjdanawa_uploader.utils.crawling import get_random_agent
+from gjdanawa_uploader.utils.rate_limiter import RateLimiter
+from gjdanawa_uploader.utils.page_cache import PageCache
+
+
+TIMEOUT = 10
+N_CONNECTIONS = 16
+
+
+class HttpClient:
+    """Pooled HTTP client with asyncio fan-out.
+
+    Requests share one connection pool (keep-alive) and run concurrently
+    from asyncio, bounded by `n_connections` and the marketplace rate limiter.
+    Pages are read from `cache` when it is given.
+
+    Example:
+        >>> client = HttpClient(limiter=get_rate_limiter("danawa"))
+        >>> pages = client.fetch_all([url1, url2])
+    """
+
+    def __init__(
+        self,
+        limiter: RateLimiter | None = None,
+        n_connections: int = N_CONNECTIONS,
+        timeout: float = TIMEOUT,
+        cache: PageCache | None = None,
+    ):
+        self.limiter = limiter
+        self.cache = cache
+        self.n_connections = n_connections
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=n_connections, pool_maxsize=n_connections
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({"User-Agent": get_random_agent()})
+
+    def get(self, url: str, headers: dict | None = None) -> requests.Response:
+        """GET the URL (blocking, rate limited)"""
+        if self.limiter is None:
+            return self.session.get(url, headers=headers, timeout=self.timeout)
+
+        self.limiter.acquire()
+        success = False
+        try:
+            response = self.session.get(url, headers=headers, timeout=self.timeout)
+            # Backoff on HTTP 429/5xx
+            success = not (response.status_code == 429 or response.status_code >= 500)
+            return response
+        finally:
+            self.limiter.release(success=success)
+
+    def fetch(self, url: str) -> str | None:
+        """Fetch the page text (None if failed)
+
+        With a cache, fresh pages are not requested and stale pages are
+        revalidated with a conditional GET.
+        """
+        # 1. Fresh cache
+        entry = self.cache.get(url) if self.cache else None
+        if entry is not None and self.cache.is_fresh(entry):
+            self.cache.count("hit")
+            return entry.body
+
+        # 2. Conditional GET for the stale cache
+        headers = {}
+        if entry is not None:
+            if entry.etag:
+                headers["If-None-Match"] = entry.etag
+            if entry.last_modified:
+                headers["If-Modified-Since"] = entry.last_modified
+
+        try:
+            response = self.get(url, headers=headers or None)
+            if entry is not None and response.status_code == 304:
+                # 2.1 Not modified
+                self.cache.count("revalidated")
+                return self.cache.touch(entry).body
+            response.raise_for_status()
+            if "charset" not in response.headers.get("Content-Type", "").lower():
+                # requests defaults to ISO-8859-1 for text/* without charset
+                response.encoding = response.apparent_encoding
+        except requests.RequestException as e:
+            print(f"[Failure] Fetch url: {url} ({e})")
+            return None
+
+        # 3. Cache the page
+        if self.cache:
+            self.cache.count("miss" if entry is None else "stale")
+            self.cache.put(
+                url,
+                response.text,
+                etag=response.headers.get("ETag"),
+                last_modified=response.headers.get("Last-Modified"),
+                content_type=response.headers.get("Content-Type"),
+            )
+        return response.text
+
+    def fetch_bytes(self, url: str) -> bytes | None:
+        """Fetch the response body (e.g. images, not cached) (None if failed)"""
+        try:
+            response = self.get(url)
+            response.raise_for_status()
+        except requests.RequestException as e:
+            print(f"[Failure] Fetch url: {url} ({e})")
+            return None
+        return response.content
+
+    def fetch_all_bytes(self, urls: list[str]) -> list[bytes | None]:
+        """Fetch the response bodies concurrently (order preserved)"""
+        return asyncio.run(self.afetch_all(urls, fetch=self.fetch_bytes))
+
+    async def afetch(
+        self, url: str, semaphore: asyncio.Semaphore, fetch: Callable | None = None
+    ) -> str | None:
+        """Fetch the page text asynchronously"""
+        async with semaphore:
+            return await asyncio.to_thread(fetch or self.fetch, url)
+
+    async def afetch_all(
+        self, urls: list[str], fetch: Callable | None = None
+    ) -> list[str | None]:
+        """Fetch the pages concurrently (order preserved)"""
+        semaphore = asyncio.Semaphore(self.n_connections)
+        return await asyncio.gather(
+            *(self.afetch(url, semaphore, fetch) for url in urls)
+        )
+
+    def fetch_all(self, urls: list[str]) -> list[str | None]:
+        """Fetch the pages concurrently from synchronous code"""
+        return asyncio.run(self.afetch_all(urls))
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,235 @@
+"""Image hash utilities
+
+Match images (e.g. listing thumbnails) to reference product images locally with
+perceptual hashes (pHash) and Hamming distances, without remote APIs.
+"""
+
+import os
+import sqlite3
+import hashlib
+import threading
+from io import BytesIO
+
+import numpy as np
+from PIL import Image
+
+from gjdanawa_uploader.configs import CACHE_PATH
+from gjdanawa_uploader.core.utils import ItemError, pmap
+from gjdanawa_uploader.utils.http import HttpClient
+
+
+HASH_SIZE = 8  # 64-bit hashes
+HIGHFREQ_FACTOR = 4  # images are resized to 32x32 before the DCT
+MAX_DISTANCE = 12  # bits
+MIN_ITEMS_PER_PROCESS = 32  # smaller batches are hashed in the calling process
+SQLITE_MAX_VARIABLES = 900
+
+
+def _dct_matrix(n: int) -> np.ndarray:
+    """Orthonormal DCT-II matrix (`D @ x` is the DCT of x)"""
+    k, i = np.arange(n)[:, None], np.arange(n)[None, :]
+    matrix = np.sqrt(2 / n) * np.cos(np.pi * (2 * i + 1) * k / (2 * n))
+    matrix[0] /= np.sqrt(2)
+    return matrix
+
+
+DCT_MATRIX = _dct_matrix(HASH_SIZE * HIGHFREQ_FACTOR)
+
+
+def phash(data: bytes) -> int:
+    """Perceptual hash (64-bit) of the image
+
+    Low frequencies of the DCT of the 32x32 grayscale image, thresholded by their median.
+    """
+    size = HASH_SIZE * HIGHFREQ_FACTOR
+    with Image.open(BytesIO(data)) as image:
+        image.draft("L", (size, size))  # decode JPEGs at a reduced scale
+        image = image.convert("L").resize((size, size), Image.Resampling.LANCZOS)
+        pixels = np.asarray(image, dtype=np.float64)
+    dct = DCT_MATRIX @ pixels @ DCT_MATRIX.T
+    low_freq = dct[:HASH_SIZE, :HASH_SIZE]
+    bits = (low_freq > np.median(low_freq)).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def hamming_distances(hashes: np.ndarray, references: np.ndarray) -> np.ndarray:
+    """Hamming distances between 64-bit hashes (n_hashes, n_references)"""
+    xor = np.bitwise_xor.outer(
+        np.asarray(hashes, dtype=np.uint64), np.asarray(references, dtype=np.uint64)
+    )
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(xor).astype(np.int64)
+    bits = np.unpackbits(xor[..., None].view(np.uint8), axis=-1)
+    return bits.sum(axis=-1, dtype=np.int64)
+
+
+class ImageHashCache:
+    """SQLite cache of image hashes, keyed by URL and by content hash.
+
+    The same image served from other URLs is hashed once (content hash).
+    """
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS urls (url TEXT PRIMARY KEY, content_hash TEXT)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS hashes (content_hash TEXT PRIMARY KEY, hash TEXT)"
+        )
+        self._lock = threading.Lock()
+
+    def get_by_urls(self, urls: list[str]) -> dict[str, int]:
+        return self._select(
+            "SELECT urls.url, hashes.hash FROM urls JOIN hashes USING (content_hash) WHERE urls.url IN ({})",
+            urls,
+        )
+
+    def get_by_contents(self, content_hashes: list[str]) -> dict[str, int]:
+        return self._select(
+            "SELECT content_hash, hash FROM hashes WHERE content_hash IN ({})",
+            content_hashes,
+        )
+
+    def _select(self, query: str, keys: list[str]) -> dict[str, int]:
+        result = {}
+        with self._lock:
+            for start in range(0, len(keys), SQLITE_MAX_VARIABLES):
+                chunk = keys[start : start + SQLITE_MAX_VARIABLES]
+                rows = self._conn.execute(
+                    query.format(",".join("?" * len(chunk))), chunk
+                ).fetchall()
+                result.update((key, int(value, 16)) for key, value in rows)
+        return result
+
+    def put(self, items: list[tuple[str, str, int]]):
+        """Cache (url, content_hash, hash) items"""
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO urls VALUES (?, ?)",
+                [(url, content_hash) for url, content_hash, _ in items],
+            )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO hashes VALUES (?, ?)",
+                [(content_hash, f"{hash_:016x}") for _, content_hash, hash_ in items],
+            )
+
+    def close(self):
+        self._conn.close()
+
+
+class ImageMatcher:
+    """Match images to reference images by perceptual hash.
+
+    1. Cached hashes are read by URL.
+    2. Missing images are downloaded concurrently (pooled HTTP client), and
+       images with a cached content hash are not hashed again.
+    3. The rest are hashed in a process pool (large batches).
+    4. Distances to all references are computed in one vectorized operation.
+
+    Example:
+        >>> matcher = ImageMatcher(reference_urls=[product_image_url])
+        >>> matcher.match([info["thumbnail_url"] for info in listing_infos])
+        array([ True, False,  True, ...])
+    """
+
+    def __init__(
+        self,
+        reference_urls: list[str] = (),
+        reference_hashes: list[int] = (),
+        max_distance: int = MAX_DISTANCE,
+        client: HttpClient | None = None,
+        cache: ImageHashCache | None = None,
+        n_workers: int | None = None,
+    ):
+        self.max_distance = max_distance
+        self.client = client or HttpClient()
+        self.cache = cache or ImageHashCache(os.path.join(CACHE_PATH, "images.sqlite3"))
+        self.n_workers = n_workers or os.cpu_count()
+        hashes = list(reference_hashes)
+        hashes += [h for h in self.hash_urls(list(reference_urls)) if h is not None]
+        if reference_urls and not hashes:
+            print("[Warning] Reference images are not available")
+        self.references = np.array(hashes, dtype=np.uint64)
+
+    def hash_urls(self, urls: list[str]) -> list[int | None]:
+        """Hashes of the images (None if the image is not available)"""
+        valid_urls = list(
+            dict.fromkeys(
+                url
+                for url in urls
+                if isinstance(url, str) and url.startswith(("http://", "https://"))
+            )
+        )
+
+        # 1. Cached by URL
+        hashes: dict[str, int] = self.cache.get_by_urls(valid_urls)
+        missing_urls = [url for url in valid_urls if url not in hashes]
+
+        if missing_urls:
+            # 2. Download images, reuse hashes of the same contents
+            contents = self.client.fetch_all_bytes(missing_urls)
+            downloaded = {
+                url: (hashlib.sha1(data).hexdigest(), data)
+                for url, data in zip(missing_urls, contents)
+                if data
+            }
+            content_hashes = self.cache.get_by_contents(
+                [content_hash for content_hash, _ in downloaded.values()]
+            )
+
+            # 3. Hash new images
+            new_items = {
+                content_hash: data
+                for content_hash, data in downloaded.values()
+                if content_hash not in content_hashes
+            }
+            content_hashes.update(self._hash_contents(new_items))
+
+            items = [
+                (url, content_hash, content_hashes[content_hash])
+                for url, (content_hash, _) in downloaded.items()
+                if content_hash in content_hashes
+            ]
+            self.cache.put(items)
+            hashes.update((url, hash_) for url, _, hash_ in items)
+        return [hashes.get(url) for url in urls]
+
+    def _hash_contents(self, items: dict[str, bytes]) -> dict[str, int]:
+        """Hash images (content hash -> perceptual hash), skipping invalid images"""
+        if len(items) >= 2 * MIN_ITEMS_PER_PROCESS and self.n_workers > 1:
+            results = pmap(
+                phash,
+                list(items.values()),
+                n_workers=self.n_workers,
+                chunksize=MIN_ITEMS_PER_PROCESS,
+                raise_errors=False,
+            )
+        else:
+            results = []
+            for data in items.values():
+                try:
+                    results.append(phash(data))
+                except Exception as e:
+                    results.append(ItemError(len(results), e, ""))
+        return {
+            content_hash: result
+            for content_hash, result in zip(items, results)
+            if not isinstance(result, ItemError)
+        }
+
+    def distances(self, urls: list[str]) -> np.ndarray:
+        """Minimum distance of each image to the references (-1 if not available)"""
+        hashes = self.hash_urls(urls)
+        result = np.full(len(urls), -1, dtype=np.int64)
+        available = np.array([h is not None for h in hashes], dtype=bool)
+        if available.any() and len(self.references):
+            values = np.array([h for h in hashes if h is not None], dtype=np.uint64)
+            result[available] = hamming_distances(values, self.references).min(axis=1)
+        return result
+
+    def match(self, urls: list[str]) -> np.ndarray:
+        """Whether each image matches a reference (images not available are kept)"""
+        distances = self.distances(urls)
+        return (distances < 0) | (distances <= self.max_distance)
@@ -0,0 +1,110 @@
+"""Listing index utilities
+
+Map listing URLs to canonical product ids, and claim products per session so that
+reviews of a product are extracted once (across listings, crawls and marketplaces).
+"""
+
+import os
+import re
+import sqlite3
+import threading
+from time import time
+
+from gjdanawa_uploader.configs import CFG_CRAWLER
+from gjdanawa_uploader.utils.urls import (
+    normalize_url,
+    unwrap_redirect,
+    remove_query_params,
+)
+
+
+class URLCanonicalizer:
+    """Canonicalize listing URLs.
+
+    Product ids are namespaced by marketplace (e.g. `m11st:5802041697`), so the
+    listings of a product are deduplicated within a marketplace only: the same
+    product sold on 11st and Danawa has two ids (cross-marketplace listings are
+    grouped by title similarity, see `listing_match` config).
+
+    Example:
+        >>> CANONICALIZER.product_id("https://action.adoffice.11st.co.kr/...&redirect=%2F%2Fm.11st.co.kr%2Fproducts%2Fm%2F5802041697%3F%26trTypeCd%3DMAS24")
+        'm11st:5802041697'
+    """
+
+    def __init__(
+        self,
+        redirect_params: list[str],
+        tracking_params: list[str],
+        product_ids: dict[str, str],
+    ):
+        self.redirect_params = list(redirect_params)
+        self.tracking_params = set(tracking_params)
+        self.product_id_patterns = {
+            namespace: re.compile(pattern) for namespace, pattern in product_ids.items()
+        }
+
+    def canonicalize(self, url: str) -> str:
+        """Unwrap redirects, remove tracking parameters and normalize the URL"""
+        url = unwrap_redirect(url, self.redirect_params)
+        url = remove_query_params(url, self.tracking_params)
+        return normalize_url(url)
+
+    def product_id(self, url: str) -> str:
+        """Product id of the URL (`{namespace}:{id}`, or the canonical URL if unknown)"""
+        canonical_url = self.canonicalize(url)
+        for namespace, pattern in self.product_id_patterns.items():
+            if matches := pattern.search(canonical_url):
+                return f"{namespace}:{matches.group(1)}"
+        return canonical_url
+
+
+CANONICALIZER = URLCanonicalizer(**CFG_CRAWLER.canonical_urls)
+
+
+class ListingIndex:
+    """In-memory and on-disk (SQLite) index of products claimed in a session.
+
+    A product is claimed by the first listing URL; the same listing can claim
+    it again (e.g. resumed crawl), other listings of the product are duplicates.
+
+    Example:
+        >>> index = ListingIndex("checkpoints/listings.sqlite3", session_id)
+        >>> index.claim("m11st:5802041697", listing_url)
+        True
+    """
+
+    def __init__(self, path: str, session_id: str):
+        self.path = path
+        self.session_id = session_id
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS products (
+                session_id TEXT, product_id TEXT, listing_url TEXT,
+                marketplace TEXT, claimed_at REAL,
+                PRIMARY KEY (session_id, product_id)
+            )
+            """
+        )
+        self._owners: dict[str, str] = {}  # product_id -> listing_url
+        self._lock = threading.Lock()
+
+    def claim(self, product_id: str, listing_url: str, marketplace: str = "") -> bool:
+        """Claim the product for the listing (False if another listing claimed it)"""
+        with self._lock:
+            if product_id not in self._owners:
+                with self._conn:
+                    self._conn.execute(
+                        "INSERT OR IGNORE INTO products VALUES (?, ?, ?, ?, ?)",
+                        (self.session_id, product_id, listing_url, marketplace, time()),
+                    )
+                    row = self._conn.execute(
+                        "SELECT listing_url FROM products WHERE session_id = ? AND product_id = ?",
+                        (self.session_id, product_id),
+                    ).fetchone()
+                self._owners[product_id] = row[0]
+            return self._owners[product_id] == listing_url
+
+    def close(self):
+        self._conn.close()
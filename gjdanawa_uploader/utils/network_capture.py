@@ -0,0 +1,132 @@
+"""Network capture utilities
+
+Capture XHR JSON responses via Chrome DevTools Protocol (CDP) performance logs.
+"""
+
+from __future__ import annotations
+
+import re
+import json
+import base64
+
+from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
+
+
+CASTS = {"int": int, "float": float, "str": str}
+
+
+class NetworkCapture:
+    """Capture JSON responses whose URLs match the patterns.
+
+    The driver should be created with performance logging enabled
+    (`get_chrome_driver(capture_network=True)`).
+
+    Example:
+        >>> capture = NetworkCapture(driver, [r"/api/search/all\\?"])
+        >>> scroll_until(driver, selector, on_scroll=capture.poll)
+        >>> for url, payload in capture.responses:
+        ...     print(url, payload)
+    """
+
+    def __init__(self, driver: webdriver.Chrome, url_patterns: list[str]):
+        self.driver = driver
+        self.url_patterns = [re.compile(pattern) for pattern in url_patterns]
+        self.responses: list[tuple[str, dict | list]] = []
+        self._pending: dict[str, str] = {}  # request id -> url
+
+        self.driver.execute_cdp_cmd("Network.enable", {})
+        self.clear()
+
+    def clear(self):
+        """Drop buffered logs and captured responses"""
+        self.driver.get_log("performance")
+        self.responses = []
+        self._pending = {}
+
+    def poll(self) -> list[tuple[str, dict | list]]:
+        """Collect responses finished since the last poll"""
+        new_responses = []
+        for entry in self.driver.get_log("performance"):
+            message = json.loads(entry["message"])["message"]
+            method, params = message.get("method"), message.get("params", {})
+
+            if method == "Network.responseReceived":
+                response = params["response"]
+                if "json" in response.get("mimeType", "") and self._match(
+                    response["url"]
+                ):
+                    self._pending[params["requestId"]] = response["url"]
+            elif method == "Network.loadingFinished":
+                if (url := self._pending.pop(params["requestId"], None)) is None:
+                    continue
+                if (payload := self._get_body(params["requestId"])) is not None:
+                    new_responses.append((url, payload))
+
+        self.responses.extend(new_responses)
+        return new_responses
+
+    def _match(self, url: str) -> bool:
+        return any(pattern.search(url) for pattern in self.url_patterns)
+
+    def _get_body(self, request_id: str) -> dict | list | None:
+        """Get the JSON body of the response"""
+        try:
+            body = self.driver.execute_cdp_cmd(
+                "Network.getResponseBody", {"requestId": request_id}
+            )
+        except WebDriverException:
+            # Body is evicted from the browser buffer
+            return None
+        text = body["body"]
+        if body.get("base64Encoded"):
+            text = base64.b64decode(text).decode("utf8")
+        try:
+            return json.loads(text)
+        except json.JSONDecodeError:
+            return None
+
+
+def get_path(obj: dict | list | None, path: str):
+    """Get a value by a dotted path (e.g. `shoppingResult.products.0.price`)"""
+    for key in path.split(".") if path else []:
+        if isinstance(obj, list) and key.isdigit() and int(key) < len(obj):
+            obj = obj[int(key)]
+        elif isinstance(obj, dict):
+            obj = obj.get(key)
+        else:
+            return None
+    return obj
+
+
+def extract_records(payload: dict | list, items_path: str, fields: dict) -> list[dict]:
+    """Extract records from a JSON payload
+
+    Args:
+        payload (dict | list): JSON payload
+        items_path (str): Dotted path of the item list
+        fields (dict): Output field -> dotted path or {path, astype}
+            - Fields prefixed with `optional.` are stored in the `optional` dict
+
+    Returns:
+        list[dict]: Records with `optional` dict
+    """
+    items = get_path(payload, items_path) or []
+    records = []
+    for item in items:
+        record = {"optional": {}}
+        for field, spec in fields.items():
+            if isinstance(spec, str):
+                spec = {"path": spec}
+            value = get_path(item, spec["path"])
+            if value is not None and (astype := spec.get("astype")):
+                try:
+                    value = CASTS[astype](value)
+                except (TypeError, ValueError):
+                    value = None
+            if field.startswith("optional."):
+                record["optional"][field.removeprefix("optional.")] = value
+            else:
+                record[field] = value
+        records.append(record)
+    return records
@@ -0,0 +1,119 @@
+"""Page cache utilities
+
+Cache fetched pages (HTML page_source or JSON) on disk, compressed and keyed by
+normalized URL. Entries are fresh within the TTL and revalidated with
+ETag/Last-Modified (conditional GET) afterwards.
+"""
+
+import os
+import gzip
+import json
+import hashlib
+import threading
+from dataclasses import dataclass, asdict
+from time import time
+
+from gjdanawa_uploader.utils.urls import normalize_url
+
+
+@dataclass
+class CacheEntry:
+    """Cached page"""
+
+    url: str
+    body: str
+    fetched_at: float
+    etag: str | None = None
+    last_modified: str | None = None
+    content_type: str | None = None
+
+
+class PageCache:
+    """Disk cache of pages with TTL and conditional refresh.
+
+    Example:
+        >>> cache = PageCache("cache/pages", ttl=3600)
+        >>> client = HttpClient(cache=cache)
+        >>> client.fetch(url)  # miss: fetched and cached
+        >>> client.fetch(url)  # hit: read from disk
+        >>> cache.stats
+        {'hit': 1, 'miss': 1, 'revalidated': 0, 'stale': 0}
+    """
+
+    def __init__(self, path: str, ttl: float = 3600):
+        self.path = path
+        self.ttl = ttl
+        self.stats = dict(hit=0, miss=0, revalidated=0, stale=0)
+        self._lock = threading.Lock()
+
+    def _file_path(self, url: str) -> str:
+        key = hashlib.sha1(normalize_url(url).encode()).hexdigest()
+        return os.path.join(self.path, key[:2], f"{key}.json.gz")
+
+    def get(self, url: str) -> CacheEntry | None:
+        """Get the cached page (fresh or not)"""
+        file_path = self._file_path(url)
+        if not os.path.exists(file_path):
+            return None
+        try:
+            with gzip.open(file_path, "rt", encoding="utf8") as f:
+                return CacheEntry(**json.load(f))
+        except (OSError, ValueError, TypeError):
+            # Corrupted entry
+            return None
+
+    def put(
+        self,
+        url: str,
+        body: str,
+        etag: str | None = None,
+        last_modified: str | None = None,
+        content_type: str | None = None,
+    ) -> CacheEntry:
+        """Cache the page"""
+        entry = CacheEntry(
+            normalize_url(url), body, time(), etag, last_modified, content_type
+        )
+        self._write(entry)
+        return entry
+
+    def touch(self, entry: CacheEntry) -> CacheEntry:
+        """Renew the entry (revalidated as not modified)"""
+        entry.fetched_at = time()
+        self._write(entry)
+        return entry
+
+    def _write(self, entry: CacheEntry):
+        file_path = self._file_path(entry.url)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        tmp_path = f"{file_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf8") as f:
+            json.dump(asdict(entry), f, ensure_ascii=False)
+        os.replace(tmp_path, file_path)
+
+    def is_fresh(self, entry: CacheEntry) -> bool:
+        """Check if the entry is within the TTL"""
+        return (time() - entry.fetched_at) < self.ttl
+
+    def get_fresh(self, url: str) -> str | None:
+        """Get the body if it is fresh (counted in the stats)"""
+        entry = self.get(url)
+        if entry is not None and self.is_fresh(entry):
+            self.count("hit")
+            return entry.body
+        self.count("miss" if entry is None else "stale")
+        return None
+
+    def count(self, name: str):
+        with self._lock:
+            self.stats[name] += 1
+
+    def report(self) -> dict:
+        """Hit/miss metrics"""
+        n_requests = sum(self.stats.values())
+        n_reused = self.stats["hit"] + self.stats["revalidated"]
+        return dict(
+            self.stats,
+            n_requests=n_requests,
+            hit_rate=n_reused / n_requests if n_requests else 0.0,
+        )
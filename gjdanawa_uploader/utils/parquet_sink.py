@@ -0,0 +1,357 @@
+"""Parquet sink
+
+Export extracted documents (listings, reviews) as Parquet files partitioned by
+marketplace and crawl date, for local analytics (pandas, DuckDB, pyarrow.dataset):
+
+    exports/listings/marketplace=danawa/crawl_date=2026-10-18/<session_id>-<id>.parquet
+
+Documents are streamed during the crawl: every row group is written to its own
+file as soon as it is full, so a crash only loses the buffered rows.
+
+The Arrow schema is derived from the ES mappings (`configs/es.yml`): fields of
+`optional` are flattened into typed columns (e.g. `optional.average_rating`),
+and optional fields missing in the mappings are kept as JSON in `optional.extra`.
+"""
+
+import os
+import json
+import uuid
+from datetime import datetime, date
+from time import perf_counter
+from typing import Callable
+
+from gjdanawa_uploader.configs import CFG_ES, CFG_CRAWLER, EXPORT_PATH
+from gjdanawa_uploader.core.config_schema import ESIndexConfig
+
+
+ROW_GROUP_SIZE = 10_000  # rows per row group (buffered per partition)
+PARTITION_FIELD = "marketplace"
+OPTIONAL_FIELD = "optional"
+EXTRA_COLUMN = "optional.extra"
+DEFAULT_PARTITION = "unknown"
+
+# ES field type -> column type
+COLUMN_TYPES = {
+    "keyword": "string",
+    "text": "string",
+    "integer": "int64",
+    "long": "int64",
+    "short": "int64",
+    "float": "float64",
+    "double": "float64",
+    "boolean": "bool",
+    "date": "timestamp",
+    "flattened": "json",
+    "object": "json",
+    "nested": "json",
+    "dense_vector": "vector",
+}
+
+
+def get_columns(index: ESIndexConfig) -> dict[str, str]:
+    """Columns (name -> column type) of the documents of the index
+
+    The partition field is not a column (it is the directory of the files), and
+    the crawl date partition is named `crawl_date` (reviews have a `date` field).
+    """
+    columns = {}
+    for name, mapping in index.mappings.get("properties", {}).items():
+        if name == PARTITION_FIELD:
+            continue
+        if name == OPTIONAL_FIELD:
+            for key, sub_mapping in mapping.get("properties", {}).items():
+                columns[f"{OPTIONAL_FIELD}.{key}"] = _column_type(sub_mapping)
+            columns[EXTRA_COLUMN] = "json"
+        else:
+            columns[name] = _column_type(mapping)
+    return columns
+
+
+def _column_type(mapping: dict) -> str:
+    if "properties" in mapping:
+        return "json"
+    return COLUMN_TYPES.get(mapping.get("type", "object"), "json")
+
+
+def get_arrow_schema(columns: dict[str, str]):
+    """Arrow schema of the columns"""
+    pa = _import_pyarrow()
+    arrow_types = dict(
+        string=pa.string(),
+        json=pa.string(),
+        int64=pa.int64(),
+        float64=pa.float64(),
+        bool=pa.bool_(),
+        timestamp=pa.timestamp("us"),
+        vector=pa.list_(pa.float32()),
+    )
+    return pa.schema([(name, arrow_types[type_]) for name, type_ in columns.items()])
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError("pyarrow is required for Parquet exports") from None
+    return pyarrow
+
+
+####################################################################################################
+# Values
+####################################################################################################
+def _to_json(value) -> str | None:
+    if value is None:
+        return None
+    return json.dumps(value, ensure_ascii=False, default=str)
+
+
+def _to_string(value) -> str | None:
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (list, tuple, dict)):
+        return _to_json(value)
+    return str(value)
+
+
+def _to_timestamp(value) -> datetime | None:
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, date):
+        return datetime(value.year, value.month, value.day)
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            return None
+    return None
+
+
+def _to_vector(value) -> list[float] | None:
+    if value is None:
+        return None
+    try:
+        return [float(x) for x in value]
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_number(astype: type):
+    def convert(value):
+        if value is None:
+            return None
+        try:
+            return astype(value)
+        except (TypeError, ValueError):
+            return None
+
+    return convert
+
+
+CONVERTERS = {
+    "string": _to_string,
+    "json": _to_json,
+    "int64": _to_number(int),
+    "float64": _to_number(float),
+    "bool": _to_number(bool),
+    "timestamp": _to_timestamp,
+    "vector": _to_vector,
+}
+
+
+def get_partition(document: dict) -> tuple[str, str]:
+    """Partition (marketplace, crawl date) of the document"""
+    marketplace = document.get(PARTITION_FIELD) or DEFAULT_PARTITION
+    updated_at = _to_timestamp(document.get("updated_at")) or datetime.now()
+    return str(marketplace).replace("/", "_"), updated_at.date().isoformat()
+
+
+####################################################################################################
+# Sink
+####################################################################################################
+class ParquetSink:
+    """Write documents to partitioned Parquet files in row groups.
+
+    Documents are buffered per partition, and a row group is written to a new
+    file whenever a buffer has `row_group_size` rows, so memory does not grow
+    with the number of documents and written files survive a crash of the crawl.
+    The remaining rows are written by `close()`.
+
+    Example:
+        >>> with ParquetSink("exports", file_prefix=session_id) as sink:
+        ...     sink.write("listings", listing_infos)
+        ...     sink.write("reviews", review_infos)
+        >>> pd.read_parquet("exports/reviews", filters=[("marketplace", "=", "danawa")])
+    """
+
+    def __init__(
+        self,
+        path: str = EXPORT_PATH,
+        row_group_size: int = ROW_GROUP_SIZE,
+        indices: dict[str, ESIndexConfig] | None = None,
+        file_prefix: str | None = None,
+        transform: Callable[[str, list[dict]], None] | None = None,
+    ):
+        """
+        Args:
+            transform (callable, optional): Update documents of a row group in place
+                before it is written, `transform(kind, documents)` (e.g. LLM fields)
+        """
+        pa = _import_pyarrow()
+        self._pa, self._pq = pa, pa.parquet
+        self.path = path
+        self.row_group_size = row_group_size
+        self.file_prefix = file_prefix or datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.transform = transform
+        indices = indices or dict(listings=CFG_ES.listings, reviews=CFG_ES.reviews)
+        self.columns = {kind: get_columns(index) for kind, index in indices.items()}
+        self.schemas = {
+            kind: get_arrow_schema(columns) for kind, columns in self.columns.items()
+        }
+        self._buffers: dict[tuple[str, str, str], list[dict]] = {}
+        self.paths: list[str] = []
+        self.stats = dict(n_rows=0, n_row_groups=0, n_files=0)
+
+    def write(self, kind: str, documents: list[dict]):
+        """Buffer documents of the kind ("listings", "reviews"), writing full row groups"""
+        for document in documents:
+            key = (kind, *get_partition(document))
+            buffer = self._buffers.setdefault(key, [])
+            buffer.append(document)
+            if len(buffer) >= self.row_group_size:
+                self._flush(key)
+
+    def _to_columns(self, kind: str, documents: list[dict]) -> dict[str, list]:
+        """Column lists of the documents"""
+        columns = self.columns[kind]
+        optional_keys = {
+            name.removeprefix(f"{OPTIONAL_FIELD}."): name
+            for name in columns
+            if name.startswith(f"{OPTIONAL_FIELD}.") and name != EXTRA_COLUMN
+        }
+        data = {name: [] for name in columns}
+        for document in documents:
+            # 1. Fields
+            optional = document.get(OPTIONAL_FIELD) or {}
+            for name, type_ in columns.items():
+                if name.startswith(f"{OPTIONAL_FIELD}."):
+                    continue
+                data[name].append(CONVERTERS[type_](document.get(name)))
+
+            # 2. Optional fields (fields missing in the mappings are kept in JSON)
+            for sub_key, name in optional_keys.items():
+                data[name].append(CONVERTERS[columns[name]](optional.get(sub_key)))
+            if EXTRA_COLUMN in columns:
+                extra = {k: v for k, v in optional.items() if k not in optional_keys}
+                data[EXTRA_COLUMN].append(_to_json(extra) if extra else None)
+        return data
+
+    def _flush(self, key: tuple[str, str, str]):
+        """Write the buffer of the partition as a row group (in a new file)"""
+        documents = self._buffers.pop(key, None)
+        if not documents:
+            return
+        kind, marketplace, date_ = key
+        if self.transform is not None:
+            self.transform(kind, documents)
+        table = self._pa.Table.from_pydict(
+            self._to_columns(kind, documents), schema=self.schemas[kind]
+        )
+        directory = os.path.join(
+            self.path,
+            kind,
+            f"{PARTITION_FIELD}={marketplace}",
+            f"crawl_date={date_}",
+        )
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(
+            directory, f"{self.file_prefix}-{uuid.uuid4().hex[:8]}.parquet"
+        )
+        self._pq.write_table(
+            table, path, row_group_size=self.row_group_size, compression="zstd"
+        )
+        self.paths.append(path)
+        self.stats["n_rows"] += table.num_rows
+        self.stats["n_row_groups"] += 1
+        self.stats["n_files"] += 1
+
+    def close(self) -> list[str]:
+        """Write the buffered rows
+
+        Returns:
+            list[str]: Paths of the written files
+        """
+        for key in list(self._buffers):
+            self._flush(key)
+        return self.paths
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+def get_sink(
+    file_prefix: str | None = None,
+    transform: Callable[[str, list[dict]], None] | None = None,
+) -> ParquetSink | None:
+    """Parquet sink of the `parquet_export` config (None if disabled)"""
+    cfg = CFG_CRAWLER.parquet_export
+    if not cfg.enabled:
+        return None
+    return ParquetSink(
+        cfg.path or EXPORT_PATH,
+        cfg.row_group_size,
+        file_prefix=file_prefix,
+        transform=transform,
+    )
+
+
+if __name__ == "__main__":
+    import random
+    import tempfile
+
+    import pyarrow.dataset as ds
+
+    now = datetime.now().isoformat()
+    reviews = [
+        dict(
+            session_id="demo",
+            marketplace=random.choice(["danawa", "m11st", "navershopping"]),
+            product_name="퍼펙트휩",
+            brand_name="센카",
+            query="센카 퍼펙트휩",
+            listing_title=f"센카 퍼펙트휩 {i % 40}",
+            seller_name=f"seller {i % 7}",
+            listing_url=f"https://example.com/products/{i % 40}",
+            reviewer_id=f"user{i}",
+            rating=random.randint(1, 5) / 5,
+            content="거품이 풍성하고 세정력이 좋아요 " * random.randint(1, 5),
+            date="2024-08-01T00:00:00",
+            updated_at=now,
+            optional=dict(options="120g x 2", upvotes=i % 13, image_url=None, new=i),
+        )
+        for i in range(100_000)
+    ]
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        start_time = perf_counter()
+        with ParquetSink(tmp_dir, file_prefix="demo") as sink:
+            for start in range(0, len(reviews), 1_000):  # streamed in pages
+                sink.write("reviews", reviews[start : start + 1_000])
+        print(f"Write: {sink.stats} / {perf_counter() - start_time:.2f}s")
+        size = sum(os.path.getsize(path) for path in sink.paths)
+        print(
+            f"Size: {size / 2**20:.1f}MiB (JSON: {len(json.dumps(reviews)) / 2**20:.1f}MiB)"
+        )
+
+        start_time = perf_counter()
+        dataset = ds.dataset(
+            os.path.join(tmp_dir, "reviews"), format="parquet", partitioning="hive"
+        )
+        table = dataset.to_table(
+            columns=["marketplace", "rating", "optional.upvotes"],
+            filter=ds.field("marketplace") == "danawa",
+        )
+        print(f"Read: {table.num_rows} rows / {perf_counter() - start_time:.3f}s")
@@ -0,0 +1,119 @@
+"""Prefetch utilities
+
+Load upcoming pages in background tabs while the current page is extracted,
+so that page-load latency is hidden behind extraction work.
+"""
+
+from __future__ import annotations
+
+from selenium import webdriver
+from selenium.common.exceptions import TimeoutException, WebDriverException
+
+from gjdanawa_uploader.core.profiler import PROFILER
+from gjdanawa_uploader.utils.crawling import load_url, throttle, check_blocked_page
+
+
+PAGE_LOAD_TIMEOUT = 30
+OPEN_TAB_SCRIPT = "window.open(arguments[0], '_blank');"
+
+
+class TabPrefetcher:
+    """Open the next `lookahead` URLs in background tabs.
+
+    `open(url)` switches to the prefetched tab of the URL (closing the current one)
+    and prefetches the following URLs. URLs not prefetched are loaded in the current tab.
+
+    Example:
+        >>> with TabPrefetcher(driver, listing_urls, lookahead=2) as prefetcher:
+        ...     for url in listing_urls:
+        ...         prefetcher.open(url)
+        ...         extract(driver)
+    """
+
+    def __init__(
+        self,
+        driver: webdriver.Chrome,
+        urls: list[str],
+        lookahead: int = 1,
+        timeout: float = PAGE_LOAD_TIMEOUT,
+        phase: str | None = None,
+    ):
+        self.driver = driver
+        self.urls = list(urls)
+        self.lookahead = lookahead
+        self.timeout = timeout
+        self.phase = phase  # profiler phase of page loads
+        self.tabs: dict[str, str] = {}  # url -> window handle
+        self._next_idx = 0  # index of the next URL to prefetch
+
+    def __enter__(self) -> "TabPrefetcher":
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def open(self, url: str):
+        """Show the page of the URL in the current tab"""
+        # 1. Switch to the prefetched tab
+        if (handle := self.tabs.pop(url, None)) is not None:
+            with PROFILER.span("prefetch_switch", phase=self.phase):
+                self._switch(handle)
+                self._wait_until_loaded()
+            check_blocked_page(self.driver, url)
+        else:
+            # 2. Not prefetched (e.g. out of order)
+            load_url(self.driver, url)
+
+        # 3. Prefetch the following URLs
+        if url in self.urls:
+            self._next_idx = max(self._next_idx, self.urls.index(url) + 1)
+        self._prefetch()
+
+    def _prefetch(self):
+        """Open background tabs up to the lookahead"""
+        while (len(self.tabs) < self.lookahead) and (self._next_idx < len(self.urls)):
+            url = self.urls[self._next_idx]
+            self._next_idx += 1
+            if url in self.tabs:
+                continue
+            try:
+                handles = set(self.driver.window_handles)
+                with throttle(self.driver):
+                    # Opened without focus, the current tab stays active
+                    self.driver.execute_script(OPEN_TAB_SCRIPT, url)
+                new_handles = set(self.driver.window_handles) - handles
+                if new_handles:
+                    self.tabs[url] = new_handles.pop()
+            except WebDriverException as e:
+                print(f"[Failure] Prefetch url: {url} ({e})")
+                return
+
+    def _switch(self, handle: str):
+        """Close the current tab and switch to the handle"""
+        current_handle = self.driver.current_window_handle
+        if current_handle != handle and current_handle not in self.tabs.values():
+            self.driver.close()
+        self.driver.switch_to.window(handle)
+
+    def _wait_until_loaded(self):
+        from selenium.webdriver.support.ui import WebDriverWait
+
+        try:
+            WebDriverWait(self.driver, self.timeout).until(
+                lambda driver: driver.execute_script("return document.readyState")
+                != "loading"
+            )
+        except TimeoutException:
+            print(f"[Warning] Prefetched page is not loaded: {self.driver.current_url}")
+
+    def close(self):
+        """Close prefetched tabs that are not used"""
+        current_handle = self.driver.current_window_handle
+        for handle in self.tabs.values():
+            try:
+                self.driver.switch_to.window(handle)
+                self.driver.close()
+            except WebDriverException:
+                pass
+        self.tabs.clear()
+        self.driver.switch_to.window(current_handle)
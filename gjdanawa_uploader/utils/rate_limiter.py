@@ -0,0 +1,159 @@
+"""Rate limiter utilities
+
+Per-marketplace token bucket with AIMD-style concurrency control.
+"""
+
+import threading
+import contextlib
+from time import sleep, monotonic
+
+from gjdanawa_uploader.configs import CFG_CRAWLER
+from gjdanawa_uploader.core.profiler import PROFILER
+
+
+class RateLimiter:
+    """Token bucket rate limiter with an AIMD concurrency window.
+
+    - Fast and successful requests increase the concurrency window and the rate additively.
+    - Slow or failed requests (timeout, captcha, HTTP 429/5xx) decrease them multiplicatively.
+
+    Example:
+        >>> limiter = RateLimiter(rate=2, burst=4)
+        >>> with limiter.throttle():
+        ...     driver.get(url)
+    """
+
+    def __init__(
+        self,
+        rate: float = 2.0,
+        burst: float = 4.0,
+        min_rate: float = 0.2,
+        max_rate: float = 8.0,
+        min_concurrency: int = 1,
+        max_concurrency: int = 4,
+        increase: float = 1.0,
+        decrease: float = 0.5,
+        slow_threshold: float = 5.0,
+    ):
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.increase = increase
+        self.decrease = decrease
+        self.slow_threshold = slow_threshold
+
+        self.window = float(min_concurrency)
+        self.in_flight = 0
+        self.tokens = burst
+        self.last_refill = monotonic()
+        self.n_success = 0
+        self.n_failure = 0
+        self._cond = threading.Condition()
+
+    @property
+    def concurrency(self) -> int:
+        """Current concurrency limit"""
+        return max(int(self.window), self.min_concurrency)
+
+    def _refill(self):
+        now = monotonic()
+        self.tokens = min(
+            self.burst, self.tokens + (now - self.last_refill) * self.rate
+        )
+        self.last_refill = now
+
+    def acquire(self):
+        """Wait for a concurrency slot and a token"""
+        with self._cond:
+            while self.in_flight >= self.concurrency:
+                self._cond.wait()
+            self.in_flight += 1
+
+            while True:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait_time = (1 - self.tokens) / self.rate
+                self._cond.release()
+                try:
+                    sleep(wait_time)
+                    PROFILER.record_sleep(wait_time)
+                finally:
+                    self._cond.acquire()
+
+    def release(self, elapsed_time: float | None = None, success: bool = True):
+        """Release the slot and adjust the limits with the feedback"""
+        with self._cond:
+            self.in_flight -= 1
+            if success and (elapsed_time is None or elapsed_time < self.slow_threshold):
+                self._on_success()
+            else:
+                self._on_failure()
+            self._cond.notify_all()
+
+    def penalize(self):
+        """Back off without holding a slot (e.g. captcha detected after loading)"""
+        with self._cond:
+            self._on_failure()
+            self._cond.notify_all()
+
+    def _on_success(self):
+        self.n_success += 1
+        # Additive increase (per-window, TCP style)
+        self.window = min(
+            self.max_concurrency, self.window + self.increase / max(self.window, 1)
+        )
+        self.rate = min(self.max_rate, self.rate + self.increase / max(self.rate, 1))
+
+    def _on_failure(self):
+        self.n_failure += 1
+        # Multiplicative decrease
+        self.window = max(self.min_concurrency, self.window * self.decrease)
+        self.rate = max(self.min_rate, self.rate * self.decrease)
+        self.tokens = min(self.tokens, 0)
+
+    @contextlib.contextmanager
+    def throttle(self):
+        """Run the code block under the rate limit"""
+        self.acquire()
+        start_time = monotonic()
+        success = False
+        try:
+            yield self
+            success = True
+        finally:
+            self.release(monotonic() - start_time, success)
+
+    def __repr__(self) -> str:
+        return (
+            f"RateLimiter(rate={self.rate:.2f}/s, concurrency={self.concurrency}, "
+            f"in_flight={self.in_flight}, success={self.n_success}, failure={self.n_failure})"
+        )
+
+
+##################################################
+# Registry
+##################################################
+RATE_LIMITERS: dict[str, RateLimiter] = {}
+_RATE_LIMITERS_LOCK = threading.Lock()
+
+
+def get_rate_limiter(marketplace: str) -> RateLimiter:
+    """Get the shared rate limiter of the marketplace"""
+    with _RATE_LIMITERS_LOCK:
+        if marketplace not in RATE_LIMITERS:
+            cfg = dict(CFG_CRAWLER.rate_limit)
+            cfg.pop("blocked_patterns", None)
+            marketplace_cfg = CFG_CRAWLER.marketplaces.get(marketplace, {})
+            cfg.update(marketplace_cfg.get("rate_limit", {}))
+            RATE_LIMITERS[marketplace] = RateLimiter(**cfg)
+        return RATE_LIMITERS[marketplace]
+
+
+def is_blocked_page(title: str) -> bool:
+    """Check if the page title looks like a captcha or HTTP 429/5xx page"""
+    return CFG_CRAWLER.blocked_pattern.search(title or "") is not None
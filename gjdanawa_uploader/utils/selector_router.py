@@ -0,0 +1,58 @@
+"""Selector router utilities
+
+Route page URLs to selector configs (e.g. `metadata.reviews_selectors_grocery`)
+with precompiled patterns, indexed by host.
+"""
+
+import re
+from urllib.parse import urlsplit
+
+
+# Literal host of a URL pattern, e.g. "^https://m.11st.co.kr/products/ma/.+" -> m.11st.co.kr
+HOST_PATTERN = re.compile(r"^\^?https?\??://((?:[\w-]|\\?\.)+)/")
+
+
+class SelectorRouter:
+    """Route URLs to selector configs.
+
+    Patterns are compiled once. Routes with a literal host are looked up by the
+    URL's host (O(1)); routes without one are tried for every URL, in order.
+
+    Example:
+        >>> router = SelectorRouter(metadata["reviews_selectors_grocery"])
+        >>> selectors = router.match("https://m.11st.co.kr/products/m/6130343076")
+        >>> selectors["version"]
+        2
+    """
+
+    def __init__(self, routes: list[dict], key: str = "listing_url"):
+        self.routes = routes
+        self.key = key
+        self._by_host: dict[str, list[tuple[int, re.Pattern, dict]]] = {}
+        self._any_host: list[tuple[int, re.Pattern, dict]] = []
+        self._n_routes = 0
+        for route in routes:
+            self.add(route)
+
+    def add(self, route: dict):
+        """Register a route (matched after the existing routes, with `re.match`)"""
+        pattern = route[self.key]
+        compiled = (self._n_routes, re.compile(pattern), route)
+        self._n_routes += 1
+        if matches := HOST_PATTERN.match(pattern):
+            host = matches.group(1).replace("\\", "").lower()
+            self._by_host.setdefault(host, []).append(compiled)
+        else:
+            self._any_host.append(compiled)
+
+    def match(self, url: str) -> dict | None:
+        """Get the selector config of the URL (None if no route matches)"""
+        host = (urlsplit(url).hostname or "").lower()
+        candidates = self._by_host.get(host, [])
+        if self._any_host:
+            # Keep the registration order
+            candidates = sorted(candidates + self._any_host, key=lambda x: x[0])
+        for _, pattern, route in candidates:
+            if pattern.match(url):
+                return route
+        return None
@@ -0,0 +1,532 @@
+"""Document storage utilities
+
+Storage of extracted documents (listings, reviews, metadata) shared by the crawlers.
+- SQLite (`sqlite:///path/to/storage.sqlite3`): embedded, no service to run
+  (review content and listing titles are searched with FTS5)
+- Elasticsearch (`http://host:9200`): requires `elasticsearch` package
+
+Documents are upserted by ids derived from the `id_fields` of the indices
+(`configs/es.yml`), so re-crawled listings and reviews replace the old documents.
+"""
+
+import os
+import re
+import json
+import sqlite3
+import hashlib
+import threading
+from abc import ABCMeta, abstractmethod
+from datetime import date
+
+from gjdanawa_uploader.configs import CFG_CRAWLER, CFG_ES, STORAGE_PATH
+from gjdanawa_uploader.core.config_schema import ESIndexConfig
+
+
+# Fields stored in columns of the SQLite tables (filters of the queries)
+COLUMN_FIELDS = (
+    "session_id",
+    "marketplace",
+    "product_name",
+    "brand_name",
+    "query",
+    "date",
+    "updated_at",
+)
+DATE_FIELDS = ("date", "updated_at")
+DATE_PATTERN = re.compile(r"^(\d{4})[./-](\d{1,2})[./-](\d{1,2})")
+DEFAULT_STORAGE_URL = f"sqlite:///{os.path.join(STORAGE_PATH, 'storage.sqlite3')}"
+MIN_MATCH_LENGTH = 3  # trigram tokenizer (shorter texts are searched with LIKE)
+
+
+def get_indices() -> dict[str, ESIndexConfig]:
+    """Index name -> index config"""
+    return {
+        cfg.index: cfg
+        for cfg in (
+            CFG_ES.listings,
+            CFG_ES.reviews,
+            CFG_ES.metadata,
+            CFG_ES.field_descriptions,
+        )
+    }
+
+
+def get_document_id(document: dict, id_fields: list[str]) -> str:
+    """Id of the document (hash of the id fields, or of the whole document without them)"""
+    if id_fields:
+        key = repr(tuple(document.get(name) for name in id_fields))
+    else:
+        key = json.dumps(document, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha1(key.encode()).hexdigest()
+
+
+def get_text_fields(cfg: ESIndexConfig) -> list[str]:
+    """Fields of `text` type (full-text search)"""
+    return [
+        name
+        for name, mapping in cfg.mappings.get("properties", {}).items()
+        if mapping.get("type") == "text"
+    ]
+
+
+def normalize_date(value) -> str | None:
+    """ISO date string for range queries (e.g. "2024.08.01" -> "2024-08-01")"""
+    if value is None:
+        return None
+    if isinstance(value, date):
+        return value.isoformat()
+    value = str(value)
+    if match := DATE_PATTERN.match(value):
+        year, month, day = match.groups()
+        return f"{year}-{int(month):02}-{int(day):02}{value[match.end():]}"
+    return value
+
+
+class Storage(metaclass=ABCMeta):
+    """Document storage interface"""
+
+    def __init__(self, indices: dict[str, ESIndexConfig] | None = None):
+        self.indices = indices or get_indices()
+
+    def _get_index(self, index: str) -> ESIndexConfig:
+        try:
+            return self.indices[index]
+        except KeyError:
+            raise ValueError(f"Unknown index: {index}") from None
+
+    @abstractmethod
+    def insert_documents(self, documents: list[dict], index: str) -> int:
+        """Insert documents (documents with the same ids are replaced)
+
+        Returns:
+            int: Number of inserted documents
+        """
+        raise NotImplementedError
+
+    def insert_document(self, document: dict, index: str) -> int:
+        """Insert a document"""
+        return self.insert_documents([document], index)
+
+    @abstractmethod
+    def search(
+        self,
+        index: str,
+        product_name: str | None = None,
+        marketplace: str | None = None,
+        date_from: str | date | None = None,
+        date_to: str | date | None = None,
+        text: str | None = None,
+        size: int = 100,
+        date_field: str = "date",
+    ) -> list[dict]:
+        """Search documents
+
+        Args:
+            index (str): Index name
+            product_name (str, optional): Product name
+            marketplace (str, optional): Marketplace
+            date_from (str | date, optional): Minimum date (inclusive)
+            date_to (str | date, optional): Maximum date (inclusive)
+            text (str, optional): Text in the text fields (e.g. review content)
+            size (int, optional): Maximum number of documents
+            date_field (str, optional): Date field of the range ("date" | "updated_at")
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def count(self, index: str) -> int:
+        """Number of documents in the index"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def reset(self):
+        """Remove all documents"""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+####################################################################################################
+# SQLite
+####################################################################################################
+class SQLiteStorage(Storage):
+    """SQLite storage (one table and one FTS5 table per index)
+
+    Filter fields and text fields are stored in columns besides the JSON documents.
+    The FTS tables are updated once per batch instead of by triggers per row.
+
+    Example:
+        >>> storage = SQLiteStorage("storage/storage.sqlite3")
+        >>> storage.insert_documents(review_infos, index="reviews")
+        >>> storage.search("reviews", marketplace="danawa", text="거품")
+    """
+
+    def __init__(
+        self,
+        path: str,
+        indices: dict[str, ESIndexConfig] | None = None,
+        reset: bool = False,
+    ):
+        super().__init__(indices)
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            for cfg in self.indices.values():
+                self._conn.executescript(self._get_schema(cfg))
+            # Ids of the inserted batch (per connection)
+            self._conn.execute("CREATE TEMP TABLE batch_ids (id TEXT PRIMARY KEY)")
+        if reset:
+            self.reset()
+
+    @staticmethod
+    def _get_columns(cfg: ESIndexConfig) -> list[str]:
+        """Columns of the table besides id and document"""
+        return [*COLUMN_FIELDS, *get_text_fields(cfg)]
+
+    def _get_schema(self, cfg: ESIndexConfig) -> str:
+        table = _quote(cfg.index)
+        columns = ", ".join(f"{name} TEXT" for name in self._get_columns(cfg))
+        schema = f"""
+            CREATE TABLE IF NOT EXISTS {table} (id TEXT PRIMARY KEY, {columns}, document TEXT);
+            CREATE INDEX IF NOT EXISTS {_quote(f"{cfg.index}_product")}
+                ON {table} (product_name, marketplace, date);
+            CREATE INDEX IF NOT EXISTS {_quote(f"{cfg.index}_marketplace")}
+                ON {table} (marketplace, date);
+        """
+        if text_fields := get_text_fields(cfg):
+            # External content FTS table of the text columns (trigram: substrings of Korean words)
+            schema += f"""
+                CREATE VIRTUAL TABLE IF NOT EXISTS {_quote(f"{cfg.index}_fts")} USING fts5(
+                    {", ".join(text_fields)},
+                    content={table}, content_rowid='rowid', tokenize='trigram'
+                );
+            """
+        return schema
+
+    def insert_documents(self, documents: list[dict], index: str) -> int:
+        cfg = self._get_index(index)
+        columns = self._get_columns(cfg)
+        converters = [
+            normalize_date if name in DATE_FIELDS else _to_text for name in columns
+        ]
+        rows = [
+            (
+                get_document_id(document, cfg.id_fields),
+                *[
+                    convert(document.get(name))
+                    for name, convert in zip(columns, converters)
+                ],
+                _dumps(document),
+            )
+            for document in documents
+        ]
+        names = ", ".join(columns)
+        updates = ", ".join(
+            f"{name} = excluded.{name}" for name in (*columns, "document")
+        )
+        placeholders = ", ".join("?" * (len(columns) + 2))
+        text_fields = get_text_fields(cfg)
+
+        with self._lock, self._conn:
+            # 1. Remove FTS entries of the documents to be replaced
+            if text_fields:
+                self._conn.execute("DELETE FROM batch_ids")
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO batch_ids VALUES (?)",
+                    [row[:1] for row in rows],
+                )
+                self._update_fts(index, text_fields, delete=True)
+
+            # 2. Upsert documents
+            self._conn.executemany(
+                f"INSERT INTO {_quote(index)} (id, {names}, document) VALUES ({placeholders}) "
+                f"ON CONFLICT (id) DO UPDATE SET {updates}",
+                rows,
+            )
+
+            # 3. Add FTS entries
+            if text_fields:
+                self._update_fts(index, text_fields)
+        return len(rows)
+
+    def _update_fts(self, index: str, text_fields: list[str], delete: bool = False):
+        """Add (or remove) FTS entries of the documents in `batch_ids`
+
+        Rows are ordered by rowid: FTS5 merges ascending rowids without flushing segments.
+        """
+        fts, names = _quote(f"{index}_fts"), ", ".join(text_fields)
+        if delete:
+            fts_columns, values = f"{fts}, rowid, {names}", f"'delete', rowid, {names}"
+        else:
+            fts_columns, values = f"rowid, {names}", f"rowid, {names}"
+        self._conn.execute(
+            f"INSERT INTO {fts} ({fts_columns}) SELECT {values} FROM {_quote(index)} "
+            "WHERE id IN (SELECT id FROM temp.batch_ids) ORDER BY rowid"
+        )
+
+    def search(
+        self,
+        index: str,
+        product_name: str | None = None,
+        marketplace: str | None = None,
+        date_from: str | date | None = None,
+        date_to: str | date | None = None,
+        text: str | None = None,
+        size: int = 100,
+        date_field: str = "date",
+    ) -> list[dict]:
+        cfg = self._get_index(index)
+        assert date_field in DATE_FIELDS, f"Invalid date field: {date_field}"
+
+        # 1. Filters
+        table = f"{_quote(index)} AS t"
+        conditions, params = [], []
+        for name, value in (
+            ("product_name", product_name),
+            ("marketplace", marketplace),
+        ):
+            if value is not None:
+                conditions.append(f"t.{name} = ?")
+                params.append(value)
+        if date_from is not None:
+            conditions.append(f"t.{date_field} >= ?")
+            params.append(normalize_date(date_from))
+        if date_to is not None:
+            # Dates with times on the last day are included ("~" sorts after ISO characters)
+            conditions.append(f"t.{date_field} <= ?")
+            params.append(normalize_date(date_to) + "~")
+
+        # 2. Full-text search (ranked by BM25)
+        order = f"t.{date_field} DESC"
+        if text:
+            text_fields = get_text_fields(cfg)
+            if not text_fields:
+                raise ValueError(f"No text fields in index: {index}")
+            if len(text) >= MIN_MATCH_LENGTH:
+                # CROSS JOIN: matches are looked up once, not once per filtered row
+                fts = _quote(f"{index}_fts")
+                table = f"{fts} CROSS JOIN {table} ON t.rowid = {fts}.rowid"
+                conditions.append(f"{fts} MATCH ?")
+                params.append('"' + text.replace('"', '""') + '"')
+                order = f"bm25({fts})"
+            else:
+                likes = " OR ".join(f"t.{name} LIKE ?" for name in text_fields)
+                conditions.append(f"({likes})")
+                params.extend([f"%{text}%"] * len(text_fields))
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        query = f"SELECT t.document FROM {table} {where} ORDER BY {order} LIMIT ?"
+        with self._lock:
+            rows = self._conn.execute(query, (*params, size)).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def count(self, index: str) -> int:
+        self._get_index(index)
+        with self._lock:
+            return self._conn.execute(
+                f"SELECT COUNT(*) FROM {_quote(index)}"
+            ).fetchone()[0]
+
+    def reset(self):
+        with self._lock, self._conn:
+            for index, cfg in self.indices.items():
+                self._conn.execute(f"DELETE FROM {_quote(index)}")
+                if get_text_fields(cfg):
+                    fts = _quote(f"{index}_fts")
+                    self._conn.execute(
+                        f"INSERT INTO {fts} ({fts}) VALUES ('delete-all')"
+                    )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+####################################################################################################
+# Elasticsearch
+####################################################################################################
+class ElasticsearchStorage(Storage):
+    """Elasticsearch storage (indices are created with the mappings of `configs/es.yml`)"""
+
+    def __init__(
+        self,
+        url: str,
+        indices: dict[str, ESIndexConfig] | None = None,
+        reset: bool = False,
+    ):
+        super().__init__(indices)
+        try:
+            from elasticsearch import Elasticsearch, helpers
+        except ImportError:
+            raise ImportError(
+                "elasticsearch is required for Elasticsearch storage"
+            ) from None
+        self.url = url
+        self.es = Elasticsearch(url)
+        self._helpers = helpers
+        if reset:
+            self.reset()
+        self._create_indices()
+
+    def _create_indices(self):
+        for index, cfg in self.indices.items():
+            if not self.es.indices.exists(index=index):
+                self.es.indices.create(
+                    index=index,
+                    mappings=cfg.mappings or None,
+                    settings=cfg.settings or None,
+                )
+
+    def insert_documents(self, documents: list[dict], index: str) -> int:
+        id_fields = self._get_index(index).id_fields
+        actions = (
+            {
+                "_op_type": "index",  # replace documents with the same ids
+                "_index": index,
+                "_id": get_document_id(document, id_fields),
+                "_source": document,
+            }
+            for document in documents
+        )
+        n_inserted, _ = self._helpers.bulk(self.es, actions, refresh="wait_for")
+        return n_inserted
+
+    def search(
+        self,
+        index: str,
+        product_name: str | None = None,
+        marketplace: str | None = None,
+        date_from: str | date | None = None,
+        date_to: str | date | None = None,
+        text: str | None = None,
+        size: int = 100,
+        date_field: str = "date",
+    ) -> list[dict]:
+        cfg = self._get_index(index)
+        filters = [
+            {"term": {name: value}}
+            for name, value in (
+                ("product_name", product_name),
+                ("marketplace", marketplace),
+            )
+            if value is not None
+        ]
+        if date_from is not None or date_to is not None:
+            bounds = dict(gte=normalize_date(date_from), lte=normalize_date(date_to))
+            filters.append(
+                {
+                    "range": {
+                        date_field: {k: v for k, v in bounds.items() if v is not None}
+                    }
+                }
+            )
+        query = {"bool": {"filter": filters}}
+        sort = [{date_field: {"order": "desc", "unmapped_type": "date"}}]
+        if text:
+            text_fields = get_text_fields(cfg)
+            if not text_fields:
+                raise ValueError(f"No text fields in index: {index}")
+            query["bool"]["must"] = [
+                {"multi_match": {"query": text, "fields": text_fields}}
+            ]
+            sort = ["_score"]
+        response = self.es.search(index=index, query=query, size=size, sort=sort)
+        return [hit["_source"] for hit in response["hits"]["hits"]]
+
+    def count(self, index: str) -> int:
+        self._get_index(index)
+        return self.es.count(index=index)["count"]
+
+    def reset(self):
+        for index in self.indices:
+            self.es.indices.delete(index=index, ignore_unavailable=True)
+        self._create_indices()
+
+    def close(self):
+        self.es.close()
+
+
+def get_storage(url: str | None = None, reset: bool = False) -> Storage:
+    """Get storage from URL (`sqlite:///path` or `http(s)://...`, default: `storage` config)"""
+    url = url or CFG_CRAWLER.storage.url or DEFAULT_STORAGE_URL
+    if url.startswith("sqlite:///"):
+        return SQLiteStorage(url.removeprefix("sqlite:///"), reset=reset)
+    elif url.startswith(("http://", "https://")):
+        return ElasticsearchStorage(url, reset=reset)
+    raise ValueError(f"Invalid storage url: {url}")
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _to_text(value) -> str | None:
+    return value if value is None or isinstance(value, str) else str(value)
+
+
+def _dumps(obj) -> str:
+    return json.dumps(obj, ensure_ascii=False, default=str)
+
+
+if __name__ == "__main__":
+    import random
+    import tempfile
+    from time import perf_counter
+
+    reviews = [
+        dict(
+            session_id="demo",
+            marketplace=random.choice(["danawa", "m11st", "navershopping"]),
+            product_name="퍼펙트휩",
+            brand_name="센카",
+            query="센카 퍼펙트휩",
+            listing_title=f"센카 퍼펙트휩 {i % 40}",
+            listing_url=f"https://example.com/products/{i % 40}",
+            reviewer_id=f"user{i}",
+            rating=random.randint(1, 5) / 5,
+            content=random.choice(
+                ["거품이 풍성해요", "세정력이 좋아요", "향이 별로예요"]
+            ),
+            date=f"2024.{random.randint(1, 12):02}.01",
+            optional={},
+        )
+        for i in range(100_000)
+    ]
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        with SQLiteStorage(os.path.join(tmp_dir, "storage.sqlite3")) as storage:
+            start_time = perf_counter()
+            storage.insert_documents(reviews, index="reviews")
+            print(
+                f"Insert: {len(reviews)} reviews / {perf_counter() - start_time:.2f}s"
+            )
+
+            start_time = perf_counter()
+            storage.insert_documents(reviews[:10_000], index="reviews")  # upsert
+            print(f"Upsert: 10000 reviews / {perf_counter() - start_time:.2f}s")
+            print(f"# reviews: {storage.count('reviews')}")
+
+            start_time = perf_counter()
+            results = storage.search(
+                "reviews",
+                product_name="퍼펙트휩",
+                marketplace="danawa",
+                date_from="2024-06-01",
+                date_to="2024-08-31",
+                text="거품이",
+            )
+            print(
+                f"Search: {len(results)} reviews / {perf_counter() - start_time:.3f}s"
+            )
@@ -0,0 +1,69 @@
+"""URL utilities"""
+
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode, unquote
+
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def set_query_params(url: str, **params) -> str:
+    """Set (or replace) query parameters of the URL
+
+    Example:
+        >>> set_query_params("https://a.com/search?keyword=x&page=1", page=2)
+        'https://a.com/search?keyword=x&page=2'
+    """
+    parts = urlsplit(url)
+    query = dict(parse_qsl(parts.query, keep_blank_values=True))
+    query.update({key: str(value) for key, value in params.items()})
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+def normalize_url(url: str) -> str:
+    """Normalize the URL for cache keys
+
+    Lowercase scheme and host, drop default port and fragment, sort query parameters.
+
+    Example:
+        >>> normalize_url("HTTPS://Search.Danawa.com:443/dsearch.php?page=1&keyword=x#top")
+        'https://search.danawa.com/dsearch.php?keyword=x&page=1'
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    netloc = (parts.hostname or "").lower()
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        netloc = f"{netloc}:{parts.port}"
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, netloc, parts.path or "/", query, ""))
+
+
+def unwrap_redirect(url: str, redirect_params: list[str] = ("redirect",)) -> str:
+    """Get the target URL of redirect wrappers (e.g. 11st ad click URLs)
+
+    Example:
+        >>> unwrap_redirect("https://action.adoffice.11st.co.kr/act/click?clickData=x&redirect=%2F%2Fm.11st.co.kr%2Fproducts%2Fm%2F1")
+        'https://m.11st.co.kr/products/m/1'
+    """
+    for _ in range(5):  # nested wrappers
+        parts = urlsplit(url)
+        query = dict(parse_qsl(parts.query, keep_blank_values=True))
+        target = next((query[key] for key in redirect_params if query.get(key)), None)
+        if target is None:
+            break
+        target = unquote(target) if "%" in target else target
+        if target.startswith("//"):
+            # Scheme-relative URL
+            target = f"{parts.scheme or 'https'}:{target}"
+        url = target
+    return url
+
+
+def remove_query_params(url: str, params: list[str]) -> str:
+    """Remove query parameters (e.g. tracking parameters) of the URL"""
+    parts = urlsplit(url)
+    query = [
+        (key, value)
+        for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if key not in params
+    ]
+    return urlunsplit(parts._replace(query=urlencode(query)))
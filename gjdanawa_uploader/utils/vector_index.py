@@ -0,0 +1,209 @@
+"""Vector index utilities
+
+Match texts (e.g. listing titles) by vector similarity: hashed character n-gram
+vectors (or embeddings of `core.embedding`), searched by brute force with NumPy or
+with an optional ANN index (hnswlib).
+"""
+
+import re
+import zlib
+
+import numpy as np
+
+
+MAX_CACHED_TEXTS = 100_000
+
+
+class CharNgramVectorizer:
+    """Hashed character n-gram vectors of texts.
+
+    Spaces are removed and texts are lowercased, so "퍼펙트 휩" and "퍼펙트휩" match.
+
+    Example:
+        >>> vectorizer = CharNgramVectorizer(n=2)
+        >>> X = vectorizer.transform(["센카 퍼펙트휩", "센카 퍼펙트휩 클렌징폼 120g"])
+        >>> float(X[0] @ X[1])
+        0.67
+    """
+
+    def __init__(self, n: int = 2, dim: int = 2**12):
+        self.n = n
+        self.dim = dim
+        self._cache: dict[str, np.ndarray] = {}  # text -> n-gram buckets
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        return re.sub(r"\s+", "", text or "").lower()
+
+    def buckets(self, text: str) -> np.ndarray:
+        """Hash buckets of the n-grams of the text"""
+        if text not in self._cache:
+            if len(self._cache) >= MAX_CACHED_TEXTS:
+                self._cache.clear()
+            text_ = self.normalize(text)
+            ngrams = {text_[i : i + self.n] for i in range(len(text_) - self.n + 1)}
+            ngrams = ngrams or {text_}
+            self._cache[text] = np.fromiter(
+                (zlib.crc32(ngram.encode()) % self.dim for ngram in ngrams),
+                dtype=np.int64,
+                count=len(ngrams),
+            )
+        return self._cache[text]
+
+    def transform(
+        self, texts: list[str], binary: bool = False, normalize: bool = True
+    ) -> np.ndarray:
+        """Vectors of the texts (float32, L2-normalized unless `normalize=False`)"""
+        X = np.zeros((len(texts), self.dim), dtype=np.float32)
+        buckets = [self.buckets(text) for text in texts]
+        rows = np.repeat(np.arange(len(texts)), [len(b) for b in buckets])
+        if len(rows):
+            cols = np.concatenate(buckets)
+            if binary:
+                X[rows, cols] = 1
+            else:
+                np.add.at(X, (rows, cols), 1)
+        if normalize:
+            norms = np.linalg.norm(X, axis=1, keepdims=True)
+            X /= np.maximum(norms, 1e-12)
+        return X
+
+    def coverage(self, query: str, texts: list[str]) -> np.ndarray:
+        """Fraction of the query's n-grams in each text (one matrix-vector product)
+
+        Example:
+            >>> vectorizer.coverage("퍼펙트휩", ["센카 퍼펙트 휩 120g", "센카 스피디 퍼펙트"])
+            array([1.  , 0.67], dtype=float32)
+        """
+        if not texts:
+            return np.zeros(0, dtype=np.float32)
+        q = self.transform([query], binary=True, normalize=False)[0]
+        X = self.transform(texts, binary=True, normalize=False)
+        return (X @ q) / max(q.sum(), 1)
+
+
+VECTORIZER = CharNgramVectorizer()
+
+
+class VectorIndex:
+    """Similarity (cosine) index of normalized vectors.
+
+    Brute force with NumPy by default: a batch of queries is searched with one
+    matrix product. With `backend="hnsw"` (hnswlib installed), an approximate
+    HNSW graph is used for large indices.
+
+    Example:
+        >>> index = VectorIndex(dim=vectorizer.dim)
+        >>> index.add(vectorizer.transform(titles), ids=listing_urls)
+        >>> scores, ids = index.search(vectorizer.transform(["센카 퍼펙트휩"]), k=3)
+    """
+
+    def __init__(self, dim: int, backend: str = "numpy", ef: int = 64, M: int = 16):
+        self.dim = dim
+        self.backend = backend
+        self.ids: list = []
+        self._vectors = np.zeros((0, dim), dtype=np.float32)
+        self._chunks: list[np.ndarray] = []
+        self._hnsw = None
+        if backend == "hnsw":
+            try:
+                import hnswlib
+            except ImportError:
+                print("[Warning] hnswlib is not installed, use the numpy backend")
+                self.backend = "numpy"
+            else:
+                self._hnsw = hnswlib.Index(space="ip", dim=dim)
+                self._hnsw.init_index(max_elements=1024, ef_construction=ef, M=M)
+                self._hnsw.set_ef(ef)
+        elif backend != "numpy":
+            raise ValueError(f"Invalid backend: {backend}")
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def vectors(self) -> np.ndarray:
+        if self._chunks:
+            self._vectors = np.concatenate([self._vectors, *self._chunks])
+            self._chunks = []
+        return self._vectors
+
+    def add(self, vectors: np.ndarray, ids: list | None = None):
+        """Add normalized vectors (ids default to their positions)"""
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        if ids is None:
+            ids = list(range(len(self), len(self) + len(vectors)))
+        assert len(ids) == len(vectors), "Invalid number of ids"
+        if self._hnsw is not None:
+            n_required = len(self) + len(vectors)
+            if n_required > self._hnsw.get_max_elements():
+                self._hnsw.resize_index(
+                    max(n_required, 2 * self._hnsw.get_max_elements())
+                )
+            self._hnsw.add_items(vectors, np.arange(len(self), n_required))
+        self._chunks.append(vectors)
+        self.ids.extend(ids)
+
+    def search(self, queries: np.ndarray, k: int = 1) -> tuple[np.ndarray, list[list]]:
+        """Top-k similar vectors of each query
+
+        Returns:
+            tuple[np.ndarray, list[list]]: Scores (n_queries, k) and ids of the vectors
+        """
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, self.dim)
+        k = min(k, len(self))
+        if k == 0:
+            return np.zeros((len(queries), 0), dtype=np.float32), [[] for _ in queries]
+
+        if self._hnsw is not None:
+            positions, distances = self._hnsw.knn_query(queries, k=k)
+            scores = 1 - distances
+        else:
+            similarities = queries @ self.vectors.T
+            positions = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+            scores = np.take_along_axis(similarities, positions, axis=1)
+            order = np.argsort(-scores, axis=1)
+            positions = np.take_along_axis(positions, order, axis=1)
+            scores = np.take_along_axis(scores, order, axis=1)
+        return scores, [[self.ids[p] for p in row] for row in positions]
+
+
+def group_similar(
+    vectors: np.ndarray,
+    threshold: float = 0.8,
+    k: int | None = None,
+    backend: str = "numpy",
+) -> np.ndarray:
+    """Group ids of near-duplicate vectors (connected by similarity >= threshold)
+
+    Neighbors of each vector are searched in a `VectorIndex` (top-k, all vectors
+    if `k` is None). With `backend="hnsw"`, `k` bounds the search for large inputs.
+
+    Example:
+        >>> group_similar(vectorizer.transform(titles), threshold=0.8)
+        array([0, 0, 2, 3, 2])
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    n = len(vectors)
+    parents = np.arange(n)
+    if n == 0:
+        return parents
+
+    def find(i: int) -> int:
+        while parents[i] != i:
+            parents[i] = parents[parents[i]]
+            i = parents[i]
+        return i
+
+    index = VectorIndex(vectors.shape[1], backend=backend)
+    index.add(vectors)
+    scores, neighbors = index.search(vectors, k=k or n)
+    neighbors = np.asarray(neighbors, dtype=np.int64)
+    rows, cols = np.nonzero(
+        (scores >= threshold) & (neighbors != np.arange(n)[:, None])
+    )
+    for i, j in zip(rows, neighbors[rows, cols]):
+        root_i, root_j = find(i), find(j)
+        if root_i != root_j:
+            parents[max(root_i, root_j)] = min(root_i, root_j)
+    return np.array([find(i) for i in range(n)])
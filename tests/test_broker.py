@@ -0,0 +1,86 @@
+import pytest
+
+from gjdanawa_uploader.utils.broker import Job, JobResult, SQLiteBroker
+
+
+@pytest.fixture
+def broker(tmp_path):
+    return SQLiteBroker(str(tmp_path / "broker.sqlite3"), max_attempts=2)
+
+
+def get_job(kind: str = "search", **payload) -> Job:
+    return Job(kind, "danawa", dict(session_id="test", **payload))
+
+
+def test_enqueue_and_claim(broker):
+    ids = [broker.push(get_job(page=page)) for page in (1, 2)]
+    assert broker.counts() == dict(queued=2)
+
+    job = broker.pop()
+    assert (job.id, job.payload["page"], job.attempts) == (ids[0], 1, 1)
+    assert broker.pop().id == ids[1]
+    assert broker.pop() is None
+    assert broker.counts() == dict(running=2)
+    assert not broker.is_idle()
+
+
+def test_complete(broker):
+    broker.push(get_job())
+    job = broker.pop()
+    result = JobResult(
+        documents=dict(listings=[dict(listing_url="url")], reviews=[]),
+        jobs=[get_job("listing_page", page=1)],
+    )
+    assert broker.complete(job, result)
+    assert broker.counts() == dict(done=1, queued=1)
+    assert broker.results("listings", "test") == [dict(listing_url="url")]
+    assert broker.results("listings", "other") == []
+    assert broker.results("reviews") == []
+
+    # A finished job is not completed again (documents and jobs are committed once)
+    assert not broker.complete(job, result)
+    assert not broker.heartbeat(job)
+    assert broker.counts() == dict(done=1, queued=1)
+
+
+def test_fail_and_retry(broker):
+    broker.push(get_job())
+
+    # 1. Requeued until max_attempts
+    job = broker.pop()
+    broker.fail(job, "TimeoutException()")
+    assert broker.counts() == dict(queued=1)
+
+    # 2. Failed after max_attempts
+    job = broker.pop()
+    assert job.attempts == 2
+    broker.fail(job, "TimeoutException()")
+    assert broker.counts() == dict(failed=1)
+    assert broker.pop() is None
+    assert broker.is_idle()
+
+
+def test_requeue_stale(broker):
+    broker.push(get_job())
+    stale_job = broker.pop()
+
+    # 1. Jobs with a recent heartbeat are kept running
+    broker.requeue_stale(timeout=60)
+    assert broker.counts() == dict(running=1)
+
+    # 2. Jobs without heartbeat are requeued, the stale attempt does not own the job
+    broker.requeue_stale(timeout=-1)
+    assert broker.counts() == dict(queued=1)
+    job = broker.pop()
+    assert job.attempts == 2
+    assert not broker.heartbeat(stale_job)
+    assert not broker.complete(stale_job, JobResult())
+    assert broker.complete(job, JobResult())
+
+    # 3. Jobs claimed max_attempts times are failed
+    broker.push(get_job())
+    broker.pop()
+    broker.requeue_stale(timeout=-1)
+    broker.pop()
+    broker.requeue_stale(timeout=-1)
+    assert broker.counts() == dict(done=1, failed=1)
@@ -0,0 +1,67 @@
+import pytest
+from easydict import EasyDict
+
+from gjdanawa_uploader.utils.checkpoint import CrawlCheckpoint
+from gjdanawa_uploader.utils.html_element import HtmlElement
+from gjdanawa_uploader.crawler.danawa import danawa_crawler
+from gjdanawa_uploader.crawler.danawa.danawa_crawler import DanawaCrawler
+
+
+LISTING_URL = "https://prod.danawa.com/info/?pcode=1"
+
+
+@pytest.fixture
+def checkpoint(tmp_path):
+    checkpoint = CrawlCheckpoint(str(tmp_path / "crawls.sqlite3"), "danawa|test")
+    yield checkpoint
+    checkpoint.close()
+
+
+def test_review_cursor(checkpoint):
+    checkpoint.add_reviews(LISTING_URL, [dict(id=0), dict(id=1)])
+    assert checkpoint.review_cursor(LISTING_URL) == 2  # saved reviews by default
+
+    checkpoint.add_reviews(LISTING_URL, [dict(id=3)], cursor=5)
+    assert checkpoint.review_cursor(LISTING_URL) == 5
+    assert checkpoint.load_reviews(LISTING_URL) == [dict(id=0), dict(id=1), dict(id=3)]
+
+
+def get_review_page(n_reviews: int) -> HtmlElement:
+    """Review page where every third review is invalid (empty)"""
+    items = "".join(
+        f"<li class='review'>{'' if i % 3 == 2 else f'review {i}'}<i>{i}</i></li>"
+        for i in range(n_reviews)
+    )
+    return HtmlElement.from_html(f"<ul>{items}</ul>", url=LISTING_URL)
+
+
+def test_resume_reviews(checkpoint, monkeypatch):
+    crawler = DanawaCrawler(
+        product_name="퍼펙트휩", brand_name="센카", session_id="test"
+    )
+    crawler.driver = object()  # pages are snapshots
+    crawler.checkpoint = checkpoint
+    crawler.reviews_selectors = EasyDict(reviews="li.review", view_more_button="")
+    crawler._extract_review = lambda elem, listing_info, doc: (
+        dict(content=elem.text) if elem.text.startswith("review") else {}
+    )
+    listing_info = dict(listing_url=LISTING_URL)
+
+    # 1. The first run crashes while loading more reviews
+    def crash(*args, **kwargs):
+        raise RuntimeError("crash")
+
+    monkeypatch.setattr(danawa_crawler, "snapshot_page", lambda _: get_review_page(6))
+    monkeypatch.setattr(danawa_crawler, "scroll", crash)
+    with pytest.raises(RuntimeError):
+        crawler._get_review_infos(listing_info, n_reviews=12)
+    assert len(checkpoint.load_reviews(LISTING_URL)) == 4
+    assert checkpoint.review_cursor(LISTING_URL) == 6
+
+    # 2. The next run resumes after the elements read (invalid ones included)
+    monkeypatch.setattr(danawa_crawler, "snapshot_page", lambda _: get_review_page(12))
+    review_infos = crawler._get_review_infos(listing_info, n_reviews=12)
+    contents = [info["content"] for info in review_infos]
+    assert len(contents) == len(set(contents)) == 8
+    assert checkpoint.load_reviews(LISTING_URL) == review_infos
+    assert checkpoint.review_cursor(LISTING_URL) == 12
@@ -0,0 +1,135 @@
+import os
+import sys
+import importlib
+
+import pytest
+
+from gjdanawa_uploader.configs import CONFIG_PATH, METADATA
+from gjdanawa_uploader.core import config_schema
+from gjdanawa_uploader.core.config_schema import (
+    CrawlerConfig,
+    MarketplaceMetadata,
+    load_config,
+)
+
+
+METADATA_YML = """
+danawa:
+  marketplace: danawa
+  search_url: "https://search.danawa.com/mobile/dsearch.php?keyword={keyword}"
+  query: keyword
+  max_review_rating: 5
+"""
+
+
+@pytest.fixture
+def metadata_path(tmp_path) -> str:
+    path = tmp_path / "metadata.yml"
+    path.write_text(METADATA_YML, encoding="utf8")
+    return str(path)
+
+
+@pytest.fixture
+def n_parsed(monkeypatch) -> list:
+    """Number of parsed config files (not loaded from the cache)"""
+    n_parsed = [0]
+    parse_yaml = config_schema.parse_yaml
+
+    def counting_parse_yaml(stream):
+        if not isinstance(stream, str):  # files (override values are strings)
+            n_parsed[0] += 1
+        return parse_yaml(stream)
+
+    monkeypatch.setattr(config_schema, "parse_yaml", counting_parse_yaml)
+    return n_parsed
+
+
+def test_schema():
+    # 1. Config files of the repo are valid
+    cfg = load_config(os.path.join(CONFIG_PATH, "crawler.yml"), CrawlerConfig)
+    assert isinstance(cfg.marketplaces["danawa"].n_listings, int)
+    assert cfg["rate_limit"] == cfg.rate_limit  # dict-style access
+    assert METADATA["m11st"].selector_router.match(
+        "https://m.11st.co.kr/products/m/1"
+    ) == dict(listing_url="^https://m\\.11st\\.co\\.kr/products/m/.+", version=2)
+
+    # 2. Invalid values raise ValueError with the path of the value
+    data = dict(marketplace="danawa", search_url="https://danawa.com?k={k}", query="k")
+    assert MarketplaceMetadata.from_dict(data).max_review_rating is None
+    assert (
+        MarketplaceMetadata.from_dict(dict(data, max_review_rating=5)).max_review_rating
+        == 5.0
+    )
+    with pytest.raises(ValueError, match="Unknown keys"):
+        MarketplaceMetadata.from_dict(dict(data, unknown=1))
+    with pytest.raises(ValueError, match="max_review_rating: expected float"):
+        MarketplaceMetadata.from_dict(dict(data, max_review_rating="5"))
+    with pytest.raises(ValueError, match="no {k}"):
+        MarketplaceMetadata.from_dict(dict(data, search_url="https://danawa.com"))
+    with pytest.raises(ValueError, match="Invalid config"):
+        MarketplaceMetadata.from_dict(dict(marketplace="danawa"))
+
+
+def test_check_selectors():
+    metadata = METADATA["danawa"]
+    selectors = dict(reviews="li.review", view_more_button="")
+    assert metadata.check_selectors(selectors, ("reviews",), "reviews") is selectors
+    with pytest.raises(NotImplementedError, match="view_more_button"):
+        metadata.check_selectors(selectors, ("reviews", "view_more_button"), "reviews")
+
+
+def test_env_overrides(metadata_path, monkeypatch):
+    monkeypatch.setenv("GJDANAWA_METADATA__danawa__max_review_rating", "10")
+    monkeypatch.setenv(
+        "GJDANAWA_METADATA__danawa__listings_selectors__listings", "ul > li"
+    )
+    metadata = load_config(metadata_path, dict[str, MarketplaceMetadata])
+    assert metadata["danawa"].max_review_rating == 10.0  # parsed as YAML
+    assert metadata["danawa"].listings_selectors.listings == "ul > li"
+
+    # Overridden values are validated
+    monkeypatch.setenv("GJDANAWA_METADATA__danawa__max_review_rating", "high")
+    with pytest.raises(ValueError, match="max_review_rating"):
+        load_config(metadata_path, dict[str, MarketplaceMetadata])
+
+
+def test_cache_invalidation(metadata_path, tmp_path, monkeypatch, n_parsed):
+    cache_dir = str(tmp_path / "cache")
+    schema = dict[str, MarketplaceMetadata]
+
+    def load():
+        return load_config(metadata_path, schema, cache_dir)
+
+    # 1. Cached until the file changes
+    load()
+    assert load()["danawa"].max_review_rating == 5.0
+    assert n_parsed[0] == 1
+    with open(metadata_path, "a", encoding="utf8") as f:
+        f.write("  max_listing_rating: 5\n")
+    assert load()["danawa"].max_listing_rating == 5.0
+    assert n_parsed[0] == 2
+
+    # 2. Environment overrides change
+    monkeypatch.setenv("GJDANAWA_METADATA__danawa__currency", "원")
+    assert load()["danawa"].currency == "원"
+    assert n_parsed[0] == 3
+
+    # 3. Modules of the pickled types change
+    module_path = tmp_path / "pickled_module.py"
+    module_path.write_text("VERSION = 1\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    module = importlib.import_module("pickled_module")
+    monkeypatch.setitem(sys.modules, "pickled_module", module)
+    monkeypatch.setattr(
+        config_schema,
+        "PICKLED_MODULES",
+        (*config_schema.PICKLED_MODULES, "pickled_module"),
+    )
+    load()
+    assert n_parsed[0] == 4
+    load()
+    assert n_parsed[0] == 4
+    stat = os.stat(module_path)
+    os.utime(module_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    load()
+    assert n_parsed[0] == 5
@@ -0,0 +1,57 @@
+import numpy as np
+
+from gjdanawa_uploader.core.embedding import (
+    EmbeddingService,
+    embed_documents,
+    fake_embed,
+)
+
+
+class CountingEmbed:
+    def __init__(self):
+        self.texts = []
+
+    def __call__(self, batch: list[str]) -> list[list[float]]:
+        self.texts.extend(batch)
+        return fake_embed(batch)
+
+
+def test_cold_and_warm_cache(tmp_path):
+    texts = [f"센카 퍼펙트휩 {i % 30}" for i in range(100)]
+
+    # 1. Cold: unique texts are embedded once
+    embed_fn = CountingEmbed()
+    service = EmbeddingService(
+        embed_fn, model="fake", batch_size=8, cache_path=tmp_path
+    )
+    cold_vectors = service.embed(texts)
+    service.cache.close()
+    assert cold_vectors.shape == (100, 256)
+    assert sorted(embed_fn.texts) == sorted(set(texts))
+    assert service.stats["n_cached"] == 0
+    assert service.stats["n_embedded"] == 30
+    assert service.stats["n_requests"] == 4
+
+    # 2. Warm: vectors are read from the disk cache
+    embed_fn = CountingEmbed()
+    service = EmbeddingService(
+        embed_fn, model="fake", batch_size=8, cache_path=tmp_path
+    )
+    warm_vectors = service.embed(texts)
+    service.cache.close()
+    assert embed_fn.texts == []
+    assert service.stats["n_cached"] == 30
+    assert service.stats["n_embedded"] == 0
+    np.testing.assert_array_equal(cold_vectors, warm_vectors)
+
+
+def test_embed_documents():
+    service = EmbeddingService(fake_embed, model="fake", cache_path=None)
+    infos = dict(
+        listings=[dict(listing_title="센카 퍼펙트휩"), dict(listing_title=None)],
+        reviews=[dict(content="거품이 풍성해요")],
+    )
+    embed_documents(service, infos, dict(listings="listing_title", reviews="content"))
+    assert len(infos["listings"][0]["embedding"]) == 256
+    assert "embedding" not in infos["listings"][1]
+    assert infos["reviews"][0]["embedding"] == fake_embed(["거품이 풍성해요"])[0]
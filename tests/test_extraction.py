@@ -0,0 +1,100 @@
+import re
+
+import pytest
+
+from gjdanawa_uploader.core.extraction import (
+    TASKS,
+    ExtractionCache,
+    FakeChatModel,
+    LLMExtractor,
+    estimate_tokens,
+)
+
+
+TASK = TASKS["price_per_unit"]
+
+
+def respond(text: str) -> dict:
+    quantity, unit, price = re.search(r"(\d+)(\w+)당 ([\d,]+)원", text).groups()
+    return dict(quantity=int(quantity), unit=unit, price=int(price.replace(",", "")))
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = ExtractionCache(str(tmp_path / "extractions.sqlite3"))
+    yield cache
+    cache.close()
+
+
+def get_texts(n: int) -> list[str]:
+    return [f"{10 * (i + 1)}g당 1,{i:03d}원" for i in range(n)]
+
+
+def test_batching(cache):
+    llm = FakeChatModel(respond)
+    extractor = LLMExtractor(llm, batch_size=5, max_concurrency=2, cache=cache)
+    texts = get_texts(12)
+    results = extractor.extract(TASK, texts + texts[:3])  # duplicates are sent once
+
+    assert results[0] == dict(quantity=10, unit="g", price=1000)
+    assert results[12:] == results[:3]
+    assert len(llm.prompts) == 3  # 5 + 5 + 2 texts
+    assert extractor.stats["n_unique"] == 12
+    assert extractor.stats["n_extracted"] == 12
+
+
+def test_cache(cache):
+    texts = get_texts(8)
+    LLMExtractor(FakeChatModel(respond), cache=cache).extract(TASK, texts)
+
+    llm = FakeChatModel(respond)
+    extractor = LLMExtractor(llm, cache=cache)
+    results = extractor.extract(TASK, texts)
+    assert llm.prompts == []
+    assert extractor.stats["n_cached"] == 8
+    assert results[-1] == dict(quantity=80, unit="g", price=1007)
+
+
+def test_token_budget(cache):
+    texts = get_texts(20)
+    prompts = [TASK.render(list(enumerate(texts[i : i + 5]))) for i in (0, 5)]
+    token_budget = sum(estimate_tokens(prompt) * 2 for prompt in prompts)
+
+    llm = FakeChatModel(respond)
+    extractor = LLMExtractor(llm, batch_size=5, token_budget=token_budget, cache=cache)
+    results = extractor.extract(TASK, texts)
+    assert len(llm.prompts) == 2
+    assert extractor.stats["n_over_budget"] == 10
+    assert all(results[:10]) and not any(results[10:])
+
+
+def test_report(cache):
+    extractor = LLMExtractor(
+        FakeChatModel(respond), batch_size=4, cache=cache, prices=dict(fake=(1.0, 2.0))
+    )
+    extractor.extract(TASK, get_texts(8))
+    report = extractor.report()
+    assert report["model"] == "fake"
+    assert report["n_requests"] == 2
+    assert report["input_tokens"] > 0 and report["output_tokens"] > 0
+    assert report["cost"] == pytest.approx(
+        (report["input_tokens"] + 2 * report["output_tokens"]) / 1e6
+    )
+    assert 0 <= report["latency_p50"] <= report["latency_max"]
+
+
+def test_extract_documents_options(cache):
+    def respond_options(text: str) -> dict:
+        return dict(options=dict(item.split(": ") for item in text.split(" / ")))
+
+    review_infos = [
+        dict(optional=dict(options={"색상": "블루", "사이즈": "270"})),
+        dict(optional=dict(options={})),
+        dict(optional=dict()),
+    ]
+    extractor = LLMExtractor(FakeChatModel(respond_options), cache=cache)
+    assert extractor.extract_documents(review_infos, TASKS["options"]) == 1
+    assert review_infos[0]["optional"]["options_parsed"] == dict(
+        options={"색상": "블루", "사이즈": "270"}
+    )
+    assert "options_parsed" not in review_infos[1]["optional"]
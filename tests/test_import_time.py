@@ -0,0 +1,9 @@
+import pytest
+
+from gjdanawa_uploader.core.import_time import IMPORT_BUDGETS, find_heavy_imports
+
+
+@pytest.mark.parametrize("module", list(IMPORT_BUDGETS))
+def test_no_heavy_imports(module):
+    # Import times depend on the machine, heavy modules are imported where used
+    assert find_heavy_imports(module) == []
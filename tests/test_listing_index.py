@@ -0,0 +1,41 @@
+import pytest
+
+from gjdanawa_uploader.utils.listing_index import CANONICALIZER
+
+
+@pytest.mark.parametrize(
+    "url, product_id",
+    [
+        # Ad click URLs are unwrapped, tracking parameters are removed
+        (
+            "https://action.adoffice.11st.co.kr/act/click?clickData=x&redirect=%2F%2Fm.11st.co.kr%2Fproducts%2Fm%2F5802041697%3F%26trTypeCd%3DMAS24",
+            "m11st:5802041697",
+        ),
+        (
+            "https://www.11st.co.kr/products/pa/5802041697?trTypeCd=22",
+            "m11st:5802041697",
+        ),
+        ("https://prod.danawa.com/info/?pcode=1234567&cate=1", "danawa:1234567"),
+        (
+            "https://prod.danawa.com/info/?cate=1&pcode=1234567#bookmark",
+            "danawa:1234567",
+        ),
+        (
+            "https://smartstore.naver.com/store/products/4567?NaPm=ct",
+            "navershopping:4567",
+        ),
+        ("https://brand.naver.com/brand/products/4567", "navershopping:4567"),
+    ],
+)
+def test_product_id(url, product_id):
+    assert CANONICALIZER.product_id(url) == product_id
+
+
+def test_unknown_product_id():
+    # The canonical URL is the id of unknown URLs
+    url = "HTTPS://Shop.example.com:443/item?id=1&utm_source=ad#top"
+    assert CANONICALIZER.product_id(url) == "https://shop.example.com/item?id=1"
+    # Ids are namespaced by marketplace (no cross-marketplace deduplication)
+    assert CANONICALIZER.product_id(
+        "https://m.11st.co.kr/products/m/1"
+    ) != CANONICALIZER.product_id("https://prod.danawa.com/info/?pcode=1")
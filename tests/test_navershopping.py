@@ -0,0 +1,70 @@
+import pytest
+
+from gjdanawa_uploader.utils.crawling import find_elements
+from gjdanawa_uploader.utils.html_element import HtmlElement
+from gjdanawa_uploader.crawler.navershopping.navershopping_crawler import (
+    LISTING_SELECTOR,
+    NavershoppingCrawler,
+)
+
+
+ITEM = """
+<div>
+  <div class="product_info_main__a">
+    <a href="https://smartstore.naver.com/senka/products/{id}">
+      <span class="product_img_area__b"><img src="https://shopping-phinf.pstatic.net/{id}.jpg"></span>
+    </a>
+    <div class="product_txt_area__c">
+      <span class="product_info_tit__d"><span class="product_label__e">광고</span>{title}</span>
+      <div class="product_info_count__f">
+        <span class="product_grade__g"><span class="blind">별점</span><strong>4.8</strong><em>(1,234)</em></span>
+        <span class="product_etc__h">찜<em>56</em></span>
+      </div>
+      <div class="product_price__i">
+        <span class="product_num__j">9,900원</span>
+        <span class="product_delivery__k"><span class="blind">배송비</span>3,000원</span>
+      </div>
+      <div class="product_info_area__l"><div class="product_link_mall__m">{seller}</div></div>
+    </div>
+  </div>
+</div>
+"""
+
+
+@pytest.fixture
+def crawler():
+    return NavershoppingCrawler(
+        product_name="퍼펙트휩", brand_name="센카", session_id="test"
+    )
+
+
+def get_listing_elems(items: list[dict]) -> list[HtmlElement]:
+    html = "".join(ITEM.format(id=i, **item) for i, item in enumerate(items))
+    doc = HtmlElement.from_html(
+        f"<div class='listContainer_list_inner__z'>{html}</div>",
+        url="https://msearch.shopping.naver.com/search/all",
+    )
+    return find_elements(doc, LISTING_SELECTOR)
+
+
+def test_extract_items(crawler):
+    (info,) = crawler._extract_items(
+        get_listing_elems([dict(title="센카 퍼펙트휩 120g", seller="센카공식몰")])
+    )
+    assert info["listing_title"] == "센카 퍼펙트휩 120g"
+    assert info["listing_url"] == "https://smartstore.naver.com/senka/products/0"
+    assert info["thumbnail_url"] == "https://shopping-phinf.pstatic.net/0.jpg"
+    assert (info["rating"], info["review_count"]) == (4.8, 1234)
+    assert (info["price"], info["delivery_fee"]) == (9900, 3000)
+    assert info["etc"]["label"] == "광고"
+    assert info["etc"]["찜"] == "56"
+
+
+def test_filter_element_extracted_items(crawler):
+    items = [
+        dict(title="센카 퍼펙트휩 120g", seller="센카공식몰"),
+        dict(title="센카 스피디 퍼펙트 미스트", seller="센카공식몰"),  # other product
+        dict(title="센카 퍼펙트휩 2개", seller="쿠팡"),  # other platform
+    ]
+    infos = crawler._extract_items(get_listing_elems(items))
+    assert [info["listing_title"] for info in infos] == ["센카 퍼펙트휩 120g"]
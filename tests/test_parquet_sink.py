@@ -0,0 +1,50 @@
+import pyarrow.parquet as pq
+
+from gjdanawa_uploader.utils.parquet_sink import ParquetSink
+
+
+def get_reviews(n: int, marketplace: str = "danawa") -> list[dict]:
+    return [
+        dict(
+            marketplace=marketplace,
+            content=f"거품이 풍성해요 {i}",
+            rating=0.8,
+            updated_at="2026-10-18T12:00:00",
+            optional=dict(options="120g x 2", upvotes=i, new=i),
+        )
+        for i in range(n)
+    ]
+
+
+def test_stream_row_groups(tmp_path):
+    sink = ParquetSink(str(tmp_path), row_group_size=4, file_prefix="test")
+
+    # 1. Full row groups are written to files before the sink is closed
+    sink.write("reviews", get_reviews(10))
+    assert sink.stats == dict(n_rows=8, n_row_groups=2, n_files=2)
+    table = pq.read_table(sink.paths[0])
+    assert table.num_rows == 4
+    assert table.column("optional.upvotes").to_pylist() == [0, 1, 2, 3]
+    assert table.column("optional.extra").to_pylist()[0] == '{"new": 0}'
+
+    # 2. The remaining rows are written by close()
+    sink.write("reviews", get_reviews(1, marketplace="m11st"))
+    paths = sink.close()
+    assert sink.stats == dict(n_rows=11, n_row_groups=4, n_files=4)
+    assert sum(pq.read_metadata(path).num_rows for path in paths) == 11
+    assert "marketplace=m11st" in paths[-1] and "crawl_date=2026-10-18" in paths[-1]
+
+
+def test_transform(tmp_path):
+    batches = []
+
+    def transform(kind: str, documents: list[dict]):
+        batches.append((kind, len(documents)))
+        for document in documents:
+            document["optional"]["options_parsed"] = dict(quantity=2)
+
+    with ParquetSink(str(tmp_path), row_group_size=3, transform=transform) as sink:
+        sink.write("reviews", get_reviews(5))
+    assert batches == [("reviews", 3), ("reviews", 2)]
+    table = pq.read_table(sink.paths[0])
+    assert table.column("optional.options_parsed")[0].as_py() == '{"quantity": 2}'
@@ -0,0 +1,91 @@
+import threading
+from time import monotonic, sleep
+
+import pytest
+
+from gjdanawa_uploader.utils.rate_limiter import RateLimiter
+from gjdanawa_uploader.utils.driver_scheduler import DriverScheduler
+
+
+def get_limiter(**kwargs) -> RateLimiter:
+    return RateLimiter(**dict(dict(rate=1000, burst=1000, max_rate=1000), **kwargs))
+
+
+def test_acquire_waits_for_a_slot():
+    limiter = get_limiter(max_concurrency=1)
+    limiter.acquire()
+    acquired = threading.Event()
+    thread = threading.Thread(target=lambda: (limiter.acquire(), acquired.set()))
+    thread.start()
+    assert not acquired.wait(0.1)  # the only slot is in flight
+
+    limiter.release()
+    assert acquired.wait(1)
+    thread.join()
+    assert limiter.in_flight == 1
+
+
+def test_acquire_waits_for_a_token():
+    limiter = RateLimiter(rate=20, burst=2, max_rate=20)
+    start_time = monotonic()
+    for _ in range(3):
+        limiter.acquire()
+        limiter.in_flight -= 1
+    assert monotonic() - start_time >= 0.04  # 1 token per 0.05s after the burst
+
+
+def test_release_increases_limits():
+    limiter = get_limiter(rate=2, max_rate=8)
+    for _ in range(3):
+        with limiter.throttle():
+            pass
+    assert limiter.concurrency == 2  # window: 1 -> 2 -> 2.5 -> 2.9
+    assert limiter.rate == pytest.approx(2 + 1 / 2 + 1 / 2.5 + 1 / 2.9)
+    assert (limiter.n_success, limiter.n_failure, limiter.in_flight) == (3, 0, 0)
+
+
+def test_release_of_slow_or_failed_requests_decreases_limits():
+    limiter = get_limiter(rate=4, max_rate=8, slow_threshold=1.0)
+    limiter.window = 4.0
+
+    limiter.acquire()
+    limiter.release(elapsed_time=2.0)  # slow
+    assert (limiter.concurrency, limiter.rate) == (2, 2)
+
+    with pytest.raises(RuntimeError):
+        with limiter.throttle():
+            raise RuntimeError("TimeoutException")
+    assert (limiter.concurrency, limiter.rate) == (1, 1)
+    assert (limiter.n_failure, limiter.in_flight) == (2, 0)
+
+
+def test_penalize():
+    limiter = get_limiter(rate=4, max_rate=8, min_rate=1.5)
+    limiter.window = 2.0
+    limiter.penalize()
+    assert (limiter.concurrency, limiter.rate) == (1, 2)
+    assert limiter.tokens <= 0  # the next request waits for a token
+    limiter.penalize()
+    assert limiter.rate == 1.5  # min_rate
+    assert (limiter.n_failure, limiter.in_flight) == (2, 0)
+
+
+@pytest.mark.parametrize("slow_threshold, n_drivers", [(5.0, 3), (0.0, 1)])
+def test_driver_scheduler_grows_with_the_limiter(slow_threshold, n_drivers):
+    limiter = get_limiter(
+        min_rate=1000, max_concurrency=3, slow_threshold=slow_threshold
+    )
+
+    def load(driver, item):
+        with limiter.throttle():
+            sleep(0.01)
+        return driver, item
+
+    scheduler = DriverScheduler(
+        [object()], create_driver=object, limiter=limiter, max_drivers=4
+    )
+    results = scheduler.map(load, list(range(20)))
+    assert [item for _, item in results] == list(range(20))
+    # Healthy: drivers are added up to the window, slow: the first driver only
+    assert len(scheduler.drivers) == n_drivers
+    assert {driver for driver, _ in results} == set(scheduler.drivers)
@@ -0,0 +1,43 @@
+import pytest
+
+from gjdanawa_uploader.configs import METADATA
+from gjdanawa_uploader.utils.selector_router import SelectorRouter
+
+
+@pytest.mark.parametrize(
+    "url, version",
+    [
+        ("https://m.11st.co.kr/products/ma/5802041697", 1),
+        ("https://m.11st.co.kr/products/m/6130343076?trTypeCd=22", 2),
+        ("https://www.11st.co.kr/products/m/6130343076", None),  # other host
+        ("https://m.11st.co.kr/products/pa/6130343076", None),
+    ],
+)
+def test_version_detection(url, version):
+    route = METADATA["m11st"].selector_router.match(url)
+    assert (route and route["version"]) == version
+
+
+def test_host_index():
+    router = SelectorRouter(METADATA["m11st"].reviews_selectors_grocery)
+    # Escaped literal hosts are indexed, other hosts are not tried
+    assert list(router._by_host) == ["m.11st.co.kr"] and router._any_host == []
+    assert router.match("not a url") is None
+
+
+def test_registration_order():
+    routes = [
+        dict(listing_url=r"^https://m\.11st\.co\.kr/products/m/1$", version=1),
+        dict(listing_url=r"^https?://[^/]+/products/.+", version=0),  # any host
+        dict(listing_url=r"^https://m\.11st\.co\.kr/products/m/.+", version=2),
+    ]
+    router = SelectorRouter(routes)
+    assert router.match("https://m.11st.co.kr/products/m/1")["version"] == 1
+    # Routes without a host are matched in order with the indexed routes
+    assert router.match("https://m.11st.co.kr/products/m/2")["version"] == 0
+    assert router.match("https://www.11st.co.kr/products/m/2")["version"] == 0
+
+    # Added routes are matched after the existing routes
+    router.add(dict(listing_url=r"^https://m\.11st\.co\.kr/.+", version=3))
+    assert router.match("https://m.11st.co.kr/browsing/1")["version"] == 3
+    assert router.match("https://m.11st.co.kr/products/m/1")["version"] == 1
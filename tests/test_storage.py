@@ -0,0 +1,73 @@
+import pytest
+
+from gjdanawa_uploader.utils.storage import SQLiteStorage
+
+
+def get_review(i: int, content: str, date: str, marketplace: str = "danawa") -> dict:
+    return dict(
+        marketplace=marketplace,
+        product_name="퍼펙트휩",
+        listing_url="https://prod.danawa.com/info/?pcode=1",
+        reviewer_id=f"user{i}",
+        content=content,
+        date=date,
+    )
+
+
+REVIEWS = [
+    get_review(0, "거품이 풍성하고 순해요", "2024.08.01"),
+    get_review(1, "세정력이 좋아요", "2024-08-15T10:00:00"),
+    get_review(2, "거품이 금방 꺼져요", "2024.09.01", marketplace="m11st"),
+]
+
+
+@pytest.fixture
+def storage(tmp_path):
+    storage = SQLiteStorage(str(tmp_path / "storage.sqlite3"))
+    storage.insert_documents(REVIEWS, index="reviews")
+    yield storage
+    storage.close()
+
+
+def test_upsert_idempotency(storage):
+    # 1. Documents with the same id fields are replaced
+    assert storage.insert_documents(REVIEWS, index="reviews") == 3
+    assert storage.count("reviews") == 3
+    updated = dict(REVIEWS[0], rating=0.2)
+    storage.insert_document(updated, index="reviews")
+    assert storage.count("reviews") == 3
+    assert storage.search("reviews", date_to="2024-08-01") == [updated]
+
+    # 2. FTS entries of replaced documents are replaced
+    assert len(storage.search("reviews", text="풍성하")) == 1
+
+
+def test_trigram_search(storage):
+    # Substrings of Korean words are matched (trigram tokenizer)
+    results = storage.search("reviews", text="거품이")
+    assert {review["reviewer_id"] for review in results} == {"user0", "user2"}
+    assert storage.search("reviews", text="세정력", marketplace="m11st") == []
+    # Texts shorter than a trigram are matched with LIKE
+    assert [
+        review["reviewer_id"] for review in storage.search("reviews", text="순해")
+    ] == ["user0"]
+    with pytest.raises(ValueError):
+        storage.search("metadata", text="거품")
+
+
+def test_date_range(storage):
+    results = storage.search("reviews", date_from="2024-08-01", date_to="2024.08.15")
+    # Dates are normalized, times on the last day are included, newest first
+    assert [review["reviewer_id"] for review in results] == ["user1", "user0"]
+    assert storage.search("reviews", date_from="2024-09-02") == []
+    assert len(storage.search("reviews", product_name="퍼펙트휩", size=2)) == 2
+
+
+def test_reset(storage):
+    storage.insert_documents([dict(marketplace="danawa", url="url")], "metadata")
+    storage.reset()
+    assert storage.count("reviews") == storage.count("metadata") == 0
+    assert storage.search("reviews", text="거품이") == []
+
+    storage.insert_documents(REVIEWS[:1], index="reviews")
+    assert len(storage.search("reviews", text="거품이")) == 1
@@ -0,0 +1,68 @@
+import threading
+from time import sleep
+
+import pytest
+
+from gjdanawa_uploader.core.utils import ItemError, pmap
+
+
+def square(x: int) -> int:
+    if x == 3:
+        raise ValueError(x)
+    return x * x
+
+
+def test_pmap_order_and_chunks():
+    progress = []
+    results = pmap(
+        square,
+        [0, 1, 2, 4, 5, 6, 7],
+        n_workers=2,
+        chunksize=3,
+        on_progress=lambda n_done, n_total: progress.append((n_done, n_total)),
+    )
+    assert results == [0, 1, 4, 16, 25, 36, 49]  # input order
+    assert len(progress) == 3 and progress[-1] == (7, 7)  # per chunk
+
+
+@pytest.mark.parametrize("scheduler", ["processes", "threads"])
+def test_pmap_item_errors(scheduler):
+    # Errors are isolated per item (the other items of the chunk are run)
+    results = pmap(
+        square, list(range(6)), n_workers=2, scheduler=scheduler, chunksize=2
+    )
+    assert results[:3] == [0, 1, 4] and results[4:] == [16, 25]
+    assert isinstance(results[3], ItemError) and not results[3]
+    assert (results[3].index, results[3].error) == (3, "ValueError(3)")
+
+
+def test_pmap_threads_resources():
+    finalized = []
+    results = pmap(
+        lambda resource, x: (resource, x),
+        list(range(10)),
+        n_workers=3,
+        scheduler="threads",
+        initializer=lambda prefix: f"{prefix}{threading.get_ident()}",
+        initargs=("driver",),
+        finalizer=finalized.append,
+    )
+    assert [x for _, x in results] == list(range(10))
+    # A resource per worker thread, finalized after the pool is shut down
+    resources = {resource for resource, _ in results}
+    assert all(resource.startswith("driver") for resource in resources)
+    assert len(resources) <= 3 and resources <= set(finalized)
+    assert len(finalized) == len(set(finalized))
+
+
+def test_pmap_raise_errors_cancels_pending_chunks():
+    calls = []
+
+    def fail(x: int):
+        calls.append(x)
+        sleep(0.01)
+        raise ValueError(x)
+
+    with pytest.raises(RuntimeError, match="Item 0 failed"):
+        pmap(fail, list(range(50)), 1, "threads", raise_errors=True)
+    assert len(calls) < 10  # the running chunk is finished, pending ones are not run